@@ -0,0 +1,104 @@
+"""
+Capture / replay benchmark
+Write a synthetic capture, iterate it through the memory map and replay it through
+the detector pipeline (decode, device table, renderer on a fake screen) as fast as possible.
+
+    python benchmarks/bench_capture.py [--reports 1000000] [--devices 2000] [--keep FILE]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'detector'))
+sys.path.insert(0, BENCH_DIR)
+
+import detector
+from bench_render import FakeScreen
+from capture import CaptureWriter, CaptureReader, format_capture_address
+from renderer import TableRenderer
+from scanners.linux import report_advertisement
+from core.beacon_core import BeaconCore
+
+
+def synthetic_payloads(count: int) -> list:
+    """Half LINE Simple Beacon frames, half manufacturer data with a local name"""
+    payloads = []
+    for i in range(count):
+        if i % 2:
+            payloads.append(BeaconCore.build_advertising_data(f'{i:010x}', f'{i & 0xFFFF:04x}'))
+        else:
+            name = f'dev{i}'.encode()
+            payloads.append(bytes([0x02, 0x01, 0x06, len(name) + 1, 0x09]) + name
+                            + bytes([0x07, 0xFF, 0x4C, 0x00, 0x12, 0x02, i & 0xFF, 0x00]))
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capture / replay benchmark')
+    parser.add_argument('--reports', type=int, default=1000000)
+    parser.add_argument('--devices', type=int, default=2000)
+    parser.add_argument('--fps-every', type=int, default=10000, help='Render one frame every N reports')
+    parser.add_argument('--keep', metavar='FILE', help='Write the capture here and keep it')
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), 'bench.lsbc')
+    random.seed(1)
+    addresses = [bytes(random.getrandbits(8) for _ in range(6)) for _ in range(args.devices)]
+    payloads = synthetic_payloads(args.devices)
+
+    start = time.perf_counter()
+    with CaptureWriter(path) as writer:
+        for i in range(args.reports):
+            device = i % args.devices
+            writer.write(addresses[device], -40 - (i * 7) % 60, payloads[device], i * 100000)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f"{'write':<20} {args.reports / elapsed:>12,.0f} reports/s  {size / args.reports:.1f} bytes/report")
+
+    with CaptureReader(path) as reader:
+        start = time.perf_counter()
+        count = len(reader)
+        print(f"{'open + index':<20} {(time.perf_counter() - start) * 1e3:>12.2f} ms  {count:,} reports")
+
+        start = time.perf_counter()
+        count = 0
+        for _ in reader:
+            count += 1
+        elapsed = time.perf_counter() - start
+        print(f"{'iterate':<20} {count / elapsed:>12,.0f} reports/s")
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            next(reader.iter_reports(random.uniform(0, reader.duration)))
+        print(f"{'seek':<20} {(time.perf_counter() - start) * 1e3:>12.3f} us/seek")
+
+        screen = FakeScreen(60, 160)
+        renderer = TableRenderer(screen, doupdate=lambda: None)
+        devices = detector.devices
+
+        def on_report(uuid, name, rssi, manufacturer_data, line_beacon):
+            detector.record_device(
+                uuid, name, rssi, manufacturer_data,
+                line_beacon.hwid_hex if line_beacon is not None else None,
+                line_beacon.device_message_hex if line_beacon is not None else None)
+
+        start = time.perf_counter()
+        for i, (_, address, rssi, payload) in enumerate(reader):
+            report_advertisement(on_report, format_capture_address(address), rssi, payload)
+            if not i % args.fps_every:
+                renderer.render('bench', devices.top('rssi', 57, descending=True))
+        elapsed = time.perf_counter() - start
+        del address, payload
+        print(f"{'replay pipeline':<20} {count / elapsed:>12,.0f} reports/s  {len(devices)} devices, {renderer.frames} frames")
+
+    if not args.keep:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
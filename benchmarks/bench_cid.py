@@ -0,0 +1,87 @@
+"""
+Company ID lookup benchmark
+Startup time and lookup throughput of the compiled CID index against the CSV dict.
+
+    python benchmarks/bench_cid.py [--lookups 1000000]
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+DETECTOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'detector')
+sys.path.insert(0, DETECTOR_DIR)
+
+from cid_index import CidIndex
+
+
+def load_cid_map(filename: str) -> dict:
+    """Baseline: parse cid.csv into a dict keyed by 4-char hex strings, as the detector did before CidIndex"""
+    cid_map = {}
+    if not os.path.exists(filename):
+        return cid_map
+
+    with open(filename, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        for row in reader:
+            if len(row) >= 2:
+                cid_hex = row[0].strip().lower().replace('0x', '')
+                cid_hex = cid_hex.zfill(4).upper()
+                company = row[1].strip().strip('"')
+                cid_map[cid_hex] = company
+    return cid_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Company ID lookup benchmark')
+    parser.add_argument('--lookups', type=int, default=1000000)
+    args = parser.parse_args()
+
+    csv_path = os.path.join(DETECTOR_DIR, 'cid.csv')
+    workdir = tempfile.mkdtemp()
+    try:
+        work_csv = os.path.join(workdir, 'cid.csv')
+        shutil.copy2(csv_path, work_csv)
+
+        start = time.perf_counter()
+        cid_map = load_cid_map(work_csv)
+        print(f"{'startup csv dict':<24} {(time.perf_counter() - start) * 1e3:>9.2f} ms")
+
+        start = time.perf_counter()
+        CidIndex(work_csv).lookup(0)
+        print(f"{'startup index compile':<24} {(time.perf_counter() - start) * 1e3:>9.2f} ms")
+
+        start = time.perf_counter()
+        index = CidIndex(work_csv)
+        index.lookup(0)
+        print(f"{'startup index mmap':<24} {(time.perf_counter() - start) * 1e3:>9.2f} ms")
+
+        # Raw little-endian CIDs as read from manufacturer data, mostly known companies
+        known = [int(k, 16) for k in cid_map]
+        cids = [random.choice(known) if random.random() < 0.9 else random.randrange(0x10000)
+                for _ in range(args.lookups)]
+
+        start = time.perf_counter()
+        for cid in cids:
+            cid_map.get(f"{cid:04X}", "Unknown")
+        elapsed = time.perf_counter() - start
+        print(f"{'lookup csv dict':<24} {args.lookups / elapsed:>12,.0f} lookups/s")
+
+        lookup = index.lookup
+        start = time.perf_counter()
+        for cid in cids:
+            lookup(cid) or "Unknown"
+        elapsed = time.perf_counter() - start
+        print(f"{'lookup index':<24} {args.lookups / elapsed:>12,.0f} lookups/s")
+        index.close()
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Advertising payload decoder benchmark
+Encode LINE Simple Beacon frames with BeaconCore.build_advertising_data_batch, then
+decode them back with the zero-copy decoder.
+
+    python benchmarks/bench_decoder.py [--count 1000000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'broadcaster'))
+
+from core.beacon_core import BeaconCore
+from core.beacon_decoder import decode_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Advertising payload decoder benchmark')
+    parser.add_argument('--count', type=int, default=1000000, help='Number of payloads to decode')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    frames = BeaconCore.build_advertising_data_batch(
+        (f'{i & 0xFFFFFFFFFF:010x}', f'{i & 0xFFFF:04x}') for i in range(args.count))
+    encode = time.perf_counter() - start
+    print(f"{'encode':<16} {args.count / encode:>12,.0f} frames/s")
+
+    for name, line_only in (('line-only', True), ('full', False)):
+        start = time.perf_counter()
+        decoded = decode_batch(frames, line_only=line_only)
+        elapsed = time.perf_counter() - start
+        print(f"{'decode ' + name:<16} {args.count / elapsed:>12,.0f} payloads/s")
+
+    # Round trip check on the last frame
+    last = decoded[-1].line_beacon
+    assert last.hwid_hex == f'{(args.count - 1) & 0xFFFFFFFFFF:010x}'
+    assert last.device_message_hex == f'{(args.count - 1) & 0xFFFF:04x}'
+
+
+if __name__ == '__main__':
+    main()
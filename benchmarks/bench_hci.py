@@ -0,0 +1,157 @@
+"""
+HCI throughput and latency benchmark
+Run the Linux broadcaster and detector against the simulated controller (core/hci_sim.py),
+no Bluetooth hardware or root needed.
+
+    python benchmarks/bench_hci.py [--commands 2000] [--latency 0] [--report-rates 1000 10000 50000]
+                                   [--drop-rate 0] [--error-rate 0]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(BASE_DIR, 'broadcaster'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'detector'))
+
+from core.hci import HCIError, OGF_LE_CTL, OCF_LE_SET_ADVERTISING_DATA, build_advertising_data, build_advertising_parameters
+from core.hci_sim import SimulatedController, CONTROLLER_ADDRESS
+from platforms.linux import LinuxTransmitter
+from scanners.linux import LinuxScanner, format_address
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def print_latencies(name: str, latencies: list) -> None:
+    print(f"{name:<28} p50 {percentile(latencies, 0.5) * 1e6:>9.1f} us  "
+          f"p99 {percentile(latencies, 0.99) * 1e6:>9.1f} us  max {max(latencies, default=0) * 1e6:>9.1f} us")
+
+
+def bench_commands(controller: SimulatedController, count: int) -> None:
+    """Round-trip of single LE Set Advertising Data commands"""
+    transmitter = LinuxTransmitter(socket_factory=controller.socket_factory, use_extended=False)
+    transmitter.transport.open()
+    transport = transmitter.transport
+    # The controller only accepts advertising data once parameters are set
+    transport.set_advertising_parameters(build_advertising_parameters())
+    params = build_advertising_data(bytes(31))
+    latencies = []
+    failures = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            transport.send_command(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_DATA, params)
+        except HCIError:
+            failures += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    transport.close()
+    print_latencies('command round-trip', latencies)
+    if failures:
+        print(f"{'':<28} {failures} of {count} commands failed")
+
+
+def bench_updates(controller: SimulatedController, count: int, extended: bool) -> None:
+    """Device message updates through LinuxTransmitter (one LE Set (Extended) Advertising Data each)"""
+    controller.extended = extended
+    transmitter = LinuxTransmitter(socket_factory=controller.socket_factory, use_extended=extended)
+    if not transmitter.initialize():
+        return
+    start = time.perf_counter()
+    failed = 0
+    for i in range(count):
+        if not transmitter.start_advertising('0123456789', f'{i & 0xFFFF:04x}'):
+            failed += 1
+    elapsed = time.perf_counter() - start
+    transmitter.stop_advertising()
+    transmitter.transport.close()
+    name = 'updates ' + ('extended' if extended else 'legacy')
+    print(f"{name:<28} {count / elapsed:>12,.0f} updates/s  {failed} failed")
+
+
+def bench_advertising_latency(controller: SimulatedController, count: int) -> None:
+    """Time from a new device message to the first loopback report carrying it"""
+    controller.extended = False
+    transmitter = LinuxTransmitter(socket_factory=controller.socket_factory, use_extended=False)
+    if not transmitter.initialize():
+        return
+    own = format_address(CONTROLLER_ADDRESS)
+    seen = {}
+    condition = threading.Condition()
+
+    def on_report(uuid, name, rssi, manufacturer_data, line_beacon):
+        if uuid == own and line_beacon is not None:
+            message = line_beacon.device_message_hex
+            with condition:
+                if message not in seen:
+                    seen[message] = time.perf_counter()
+                    condition.notify_all()
+
+    scanner = LinuxScanner(on_report, socket_factory=controller.socket_factory)
+    scanner.start()
+    latencies = []
+    for i in range(count):
+        message = f'{i:04x}'
+        start = time.perf_counter()
+        transmitter.start_advertising('0123456789', message)
+        with condition:
+            if condition.wait_for(lambda: message in seen, timeout=1.0):
+                latencies.append(seen[message] - start)
+    scanner.stop()
+    transmitter.stop_advertising()
+    transmitter.transport.close()
+    print_latencies('advertising latency', latencies)
+
+
+def bench_scanner(controller: SimulatedController, rate: float, duration: float) -> None:
+    """Reports/s the detector scanner decodes while the controller sends rate reports/s"""
+    received = [0]
+
+    def on_report(uuid, name, rssi, manufacturer_data, line_beacon):
+        received[0] += 1
+
+    controller.report_rate = rate
+    sent_before = controller.reports_sent
+    overflowed_before = controller.reports_overflowed
+    scanner = LinuxScanner(on_report, socket_factory=controller.socket_factory)
+    scanner.start()
+    time.sleep(duration)
+    scanner.stop()
+    controller.report_rate = 0
+    sent = controller.reports_sent - sent_before
+    overflowed = controller.reports_overflowed - overflowed_before
+    print(f"{'scanner @ ' + format(int(rate), ',') + '/s':<28} {received[0] / duration:>12,.0f} reports/s  "
+          f"{sent:,} sent, {overflowed:,} overflowed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HCI throughput and latency benchmark')
+    parser.add_argument('--commands', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated controller latency per command (s)')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Probability of a lost event')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of a command error')
+    parser.add_argument('--report-rates', type=float, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds per scanner run')
+    args = parser.parse_args()
+
+    controller = SimulatedController(latency=args.latency, drop_rate=args.drop_rate,
+                                     error_rate=args.error_rate, report_devices=1000, seed=1)
+    try:
+        bench_commands(controller, args.commands)
+        bench_updates(controller, args.commands, extended=False)
+        bench_updates(controller, args.commands, extended=True)
+        bench_advertising_latency(controller, 20)
+        for rate in args.report_rates:
+            bench_scanner(controller, rate, args.duration)
+    finally:
+        controller.close()
+
+
+if __name__ == '__main__':
+    main()
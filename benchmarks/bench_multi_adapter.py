@@ -0,0 +1,92 @@
+"""
+Multi-adapter broadcaster throughput benchmark
+Fake adapters answer every advertising update after a fixed controller round-trip,
+no Bluetooth hardware is needed. Aggregate updates/s should grow close to linearly
+with the number of adapters, and a hung adapter must not slow the others down.
+
+    python benchmarks/bench_multi_adapter.py [--adapters 1 2 4 8] [--latency 0.001] [--duration 2] [--hung]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'broadcaster'))
+
+from core.multi_adapter import MultiAdapterBroadcaster
+
+
+class FakeTransmitter():
+    """Transmitter taking `latency` seconds per advertising update, or hanging forever"""
+
+    def __init__(self, latency: float, hung: bool = False):
+        self.latency = latency
+        self.hung = hung
+        self.calls = 0
+
+    def initialize(self) -> bool:
+        return True
+
+    def start_advertising(self, hwid: str, device_message: str = '') -> bool:
+        if self.hung:
+            threading.Event().wait()
+        time.sleep(self.latency)
+        self.calls += 1
+        return True
+
+    def stop_advertising(self) -> None:
+        pass
+
+
+def run(adapters: int, latency: float, duration: float, hung: bool) -> float:
+    transmitters = {}
+
+    def factory(index):
+        transmitters[index] = FakeTransmitter(latency, hung=hung and index == 0)
+        return transmitters[index]
+
+    assignment = {index: [(f'{index:010x}', '00', None)] for index in range(adapters)}
+    broadcaster = MultiAdapterBroadcaster(assignment, transmitter_factory=factory)
+    broadcaster.start()
+    hwids = [beacons[0][0] for beacons in assignment.values()]
+
+    # Producer pushes as fast as it can, the workers coalesce
+    start = time.perf_counter()
+    end = start + duration
+    counter = 0
+    while time.perf_counter() < end:
+        for hwid in hwids:
+            broadcaster.update(hwid, f'{counter & 0xFF:02x}')
+        counter += 1
+        # Let the workers run, a busy producer would otherwise hold the GIL for whole switch intervals
+        time.sleep(0)
+    elapsed = time.perf_counter() - start
+    broadcaster.stop(timeout=0.1)
+
+    healthy = [t for index, t in transmitters.items() if not (hung and index == 0)]
+    return sum(t.calls for t in healthy) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-adapter broadcaster throughput benchmark')
+    parser.add_argument('--adapters', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--latency', type=float, default=0.001, help='Fake controller round-trip in seconds')
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--hung', action='store_true', help='Make hci0 hang forever')
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'adapters':>8} {'updates/s':>12} {'scaling':>8}")
+    for adapters in args.adapters:
+        rate = run(adapters, args.latency, args.duration, args.hung)
+        healthy = adapters - 1 if args.hung else adapters
+        if baseline is None and healthy:
+            baseline = rate / healthy
+        scaling = rate / baseline if baseline else 0.0
+        print(f"{adapters:>8} {rate:>12.0f} {scaling:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
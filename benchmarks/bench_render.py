@@ -0,0 +1,121 @@
+"""
+Detector renderer benchmark
+Draw the device table into a fake screen that counts calls and characters,
+comparing the full repaint (clear + every row every frame) with the differential renderer.
+
+    python benchmarks/bench_render.py [--devices 1000 5000] [--frames 200] [--churn 0.1] [--height 60]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'detector'))
+
+from device_table import DeviceTable
+from renderer import TableRenderer, format_row
+
+
+class FakeScreen():
+    """Counts curses calls and written characters, a clear() repaints the whole screen"""
+
+    def __init__(self, height: int, width: int):
+        self.height = height
+        self.width = width
+        self.calls = 0
+        self.chars = 0
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def clear(self):
+        self.calls += 1
+        self.chars += self.height * self.width
+
+    def addstr(self, y, x, text):
+        self.calls += 1
+        self.chars += len(text)
+
+    def move(self, y, x):
+        self.calls += 1
+
+    def clrtoeol(self):
+        self.calls += 1
+
+    def refresh(self):
+        self.calls += 1
+
+    def noutrefresh(self):
+        self.calls += 1
+
+
+def full_repaint(stdscr, header, devices):
+    """The detector's original frame: clear, reformat and redraw every row"""
+    stdscr.clear()
+    height, width = stdscr.getmaxyx()
+    stdscr.addstr(0, 0, header)
+    stdscr.addstr(1, 0, "-" * (width - 1))
+    for i, device in enumerate(devices, start=2):
+        if i >= height - 1:
+            break
+        stdscr.addstr(i, 0, format_row(device)[:width - 1])
+    stdscr.refresh()
+
+
+def make_table(count: int) -> DeviceTable:
+    table = DeviceTable(ttl=3600, max_devices=count)
+    for i in range(count):
+        table.update(f'{i:012X}', 'Unknown', random.randrange(-100, -30), '4C000215', 0x004C, 'Apple, Inc.')
+    return table
+
+
+def run(count: int, frames: int, churn: float, height: int, differential: bool) -> dict:
+    random.seed(count)
+    table = make_table(count)
+    screen = FakeScreen(height, 160)
+    renderer = TableRenderer(screen, doupdate=lambda: None)
+    uuids = [f'{i:012X}' for i in range(count)]
+    header = "LITE-SIMPLE-BEACON Detector (RSSI high → low) | o: Sort Order | Ctrl+C to exit"
+
+    elapsed = 0.0
+    for _ in range(frames):
+        # Some devices report a new RSSI between two frames
+        for uuid in random.sample(uuids, int(count * churn)):
+            record = table.get(uuid)
+            table.update(uuid, record.name, random.randrange(-100, -30), record.manufacturer,
+                         record.company_id, record.company_name)
+        start = time.perf_counter()
+        rows = table.top('rssi', height - 3, descending=True)
+        if differential:
+            renderer.render(header, rows)
+        else:
+            full_repaint(screen, header, rows)
+        elapsed += time.perf_counter() - start
+
+    return {
+        'ms/frame': elapsed / frames * 1e3,
+        'calls/frame': screen.calls / frames,
+        'chars/frame': screen.chars / frames,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detector renderer benchmark')
+    parser.add_argument('--devices', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--churn', type=float, default=0.1, help='Share of devices with a new RSSI per frame')
+    parser.add_argument('--height', type=int, default=60)
+    args = parser.parse_args()
+
+    print(f"{'devices':>8} {'renderer':<13} {'ms/frame':>9} {'calls/frame':>12} {'chars/frame':>12}")
+    for count in args.devices:
+        for name, differential in (('full repaint', False), ('differential', True)):
+            result = run(count, args.frames, args.churn, args.height, differential)
+            print(f"{count:>8} {name:<13} {result['ms/frame']:>9.3f} "
+                  f"{result['calls/frame']:>12.1f} {result['chars/frame']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
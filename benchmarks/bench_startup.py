@@ -0,0 +1,85 @@
+"""
+Broadcaster startup benchmark
+Import time of broadcaster.py against loading every mode's modules up front, and
+the time from transmitter creation to the first advertisement against the simulated
+controller (core/hci_sim.py) with and without the adapter capability cache.
+
+    python benchmarks/bench_startup.py [--runs 10] [--latency 0.002]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BROADCASTER_DIR = os.path.join(BASE_DIR, 'broadcaster')
+sys.path.insert(0, BROADCASTER_DIR)
+
+from core.adapter_cache import AdapterCache
+from core.hci_sim import SimulatedController
+from platforms.linux import LinuxTransmitter
+
+IMPORTS = [
+    ('interpreter only', 'pass'),
+    ('broadcaster.py', 'import broadcaster'),
+    ('broadcaster.py, all modes', 'import broadcaster, platforms.linux, core.feed, core.codec, core.multi_adapter, '
+                                  'core.adapter_cache, http.server'),
+]
+
+
+def bench_imports(runs: int) -> None:
+    """Wall time of a fresh interpreter running the import, best of runs"""
+    for name, statement in IMPORTS:
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', statement], cwd=BROADCASTER_DIR, check=True)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:<32} {best * 1000:8.2f} ms")
+
+
+def first_advertisement(latency: float, extended: bool, cache) -> float:
+    """:return: seconds from transmitter creation to the first advertisement"""
+    controller = SimulatedController(extended=extended, latency=latency)
+    start = time.perf_counter()
+    transmitter = LinuxTransmitter(socket_factory=controller.socket_factory, capability_cache=cache)
+    transmitter.prepare('0123456789', '0102')
+    if not transmitter.initialize() or not transmitter.start_advertising('0123456789', '0102'):
+        raise RuntimeError("Advertising did not start")
+    elapsed = time.perf_counter() - start
+    transmitter.cleanup()
+    return elapsed
+
+
+def bench_first_advertisement(runs: int, latency: float) -> None:
+    path = os.path.join(tempfile.mkdtemp(), 'adapters.json')
+    try:
+        for extended in (False, True):
+            kind = 'extended' if extended else 'legacy'
+            probed = min(first_advertisement(latency, extended, None) for _ in range(runs))
+            # First start fills the cache
+            first_advertisement(latency, extended, AdapterCache(path))
+            cached = min(first_advertisement(latency, extended, AdapterCache(path)) for _ in range(runs))
+            os.remove(path)
+            print(f"{'first advertisement ' + kind:<32} {probed * 1000:8.2f} ms probed  "
+                  f"{cached * 1000:8.2f} ms cached")
+    finally:
+        os.rmdir(os.path.dirname(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Broadcaster startup benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='Runs per measurement, the best one counts')
+    parser.add_argument('--latency', type=float, default=0.002, help='Simulated seconds per HCI command')
+    args = parser.parse_args()
+
+    bench_imports(args.runs)
+    bench_first_advertisement(args.runs, args.latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Multi-process detector scaling benchmark
+Every worker process replays the same synthetic capture as fast as possible (no
+Bluetooth hardware needed) and publishes into its shared-memory ring; the main
+process merges all rings into the device table like the detector UI loop does.
+Decoded reports/s should grow with the number of workers up to the number of
+CPU cores, until the merging main process becomes the limit.
+
+    python benchmarks/bench_workers.py [--workers 1 2 4] [--duration 3] [--devices 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'broadcaster'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'detector'))
+sys.path.insert(0, BENCH_DIR)
+
+import detector
+from bench_capture import synthetic_payloads
+from capture import CaptureWriter
+from device_table import DeviceTable
+from scanners.workers import WorkerScanner
+
+
+def write_capture(path: str, devices: int, reports: int) -> None:
+    rng = random.Random(1)
+    addresses = [bytes(rng.getrandbits(8) for _ in range(6)) for _ in range(devices)]
+    payloads = synthetic_payloads(devices)
+    with CaptureWriter(path) as writer:
+        for i in range(reports):
+            device = i % devices
+            writer.write(addresses[device], -40 - (i * 7) % 60, payloads[device], i * 100000)
+
+
+def run(path: str, workers: int, duration: float, fps: float) -> tuple:
+    """:return: (decoded reports/s, merged reports/s, dropped)"""
+    detector.devices = DeviceTable(ttl=3600, max_devices=100000)
+    scanner = WorkerScanner([('replay', path, 0, True) for _ in range(workers)])
+    scanner.start()
+    try:
+        # Wait for every worker to publish, process start-up is not measured
+        deadline = time.monotonic() + 30
+        while not all(counters[0] for counters in scanner.counters()):
+            if time.monotonic() > deadline:
+                raise RuntimeError("Workers did not start")
+            time.sleep(0.05)
+        received = scanner.received
+        merged = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            merged += scanner.drain(detector.record_device)
+            detector.devices.smooth()
+            time.sleep(1.0 / fps)
+        elapsed = time.perf_counter() - start
+        received = scanner.received - received
+    finally:
+        scanner.stop()
+    return received / elapsed, merged / elapsed, scanner.dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-process detector scaling benchmark')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=3.0, help='Seconds per run')
+    parser.add_argument('--devices', type=int, default=2000)
+    parser.add_argument('--fps', type=float, default=10.0, help='Merges per second of the main process')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.lsbc')
+    write_capture(path, args.devices, args.devices * 50)
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'decoded/s':>12} {'merged/s':>12} {'dropped':>10}  scaling")
+    base = None
+    try:
+        for workers in args.workers:
+            decoded, merged, dropped = run(path, workers, args.duration, args.fps)
+            base = base or decoded
+            print(f"{workers:>8} {decoded:>12,.0f} {merged:>12,.0f} {dropped:>10,}  {decoded / base:.2f}x")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,576 @@
+"""
+Benchmark suite
+Hot paths of the broadcaster and the detector, measured on plain Linux: the HCI controller
+is simulated (core/hci_sim.py), PyObjC and curses are replaced by fakes.
+
+Per case: ops/s (best of --repeat runs), peak traced memory of one call (KiB) and
+memory blocks still allocated per op afterwards (caches, leaks).
+
+    python benchmarks/suite.py [--filter decode] [--output results.json]
+    python benchmarks/suite.py --baseline results.json [--threshold 0.1]
+
+With --baseline every case is compared with the saved results, a case slower by more than
+--threshold (or using that much more peak memory) is flagged and the exit status is 1.
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, os.path.join(BASE_DIR, 'broadcaster'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'detector'))
+sys.path.insert(0, BENCH_DIR)
+
+RESULTS_VERSION = 1
+
+CASES = {}
+
+
+def case(name: str):
+    """
+    Register a case; the decorated function does the setup and returns (callable, ops per call)
+    """
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+# Frame building
+
+HWIDS = [f'{i:010x}' for i in range(1000)]
+MESSAGES = [f'{i & 0xFFFF:04x}' for i in range(1000)]
+
+
+@case('frame/service_data')
+def bench_service_data():
+    from core.beacon_core import BeaconCore
+    return lambda: BeaconCore.build_line_simple_beacon_service_data('0123456789', 'cafe'), 1
+
+
+@case('frame/advertising_data')
+def bench_advertising_data():
+    from core.beacon_core import BeaconCore
+    return lambda: BeaconCore.build_advertising_data('0123456789', 'cafe'), 1
+
+
+@case('frame/advertising_data_batch')
+def bench_advertising_data_batch():
+    from core.beacon_core import BeaconCore
+    frames = list(zip(HWIDS, MESSAGES))
+    buffer = bytearray(31 * len(frames))
+    return lambda: BeaconCore.build_advertising_data_batch(frames, out=buffer), len(frames)
+
+
+# Device message codec
+
+def _sensor_codec():
+    from core.codec import MessageCodec, Field
+    return MessageCodec([
+        Field('seq', 4, kind='sequence'),
+        Field('temperature', 10, scale=0.1, offset=-20.0),
+        Field('humidity', 7),
+        Field('battery', 3, scale=0.25, offset=2.0),
+        Field('pressure', 16, scale=0.1, offset=800.0),
+        Field('count', 32),
+        Field('flow', 16, signed=True, scale=0.01, kind='delta'),
+    ])
+
+
+def _sensor_records(count: int) -> list:
+    rng = random.Random(1)
+    return [{'temperature': rng.uniform(-10, 40), 'humidity': rng.randrange(100), 'battery': rng.uniform(2.5, 3.5),
+             'pressure': rng.uniform(950, 1050), 'count': i, 'flow': i * 0.05} for i in range(count)]
+
+
+@case('codec/hex_message')
+def bench_hex_message():
+    # Baseline: the same fields packed by hand into a hex string, then decoded like the frame builder does
+    records = _sensor_records(1000)
+
+    def run():
+        flow = None
+        for seq, record in enumerate(records):
+            head = ((seq & 0xF) << 20 | round((record['temperature'] + 20) * 10) << 10
+                    | record['humidity'] << 3 | round((record['battery'] - 2) * 4))
+            delta = 0 if flow is None else round((record['flow'] - flow) * 100)
+            flow = record['flow']
+            bytes.fromhex(f"{head:06x}{round((record['pressure'] - 800) * 10):04x}{record['count']:08x}{delta & 0xFFFF:04x}")
+    return run, len(records)
+
+
+@case('codec/encode')
+def bench_codec_encode():
+    codec = _sensor_codec()
+    records = _sensor_records(1000)
+    encode = codec.encode
+
+    def run():
+        for record in records:
+            encode(record)
+    return run, len(records)
+
+
+@case('codec/encode_batch')
+def bench_codec_encode_batch():
+    codec = _sensor_codec()
+    records = _sensor_records(1000)
+    buffer = bytearray(codec.size * len(records))
+    return lambda: codec.encode_batch(records, out=buffer), len(records)
+
+
+@case('codec/decode')
+def bench_codec_decode():
+    codec = _sensor_codec()
+    messages = [codec.encode(record) for record in _sensor_records(1000)]
+    decode = codec.decode
+
+    def run():
+        for message in messages:
+            decode(message)
+    return run, len(messages)
+
+
+@case('codec/decode_batch')
+def bench_codec_decode_batch():
+    codec = _sensor_codec()
+    buffer = b''.join(codec.encode(record) for record in _sensor_records(1000))
+    return lambda: codec.decode_batch(buffer), len(buffer) // codec.size
+
+
+# PDU assembly and HCI commands
+
+@case('pdu/command_packet')
+def bench_command_packet():
+    from core.beacon_core import BeaconCore
+    from core.hci import OGF_LE_CTL, OCF_LE_SET_ADVERTISING_DATA, build_command_packet, build_advertising_data
+    adv_data = BeaconCore.build_advertising_data('0123456789', 'cafe')
+    return lambda: build_command_packet(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_DATA, build_advertising_data(adv_data)), 1
+
+
+def _simulated_transmitter(extended: bool):
+    from core.hci_sim import SimulatedController
+    from platforms.linux import LinuxTransmitter
+    controller = SimulatedController(extended=extended)
+    transmitter = LinuxTransmitter(socket_factory=controller.socket_factory, use_extended=extended)
+    if not transmitter.initialize():
+        raise RuntimeError("Simulated controller did not initialize")
+    messages = iter(range(1 << 62))
+    return lambda: transmitter.start_advertising('0123456789', f'{next(messages) & 0xFFFF:04x}'), 1
+
+
+@case('pdu/start_advertising_legacy')
+def bench_start_advertising_legacy():
+    return _simulated_transmitter(False)
+
+
+@case('pdu/start_advertising_extended')
+def bench_start_advertising_extended():
+    return _simulated_transmitter(True)
+
+
+# Company IDs
+
+@case('cid/load_csv')
+def bench_load_cid_map():
+    from bench_cid import load_cid_map
+    path = os.path.join(BASE_DIR, 'detector', 'cid.csv')
+    return lambda: load_cid_map(path), 1
+
+
+@case('cid/index_open')
+def bench_cid_index_open():
+    from cid_index import CidIndex
+    path = os.path.join(BASE_DIR, 'detector', 'cid.csv')
+    CidIndex(path).lookup(0)  # compile the snapshot once
+
+    def open_and_lookup():
+        index = CidIndex(path)
+        index.lookup(0x004C)
+        index.close()
+    return open_and_lookup, 1
+
+
+@case('cid/index_lookup')
+def bench_cid_index_lookup():
+    from cid_index import CidIndex
+    index = CidIndex(os.path.join(BASE_DIR, 'detector', 'cid.csv'))
+    cids = [random.Random(1).randrange(0x10000) for _ in range(1000)]
+    lookup = index.lookup
+
+    def lookups():
+        for cid in cids:
+            lookup(cid)
+    return lookups, len(cids)
+
+
+# Parsing
+
+def _sample_payloads():
+    from core.beacon_core import BeaconCore
+    name = b'iPhone'
+    return [
+        BeaconCore.build_advertising_data('0123456789', 'cafe'),
+        bytes([0x02, 0x01, 0x06, len(name) + 1, 0x09]) + name + bytes([0x07, 0xFF, 0x4C, 0x00, 0x12, 0x02, 0x00, 0x00]),
+    ]
+
+
+@case('decode/advertising_data')
+def bench_decode_advertising_data():
+    from core.beacon_decoder import decode_advertising_data
+    payloads = _sample_payloads()
+
+    def decode():
+        for payload in payloads:
+            decode_advertising_data(payload)
+    return decode, len(payloads)
+
+
+@case('decode/hci_report')
+def bench_decode_hci_report():
+    from core.hci_sim import build_advertising_report
+    from scanners.linux import iter_advertising_reports, report_advertisement, format_address
+    packets = [memoryview(build_advertising_report(bytes(6), -60, payload)) for payload in _sample_payloads()]
+
+    def on_report(uuid, name, rssi, manufacturer_data, line_beacon):
+        pass
+
+    def decode():
+        for packet in packets:
+            for _, _, address, rssi, data in iter_advertising_reports(packet):
+                report_advertisement(on_report, format_address(address), rssi, data)
+    return decode, len(packets)
+
+
+class _FakeNSData():
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def bytes(self):
+        return memoryview(self._data)
+
+
+class _FakeUUID():
+    def __init__(self, value: str):
+        self._value = value
+
+    def UUIDString(self):
+        return self._value
+
+
+class _FakePeripheral():
+    def __init__(self, name: str, identifier: str):
+        self._name = name
+        self._identifier = _FakeUUID(identifier)
+
+    def name(self):
+        return self._name
+
+    def identifier(self):
+        return self._identifier
+
+
+def _import_macos_scanner():
+    """Import scanners.macos with stand-ins for the PyObjC modules"""
+    fakes = {
+        'objc': types.SimpleNamespace(loadBundle=lambda *args, **kwargs: None,
+                                      lookUpClass=lambda name: type(name, (), {}), super=super),
+        'Foundation': types.SimpleNamespace(NSObject=object),
+        'CoreBluetooth': types.SimpleNamespace(),
+        'dispatch': types.SimpleNamespace(),
+    }
+    saved = {name: sys.modules.get(name) for name in list(fakes) + ['scanners.macos']}
+    sys.modules.update(fakes)
+    sys.modules.pop('scanners.macos', None)
+    try:
+        import scanners.macos as macos
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    return macos
+
+
+@case('decode/corebluetooth_discover')
+def bench_decode_corebluetooth():
+    from core.beacon_core import BeaconCore
+    macos = _import_macos_scanner()
+    delegate = macos.MyDelegate()
+    delegate.on_report = lambda uuid, name, rssi, manufacturer_data, line_beacon: None
+    delegate.recorder = None
+    delegate.report_filter = None
+    service_data = BeaconCore.build_line_simple_beacon_service_data('0123456789', 'cafe')[2:]
+    reports = [
+        (_FakePeripheral(None, '6F1C6D4E-3C61-4F3B-9E0A-0D6F7F0E1A2B'),
+         {'kCBAdvDataServiceData': {_FakeUUID('FE6F'): _FakeNSData(service_data)}}),
+        (_FakePeripheral('iPhone', '0C7E2A55-5A8B-4B8E-8F55-9A5B3B1E2C3D'),
+         {'kCBAdvDataManufacturerData': _FakeNSData(bytes([0x4C, 0x00, 0x12, 0x02, 0x00, 0x00]))}),
+    ]
+    discover = delegate.centralManager_didDiscoverPeripheral_advertisementData_RSSI_
+
+    def decode():
+        for peripheral, adv_data in reports:
+            discover(None, peripheral, adv_data, -60)
+    return decode, len(reports)
+
+
+# Pre-ingest filter
+
+def _line_filter():
+    from filters import ReportFilter
+    return ReportFilter(service_uuids=['FE6F'], hwids=[f'{i:010x}' for i in range(100)], min_rssi=-90)
+
+
+@case('filter/reject_payload')
+def bench_filter_reject():
+    # Non-matching devices, the common case when only LINE Simple Beacons are wanted
+    report_filter = _line_filter()
+    payloads = [memoryview(payload) for payload in _sample_payloads()]
+    payloads = [payload for payload in payloads if not report_filter.match_payload(-60, payload)]
+    match = report_filter.match_payload
+
+    def run():
+        for payload in payloads:
+            match(-60, payload)
+    return run, len(payloads)
+
+
+@case('filter/accept_payload')
+def bench_filter_accept():
+    from core.beacon_core import BeaconCore
+    report_filter = _line_filter()
+    payloads = [memoryview(BeaconCore.build_advertising_data(f'{i:010x}', 'cafe')) for i in range(100)]
+    match = report_filter.match_payload
+
+    def run():
+        for payload in payloads:
+            match(-60, payload)
+    return run, len(payloads)
+
+
+@case('filter/reject_corebluetooth')
+def bench_filter_reject_corebluetooth():
+    macos = _import_macos_scanner()
+    delegate = macos.MyDelegate()
+    delegate.on_report = lambda uuid, name, rssi, manufacturer_data, line_beacon: None
+    delegate.recorder = None
+    delegate.report_filter = _line_filter()
+    peripheral = _FakePeripheral('iPhone', '0C7E2A55-5A8B-4B8E-8F55-9A5B3B1E2C3D')
+    adv_data = {'kCBAdvDataManufacturerData': _FakeNSData(bytes([0x4C, 0x00, 0x12, 0x02, 0x00, 0x00]))}
+    discover = delegate.centralManager_didDiscoverPeripheral_advertisementData_RSSI_
+    return lambda: discover(None, peripheral, adv_data, -60), 1
+
+
+# Detector table and UI
+
+def _populated_table(count: int):
+    import detector
+    from device_table import DeviceTable
+    table = detector.devices = DeviceTable(ttl=3600, max_devices=count)
+    rng = random.Random(count)
+    manufacturer = bytes([0x4C, 0x00, 0x12, 0x02, 0x00, 0x00])
+    for i in range(count):
+        detector.record_device(f'{i:012X}', 'Unknown', rng.randrange(-100, -30), manufacturer)
+    return detector, table, rng
+
+
+@case('ui/record_device')
+def bench_record_device():
+    detector, table, rng = _populated_table(1000)
+    manufacturer = bytes([0x4C, 0x00, 0x12, 0x02, 0x00, 0x00])
+    uuids = [f'{i:012X}' for i in range(1000)]
+    rssis = [rng.randrange(-100, -30) for _ in range(1000)]
+    record_device = detector.record_device
+
+    def record():
+        for uuid, rssi in zip(uuids, rssis):
+            record_device(uuid, 'Unknown', rssi, manufacturer)
+        rssis.append(rssis.pop(0))
+    return record, len(uuids)
+
+
+def _frame(differential: bool):
+    from bench_render import FakeScreen, full_repaint
+    from renderer import TableRenderer
+    detector, table, rng = _populated_table(1000)
+    screen = FakeScreen(60, 160)
+    renderer = TableRenderer(screen, doupdate=lambda: None)
+    uuids = [f'{i:012X}' for i in range(1000)]
+    header = "LITE-SIMPLE-BEACON Detector (RSSI high → low) | o: Sort Order | Ctrl+C to exit"
+
+    def frame():
+        # A few devices moved since the last frame
+        for uuid in rng.sample(uuids, 10):
+            record = table.get(uuid)
+            table.update(uuid, record.name, rng.randrange(-100, -30), record.manufacturer,
+                         record.company_id, record.company_name)
+        rows = table.top('rssi', 57, descending=True)
+        if differential:
+            renderer.render(header, rows)
+        else:
+            full_repaint(screen, header, rows)
+    return frame, 1
+
+
+@case('ui/proximity_smooth')
+def bench_proximity_smooth():
+    detector, table, rng = _populated_table(1000)
+    manufacturer = bytes([0x4C, 0x00, 0x12, 0x02, 0x00, 0x00])
+    uuids = [f'{i:012X}' for i in range(1000)]
+    rssis = [rng.randrange(-100, -30) for _ in range(1000)]
+    record_device = detector.record_device
+
+    def frame():
+        # One frame worth of reports (5 per device), then one filtering batch
+        for _ in range(5):
+            for uuid, rssi in zip(uuids, rssis):
+                record_device(uuid, 'Unknown', rssi, manufacturer)
+            rssis.append(rssis.pop(0))
+        table.smooth()
+    return frame, 5 * len(uuids)
+
+
+@case('ui/sort_top')
+def bench_sort_top():
+    detector, table, rng = _populated_table(1000)
+    return lambda: table.top('rssi', 57, descending=True), 1
+
+
+@case('ui/frame_full_repaint')
+def bench_frame_full_repaint():
+    return _frame(False)
+
+
+@case('ui/frame_differential')
+def bench_frame_differential():
+    return _frame(True)
+
+
+# Runner
+
+def _time(fn, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - start
+
+
+def measure(fn, ops_per_call: int, min_time: float, repeat: int) -> dict:
+    """Time fn like timeit (gc off, best of repeat), then measure its memory use"""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        # Calibrate: enough calls for min_time per run
+        number = 1
+        while True:
+            elapsed = _time(fn, number)
+            if elapsed >= min_time / 10:
+                break
+            number *= 10
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+        best = min(_time(fn, number) for _ in range(repeat))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    # Blocks still allocated after the calls (caches, leaks)
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    _time(fn, number)
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks
+
+    # Peak memory of one call
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': number * ops_per_call / best,
+        'peak_kib': peak / 1024,
+        'blocks_per_op': blocks / (number * ops_per_call),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """:return: list of (case, message) regressions of results against baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['ops_per_sec'] < base['ops_per_sec'] * (1 - threshold):
+            regressions.append((name, f"ops/s {base['ops_per_sec']:,.0f} -> {result['ops_per_sec']:,.0f}"))
+        if result['peak_kib'] > base['peak_kib'] * (1 + threshold) + 1:
+            regressions.append((name, f"peak {base['peak_kib']:.1f} -> {result['peak_kib']:.1f} KiB"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite')
+    parser.add_argument('--filter', default='*', help='Glob on case names, e.g. "decode/*"')
+    parser.add_argument('--list', action='store_true', help='List the cases and exit')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs per case, the best one counts')
+    parser.add_argument('--output', metavar='FILE', help='Write the results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='Compare with results saved by --output')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change flagged as regression')
+    args = parser.parse_args()
+
+    names = [name for name in CASES if fnmatch.fnmatch(name, args.filter) or args.filter in name]
+    if args.list:
+        print('\n'.join(names))
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    print(f"{'case':<32} {'ops/s':>14} {'peak KiB':>10} {'blocks/op':>10} {'vs base':>9}")
+    results = {}
+    for name in names:
+        random.seed(0)
+        fn, ops_per_call = CASES[name]()
+        result = results[name] = measure(fn, ops_per_call, args.min_time, args.repeat)
+        change = ''
+        if name in baseline:
+            change = f"{result['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1:+.1%}"
+        print(f"{name:<32} {result['ops_per_sec']:>14,.0f} {result['peak_kib']:>10.1f} "
+              f"{result['blocks_per_op']:>10.3f} {change:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'version': RESULTS_VERSION,
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'machine': platform.machine(),
+                'system': platform.system(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'results': results,
+            }, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, message in regressions:
+            print(f"REGRESSION {name}: {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,49 @@
+from core.startup import timeline
 import sys
 import argparse
-from core.beacon_core import BeaconCore
-import platform
 import time
+from core.defaults import DEFAULT_SOCKET_PATH
+# The modules of the other modes (feed, schema, multi-adapter, metrics) and of the platform are imported
+# when they are used: startup is on the critical path when a supervisor relaunches the beacon
+timeline.mark('imports')
 
-def get_platform_transmitter():
-    """Return the corresponding broadcasting device implementation based on the operating system"""
-    system = platform.system().lower()
-    
-    if system == 'darwin':  # macOS
+def get_platform_transmitter(capability_cache=None):
+    """
+    Return the corresponding broadcasting device implementation based on the operating system
+    :param capability_cache: optional AdapterCache of the Linux adapter capabilities
+    """
+    if sys.platform == 'darwin':  # macOS
         from platforms.macos import MacOSTransmitter
         return MacOSTransmitter()
-    elif system == 'linux':
+    elif sys.platform.startswith('linux'):
         from platforms.linux import LinuxTransmitter
-        return LinuxTransmitter()
+        return LinuxTransmitter(capability_cache=capability_cache)
     else:
-        raise Exception(f"Unsupported operating system: {system}")
+        raise Exception(f"Unsupported operating system: {sys.platform}")
+
+def run_multi_adapter(config_path: str, capability_cache=None):
+    """Broadcast the beacons of a config file, one worker thread per adapter"""
+    from core.multi_adapter import MultiAdapterBroadcaster, load_config
+    from platforms.linux import LinuxTransmitter
+    try:
+        assignment, repeat_interval = load_config(config_path)
+        broadcaster = MultiAdapterBroadcaster(
+            assignment, repeat_interval,
+            lambda dev_id: LinuxTransmitter(dev_id, capability_cache=capability_cache))
+        broadcaster.start()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        print(f"Broadcasting on {', '.join(f'hci{i}' for i in sorted(assignment))}, press CTRL+C to stop...")
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        broadcaster.stop()
+        print("broadcaster stopped")
+    for name, stats in broadcaster.stats().items():
+        print(f"{name}: {stats}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -28,13 +56,32 @@ Examples:
 
   # Create broadcasting data with device message
   python broadcaster.py --hwid 0123456789 --message 0123456789ABCDEF
+
+  # Keep running and accept live updates on a control socket
+  python broadcaster.py --hwid 0123456789 --daemon
+  printf 'MSG 0102\nSTATUS\n' | nc -U /tmp/line-simple-beacon.sock
+
+  # Stream device messages, one hex string per line, newest value wins
+  sensor-reader | python broadcaster.py --hwid 0123456789 --feed - --min-interval 0.1
+
+  # Pack sensor values into the device message with a schema
+  python broadcaster.py --hwid 0123456789 --schema sensor.json --values temperature=21.5,humidity=40
+  sensor-reader | python broadcaster.py --hwid 0123456789 --schema sensor.json --feed -
+
+  # Linux: broadcast the beacons of a config file from all adapters (hci0..hciN)
+  python broadcaster.py --config beacons.json
+
+  # Serve latency histograms and counters on http://127.0.0.1:9464/metrics
+  python broadcaster.py --hwid 0123456789 --daemon --metrics-port 9464
+
+  # Break down the time to the first advertisement
+  python broadcaster.py --hwid 0123456789 --timing
         """
     )
     
     parser.add_argument(
         '--hwid',
-        required=True,
-        help='Hardware ID (10 hexadecimal characters)'
+        help='Hardware ID (10 hexadecimal characters), required unless --config is given'
     )
     
     parser.add_argument(
@@ -43,8 +90,83 @@ Examples:
         help='Device message (hexadecimal string, up to 13 bytes)'
     )
     
+    parser.add_argument(
+        '--schema',
+        help='JSON message schema: --values, --feed lines and REC commands are sensor records packed with it'
+    )
+
+    parser.add_argument(
+        '--values',
+        help='Sensor record for --schema, name=value pairs (e.g. temperature=21.5,humidity=40) or a JSON object'
+    )
+
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Accept MSG/REC/HWID/START/STOP/STATUS/METRICS commands on a Unix domain socket'
+    )
+
+    parser.add_argument(
+        '--socket',
+        default=DEFAULT_SOCKET_PATH,
+        help=f'Control socket path for --daemon (default: {DEFAULT_SOCKET_PATH})'
+    )
+
+    parser.add_argument(
+        '--feed',
+        help='Read device messages line by line from a file or FIFO ("-" for stdin)'
+    )
+
+    parser.add_argument(
+        '--min-interval',
+        type=float,
+        default=0.0,
+        help='Minimum seconds between two device message updates for --feed'
+    )
+
+    parser.add_argument(
+        '--config',
+        help='Linux only: JSON file of beacons to broadcast from all adapters concurrently'
+    )
+
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Record metrics and serve them over HTTP on 127.0.0.1 (/metrics Prometheus text, /metrics.json)'
+    )
+
+    parser.add_argument(
+        '--timing',
+        action='store_true',
+        help='Print the time spent in each startup step up to the first advertisement'
+    )
+
+    parser.add_argument(
+        '--no-adapter-cache',
+        action='store_true',
+        help='Linux: probe the adapter capabilities instead of using the cached probe of a previous start'
+    )
+
     args = parser.parse_args()
-    
+    timeline.mark('arguments')
+
+    if args.metrics_port is not None:
+        from core.metrics import registry, MetricsServer
+        registry.enable()
+        MetricsServer(registry, args.metrics_port).start()
+
+    capability_cache = None
+    if not args.no_adapter_cache:
+        from core.adapter_cache import AdapterCache
+        capability_cache = AdapterCache()
+
+    if args.config:
+        run_multi_adapter(args.config, capability_cache)
+        return
+
+    if not args.hwid:
+        parser.error("--hwid is required")
+
     try:
         # check hwid length
         if len(args.hwid) != 10 or not all(c in '0123456789abcdefABCDEF' for c in args.hwid):
@@ -54,27 +176,72 @@ Examples:
         if len(args.message) % 2 != 0:
             raise Exception("Device message must be an even length hexadecimal string (each two characters represent 1 byte)")
 
+        # pack the sensor record, replaces --message
+        codec = None
+        if args.schema:
+            from core.codec import load_schema, parse_record
+            codec = load_schema(args.schema)
+        message = args.message
+        if args.values:
+            if codec is None:
+                raise Exception("--values needs --schema")
+            message = codec.encode(parse_record(args.values))
+
         # get the corresponding platform transmitter
-        transmitter = get_platform_transmitter()
+        transmitter = get_platform_transmitter(capability_cache)
+        timeline.mark('platform import')
+
+        # the advertising data is ready before the adapter, initialize() sends it as soon as it can
+        transmitter.prepare(args.hwid, message)
+        timeline.mark('advertising data')
 
         # initialize and start broadcasting
         if not transmitter.initialize():
             raise Exception("Failed to initialize transmitter")
 
-        if not transmitter.start_advertising(args.hwid, args.message):
+        if not transmitter.start_advertising(args.hwid, message):
             raise Exception("Failed to start advertising")
-        
+        timeline.mark('first advertisement')
+        if args.timing:
+            print(timeline.report())
+
         try:
-            print("Running, press CTRL+C to stop...")
-            while True:
-                time.sleep(1)
+            if args.daemon:
+                from core.daemon import ControlServer
+                server = ControlServer(transmitter, args.hwid, message, args.socket, codec, advertising=True)
+                server.start()
+                print(f"Listening on {args.socket}, press CTRL+C to stop...")
+                try:
+                    server.serve_forever()
+                finally:
+                    server.close()
+            elif args.feed:
+                from core.feed import MessageFeed
+                feed = MessageFeed(transmitter, args.hwid, args.min_interval, codec)
+                feed.start()
+                print("Reading device messages, press CTRL+C to stop...")
+                try:
+                    if args.feed == '-':
+                        feed.feed(sys.stdin)
+                    else:
+                        with open(args.feed) as f:
+                            feed.feed(f)
+                finally:
+                    feed.close()
+                    print(f"Feed: {feed.stats()}")
+                while True:
+                    time.sleep(1)
+            else:
+                print("Running, press CTRL+C to stop...")
+                while True:
+                    time.sleep(1)
         except KeyboardInterrupt:
             transmitter.stop_advertising()
             print("broadcaster stopped")
 
         # output result
         print(f"HWID: {args.hwid}")
-        print(f"Device message: {args.message}")
+        print(f"Device message: {message if isinstance(message, str) else message.hex()}")
         
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
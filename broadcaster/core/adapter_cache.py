@@ -0,0 +1,93 @@
+"""
+Adapter capability cache
+The LE features and the number of advertising sets of a controller do not change
+between runs, so the probe result of each adapter is kept in a small JSON file
+and repeat starts skip those HCI round-trips.
+
+An entry is only used while the adapter is the same device (sysfs path of hciN,
+e.g. the USB port of a dongle) and younger than max_age. The transmitter drops
+the entry when a command based on it fails and probes again.
+"""
+
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'line-simple-beacon', 'adapters.json')
+
+# Seconds an entry is trusted
+DEFAULT_MAX_AGE = 7 * 24 * 3600.0
+
+
+def adapter_identity(dev_id: int) -> str:
+    """:return: str, sysfs device path of hci<dev_id>, empty when there is none (e.g. simulated controller)"""
+    path = f'/sys/class/bluetooth/hci{dev_id}'
+    return os.path.realpath(path) if os.path.exists(path) else ''
+
+
+class AdapterCache():
+    """Probe results per adapter index, read once and written through"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_age: float = DEFAULT_MAX_AGE, identity=adapter_identity):
+        """
+        :param path: JSON file, created on the first store
+        :param max_age: seconds an entry is trusted
+        :param identity: callable(dev_id) returning a string that changes when the adapter is replaced
+        """
+        self.path = path
+        self.max_age = max_age
+        self._identity = identity
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                # Missing or corrupted, it is only a cache
+                self._entries = {}
+        return self._entries
+
+    def _store(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = f'{self.path}.{os.getpid()}'
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"Error writing adapter cache {self.path}: {e}")
+
+    def get(self, dev_id: int):
+        """:return: (le_features, max_sets) of a valid entry, None otherwise"""
+        with self._lock:
+            entry = self._load().get(str(dev_id))
+            if not isinstance(entry, dict):
+                return None
+            try:
+                if (entry['identity'] != self._identity(dev_id)
+                        or not 0 <= time.time() - entry['probed'] <= self.max_age):
+                    return None
+                return int(entry['le_features']), int(entry['max_sets'])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+    def put(self, dev_id: int, le_features: int, max_sets: int) -> None:
+        with self._lock:
+            self._load()[str(dev_id)] = {
+                'identity': self._identity(dev_id),
+                'probed': time.time(),
+                'le_features': le_features,
+                'max_sets': max_sets,
+            }
+            self._store()
+
+    def invalidate(self, dev_id: int) -> None:
+        with self._lock:
+            if self._load().pop(str(dev_id), None) is not None:
+                self._store()
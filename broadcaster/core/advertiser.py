@@ -0,0 +1,78 @@
+"""
+State-reconciling legacy advertiser
+Track what the controller currently holds (parameters, data, enabled) and
+only send the HCI commands needed to reach the requested state.
+"""
+
+from core.hci import (
+    HCITransport, HCIError, build_advertising_data, STATUS_COMMAND_DISALLOWED,
+    OGF_LE_CTL, OCF_LE_SET_ADVERTISING_PARAMETERS, OCF_LE_SET_ADVERTISING_DATA,
+)
+
+class Advertiser():
+    """Keep one legacy advertising set in sync with the desired state"""
+
+    def __init__(self, transport: HCITransport):
+        self.transport = transport
+        # Known controller state, None means unknown
+        self.parameters = None
+        self.data = None
+        self.enabled = None
+        # Counters
+        self.updates = 0
+        self.commands_sent = 0
+        self.last_update_commands = 0
+
+    def invalidate(self) -> None:
+        """Forget the controller state (e.g. after a reset), next update sends everything"""
+        self.parameters = None
+        self.data = None
+        self.enabled = None
+
+    def update(self, data: bytes = None, parameters: bytes = None, enabled: bool = True) -> int:
+        """
+        Reconcile the controller with the requested state
+        :param data: advertising data (up to 31 bytes), None keeps the current data
+        :param parameters: LE Set Advertising Parameters payload, None keeps the current parameters
+        :param enabled: whether advertising should be on afterwards
+        :return: int, number of HCI commands sent for this update
+        """
+        sent = 0
+        # Data is compared in its padded form, that is what the controller holds
+        if data is not None:
+            data = build_advertising_data(data)
+        params_changed = parameters is not None and parameters != self.parameters
+        data_changed = data is not None and data != self.data
+
+        # Parameters can only be changed while advertising is disabled
+        if params_changed and self.enabled is not False:
+            sent += self._set_enable(False)
+
+        if params_changed:
+            self.transport.send_command(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_PARAMETERS, parameters)
+            self.parameters = parameters
+            sent += 1
+
+        # Advertising data can be replaced while advertising stays on
+        if data_changed:
+            self.transport.send_command(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_DATA, data)
+            self.data = data
+            sent += 1
+
+        if enabled != self.enabled:
+            sent += self._set_enable(enabled)
+
+        self.updates += 1
+        self.commands_sent += sent
+        self.last_update_commands = sent
+        return sent
+
+    def _set_enable(self, enable: bool) -> int:
+        try:
+            self.transport.set_advertise_enable(enable)
+        except HCIError as e:
+            # Controllers answer "Command Disallowed" when advertising is already off
+            if enable or e.status != STATUS_COMMAND_DISALLOWED:
+                raise
+        self.enabled = enable
+        return 1
@@ -14,25 +14,137 @@ ADTYPE_FLAGS = 0x01
 ADTYPE_COMPLETE_16_BIT_SERVICE_UUID = 0x03
 ADTYPE_SERVICE_DATA = 0x16
 
+# LE General Discoverable Mode, BR/EDR not supported
+FLAGS_LE_GENERAL_DISCOVERABLE = 0x06
+
 # LINE Simple Beacon UUID (little-endian)
 UUID16LE_FOR_LINECORP = bytes([0x6f, 0xfe])
 
+# Legacy advertising data layout, one frame per 31 bytes:
+# [02 01 06] flags
+# [03 03 6f fe] complete list of 16-bit service UUIDs
+# [len 16 6f fe 02 hwid(5) tx_power message(0~13)] service data
+ADV_DATA_LENGTH = 31
+HWID_BYTES = HWID_LENGTH // 2
+SERVICE_DATA_LENGTH_OFFSET = 7
+HWID_OFFSET = 12
+MEASURED_POWER_OFFSET = HWID_OFFSET + HWID_BYTES
+DEVICE_MESSAGE_OFFSET = MEASURED_POWER_OFFSET + 1
+
+_ADV_DATA_HEADER = (
+    bytes([0x02, ADTYPE_FLAGS, FLAGS_LE_GENERAL_DISCOVERABLE])
+    + bytes([0x03, ADTYPE_COMPLETE_16_BIT_SERVICE_UUID]) + UUID16LE_FOR_LINECORP
+    + bytes([0x00, ADTYPE_SERVICE_DATA]) + UUID16LE_FOR_LINECORP + bytes([FRAME_TYPE])
+)
+# service data length byte = type + uuid + frame type + hwid + tx power + message
+_SERVICE_DATA_BASE_LENGTH = 1 + len(UUID16LE_FOR_LINECORP) + 1 + HWID_BYTES + 1
+
+
+def _hex_bytes(value: str, name: str) -> bytes:
+    """Decode a hex string; whitespace, which bytes.fromhex skips, is rejected too"""
+    try:
+        data = bytes.fromhex(value)
+    except ValueError:
+        data = None
+    if data is None or len(data) * 2 != len(value):
+        raise ValueError(f"{name} must be a hexadecimal string")
+    return data
+
+
+def _pack_fixed(values, width: int, name: str, exact: bool):
+    """
+    Pack hex strings or raw bytes into one contiguous blob of `width` bytes per value (zero padded)
+    Validation is done once for the whole batch: hex decoding happens in a single bytes.fromhex call.
+    :return: (blob, lengths)
+    """
+    if all(isinstance(v, str) for v in values):
+        lengths = [len(v) for v in values]
+        if exact:
+            if any(n != width * 2 for n in lengths):
+                raise ValueError(f"{name} must be {width * 2} hexadecimal characters")
+        elif any(n % 2 or n > width * 2 for n in lengths):
+            raise ValueError(f"{name} must be an even length hexadecimal string of up to {width} bytes")
+        try:
+            blob = bytes.fromhex(''.join(v.ljust(width * 2, '0') for v in values))
+        except ValueError:
+            blob = None
+        # Whitespace passes the length check above and bytes.fromhex, but decodes short
+        if blob is None or len(blob) != width * len(values):
+            raise ValueError(f"{name} must be a hexadecimal string")
+        return blob, [n // 2 for n in lengths]
+
+    values = [_hex_bytes(v, name) if isinstance(v, str) else v for v in values]
+    lengths = [len(v) for v in values]
+    if exact:
+        if any(n != width for n in lengths):
+            raise ValueError(f"{name} must be {width} bytes")
+    elif any(n > width for n in lengths):
+        raise ValueError(f"{name} must be up to {width} bytes")
+    return b''.join(bytes(v).ljust(width, b'\x00') for v in values), lengths
+
+
 class BeaconCore:
     """LINE Simple Beacon core functionality class"""
 
     @classmethod
-    def build_line_simple_beacon_service_data(cls, hwid: str, device_message: str) -> bytes:
+    def build_line_simple_beacon_service_data(cls, hwid, device_message) -> bytes:
         """
         assemble LINE Simple Beacon Service Data
-        :param hwid: 10 hex string
-        :param device_message: 1~13 bytes hex string
+        :param hwid: 10 hex string or 5 bytes
+        :param device_message: 1~13 bytes, hex string or bytes (e.g. from MessageCodec.encode)
         :return: bytes, content is 0x6f, 0xfe + line_simple_beacon_frame (frame_type + hwid in bytes + measured_tx_power + device_message)
         """
 
         frame_type = bytes([FRAME_TYPE])
-        hwid_bytes = bytes.fromhex(hwid)
-        device_message_bytes = bytes.fromhex(device_message)
+        hwid_bytes = _hex_bytes(hwid, "HWID") if isinstance(hwid, str) else bytes(hwid)
+        device_message_bytes = (
+            _hex_bytes(device_message, "Device message") if isinstance(device_message, str) else bytes(device_message))
         measured_tx_power = bytes([DEFAULT_MEASURED_POWER])
         line_simple_beacon_frame = frame_type + hwid_bytes + measured_tx_power + device_message_bytes
         uuid16le = bytes(UUID16LE_FOR_LINECORP)
-        return uuid16le + line_simple_beacon_frame
\ No newline at end of file
+        return uuid16le + line_simple_beacon_frame
+
+    @classmethod
+    def build_advertising_data(cls, hwid, device_message='') -> bytes:
+        """
+        assemble the complete 31 bytes advertising data (flags + service UUID + service data) of one frame
+        :param hwid: 10 hex string or 5 bytes
+        :param device_message: 0~13 bytes, hex string or bytes
+        :return: bytes, zero padded to 31 bytes
+        """
+        return bytes(cls.build_advertising_data_batch([(hwid, device_message)])[0])
+
+    @classmethod
+    def build_advertising_data_batch(cls, frames, out=None, measured_power: int = DEFAULT_MEASURED_POWER) -> list:
+        """
+        assemble the advertising data of many frames into one buffer, 31 bytes per frame
+        :param frames: sequence of (hwid, device_message), each as hex string or bytes
+        :param out: optional writable buffer (bytearray / memoryview / numpy uint8 array) of at least 31 * len(frames) bytes
+        :param measured_power: measured TX power byte written into every frame
+        :return: list of memoryview, one 31 bytes slice of the buffer per frame
+        """
+        frames = list(frames)
+        count = len(frames)
+        size = count * ADV_DATA_LENGTH
+        hwid_blob, _ = _pack_fixed([f[0] for f in frames], HWID_BYTES, "HWID", exact=True)
+        message_blob, message_lengths = _pack_fixed(
+            [f[1] for f in frames], MAX_DEVICE_MESSAGE_LENGTH, "Device message", exact=False)
+
+        template = _ADV_DATA_HEADER + bytes(HWID_BYTES) + bytes([measured_power]) + bytes(MAX_DEVICE_MESSAGE_LENGTH)
+        if out is None:
+            buffer = memoryview(bytearray(template * count))
+        else:
+            buffer = memoryview(out).cast('B')
+            if len(buffer) < size:
+                raise ValueError(f"Output buffer too small, need {size} bytes")
+            buffer[:size] = template * count
+
+        # Fill each column of the fixed stride layout with one strided copy
+        buffer[SERVICE_DATA_LENGTH_OFFSET:size:ADV_DATA_LENGTH] = bytes(
+            _SERVICE_DATA_BASE_LENGTH + n for n in message_lengths)
+        for i in range(HWID_BYTES):
+            buffer[HWID_OFFSET + i:size:ADV_DATA_LENGTH] = hwid_blob[i::HWID_BYTES]
+        for i in range(MAX_DEVICE_MESSAGE_LENGTH):
+            buffer[DEVICE_MESSAGE_OFFSET + i:size:ADV_DATA_LENGTH] = message_blob[i::MAX_DEVICE_MESSAGE_LENGTH]
+
+        return [buffer[i:i + ADV_DATA_LENGTH] for i in range(0, size, ADV_DATA_LENGTH)]
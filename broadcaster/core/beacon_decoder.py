@@ -0,0 +1,162 @@
+"""
+LINE Simple Beacon decoder
+Inverse of BeaconCore: walk the length-type-value AD structures of a raw
+advertising payload and decode LINE Simple Beacon service data.
+Every value is a memoryview slice of the payload, nothing is copied.
+"""
+
+from core.beacon_core import (
+    FRAME_TYPE, HWID_BYTES, ADTYPE_FLAGS, ADTYPE_SERVICE_DATA, UUID16LE_FOR_LINECORP,
+)
+
+# More AD types
+ADTYPE_INCOMPLETE_16_BIT_SERVICE_UUID = 0x02
+ADTYPE_COMPLETE_16_BIT_SERVICE_UUID = 0x03
+ADTYPE_SHORTENED_LOCAL_NAME = 0x08
+ADTYPE_COMPLETE_LOCAL_NAME = 0x09
+ADTYPE_MANUFACTURER_SPECIFIC_DATA = 0xFF
+
+LINECORP_UUID16 = UUID16LE_FOR_LINECORP[0] | (UUID16LE_FOR_LINECORP[1] << 8)
+
+# service data value: uuid(2) + frame type(1) + hwid(5) + measured tx power(1) + message(0~13)
+_LINE_MIN_SERVICE_DATA = 2 + 1 + HWID_BYTES + 1
+
+
+class LineSimpleBeacon():
+    """Decoded LINE Simple Beacon frame"""
+
+    __slots__ = ('hwid', 'measured_power', 'device_message')
+
+    def __init__(self, hwid, measured_power: int, device_message):
+        self.hwid = hwid                        # memoryview, 5 bytes
+        self.measured_power = measured_power    # int, signed dBm at 1 m
+        self.device_message = device_message    # memoryview, 0~13 bytes
+
+    @property
+    def hwid_hex(self) -> str:
+        return self.hwid.hex()
+
+    @property
+    def device_message_hex(self) -> str:
+        return self.device_message.hex()
+
+    def __repr__(self) -> str:
+        return f"LineSimpleBeacon(hwid={self.hwid_hex}, measured_power={self.measured_power}, device_message={self.device_message_hex})"
+
+
+class AdvertisingData():
+    """AD structures of one advertising payload"""
+
+    __slots__ = ('flags', 'service_uuids', 'service_data', 'manufacturer_data', 'local_name', 'line_beacon')
+
+    def __init__(self):
+        self.flags = None               # int
+        self.service_uuids = []         # list of int, 16-bit UUIDs
+        self.service_data = []          # list of (int uuid, memoryview data after the uuid)
+        self.manufacturer_data = None   # memoryview, company ID (LE) + data
+        self.local_name = None          # memoryview
+        self.line_beacon = None         # LineSimpleBeacon
+
+    @property
+    def company_id(self):
+        """:return: int, little-endian company ID of the manufacturer data, or None"""
+        data = self.manufacturer_data
+        if data is None or len(data) < 2:
+            return None
+        return data[0] | (data[1] << 8)
+
+
+def iter_ad_structures(payload):
+    """
+    Walk the AD structures of an advertising payload
+    :return: generator of (ad_type, memoryview value); stops at zero padding or a truncated structure
+    """
+    view = memoryview(payload)
+    offset = 0
+    end = len(view)
+    while offset < end:
+        length = view[offset]
+        if length == 0 or offset + 1 + length > end:
+            return
+        yield view[offset + 1], view[offset + 2:offset + 1 + length]
+        offset += 1 + length
+
+
+def find_ad_structure(payload, ad_type: int):
+    """:return: memoryview of the first AD structure value of ad_type, or None"""
+    for found_type, value in iter_ad_structures(payload):
+        if found_type == ad_type:
+            return value
+    return None
+
+
+def decode_line_simple_beacon_service_data(service_data):
+    """
+    Inverse of BeaconCore.build_line_simple_beacon_service_data
+    :param service_data: 0x6f, 0xfe + frame type + hwid + measured tx power + device message
+    :return: LineSimpleBeacon or None
+    """
+    view = memoryview(service_data)
+    if (len(view) < _LINE_MIN_SERVICE_DATA or len(view) > _LINE_MIN_SERVICE_DATA + 13
+            or view[0] != UUID16LE_FOR_LINECORP[0] or view[1] != UUID16LE_FOR_LINECORP[1]
+            or view[2] != FRAME_TYPE):
+        return None
+    power = view[3 + HWID_BYTES]
+    return LineSimpleBeacon(
+        view[3:3 + HWID_BYTES],
+        power - 256 if power > 127 else power,
+        view[_LINE_MIN_SERVICE_DATA:],
+    )
+
+
+def decode_line_simple_beacon(payload):
+    """
+    Find and decode the LINE Simple Beacon service data of an advertising payload
+    :return: LineSimpleBeacon or None
+    """
+    view = memoryview(payload)
+    offset = 0
+    end = len(view)
+    while offset < end:
+        length = view[offset]
+        if length == 0 or offset + 1 + length > end:
+            return None
+        if view[offset + 1] == ADTYPE_SERVICE_DATA:
+            beacon = decode_line_simple_beacon_service_data(view[offset + 2:offset + 1 + length])
+            if beacon is not None:
+                return beacon
+        offset += 1 + length
+    return None
+
+
+def decode_advertising_data(payload) -> AdvertisingData:
+    """Decode flags, service UUIDs, service data, manufacturer data, local name and LINE Simple Beacon"""
+    result = AdvertisingData()
+    for ad_type, value in iter_ad_structures(payload):
+        if ad_type == ADTYPE_SERVICE_DATA:
+            if len(value) >= 2:
+                result.service_data.append((value[0] | (value[1] << 8), value[2:]))
+                if result.line_beacon is None:
+                    result.line_beacon = decode_line_simple_beacon_service_data(value)
+        elif ad_type == ADTYPE_MANUFACTURER_SPECIFIC_DATA:
+            result.manufacturer_data = value
+        elif ad_type == ADTYPE_FLAGS:
+            if len(value):
+                result.flags = value[0]
+        elif ad_type == ADTYPE_COMPLETE_16_BIT_SERVICE_UUID or ad_type == ADTYPE_INCOMPLETE_16_BIT_SERVICE_UUID:
+            result.service_uuids.extend(value[i] | (value[i + 1] << 8) for i in range(0, len(value) - 1, 2))
+        elif ad_type == ADTYPE_COMPLETE_LOCAL_NAME:
+            result.local_name = value
+        elif ad_type == ADTYPE_SHORTENED_LOCAL_NAME and result.local_name is None:
+            result.local_name = value
+    return result
+
+
+def decode_batch(payloads, line_only: bool = False) -> list:
+    """
+    Decode many payloads, e.g. the memoryviews returned by BeaconCore.build_advertising_data_batch
+    :param line_only: only look for LINE Simple Beacon frames (faster), list items are LineSimpleBeacon or None
+    :return: list of AdvertisingData (or LineSimpleBeacon / None with line_only)
+    """
+    decode = decode_line_simple_beacon if line_only else decode_advertising_data
+    return [decode(payload) for payload in payloads]
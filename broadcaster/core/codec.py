@@ -0,0 +1,354 @@
+"""
+Device message codec
+Pack sensor records into the 13 bytes device message of a LINE Simple Beacon
+with a schema compiled once into a struct.Struct, no hex strings involved.
+
+Field kinds:
+    value     integer of 1..64 bits, optionally fixed-point: raw = round((value - offset) / scale)
+    float     IEEE half (16 bits) or single (32 bits) precision float
+    sequence  counter incremented by every encode(), wraps around; receivers detect lost updates
+    delta     change of the value since the previous encode(), in scale units, signed; the encoder
+              carries what did not fit into the next message so the receiver's sum stays exact
+
+The sequence and delta state only moves once a whole message has packed: encode() commits
+it right away, prepare() / commit() let the caller commit after the message was sent.
+
+Fields are packed MSB first in schema order. Runs of fields that are not whole
+bytes (e.g. 4 + 10 + 7 + 3 bits) are packed together into a few integer words;
+8/16/32/64 bit fields on a byte boundary and floats map to struct codes directly.
+
+    codec = MessageCodec([
+        Field('seq', 4, kind='sequence'),
+        Field('temperature', 10, scale=0.1, offset=-20.0),  # -20.0 .. 82.3
+        Field('humidity', 7),
+        Field('battery', 3, scale=0.25, offset=2.0),        # 2.0 .. 3.75 V
+        Field('pressure', 16, scale=0.1, offset=800.0),
+    ])
+    message = codec.encode({'temperature': 21.5, 'humidity': 40, 'battery': 3.0, 'pressure': 1013.2})
+    BeaconCore.build_advertising_data(hwid, message)
+"""
+
+import json
+import struct
+
+from core.beacon_core import MAX_DEVICE_MESSAGE_LENGTH
+
+KINDS = ('value', 'float', 'sequence', 'delta')
+
+_FLOAT_CODES = {16: 'e', 32: 'f'}
+_INT_CODES = {8: 'B', 16: 'H', 32: 'I', 64: 'Q'}
+_WORD_BYTES = (8, 4, 2, 1)
+
+
+class _EncoderState():
+    """Sequence and delta baselines of the messages being encoded, a copy until committed"""
+
+    __slots__ = ('sequence', 'previous')
+
+    def __init__(self, sequence: int, previous: dict):
+        self.sequence = sequence
+        self.previous = previous
+
+
+class Field():
+    """One field of a message schema"""
+
+    __slots__ = ('name', 'bits', 'signed', 'scale', 'offset', 'kind', 'clamp', 'mask', 'min', 'max', 'exact')
+
+    def __init__(self, name: str, bits: int, signed: bool = False, scale: float = 1, offset: float = 0,
+                 kind: str = 'value', clamp: bool = False):
+        """
+        :param bits: width, 1..64 (16 or 32 for floats)
+        :param signed: two's complement raw value
+        :param scale: value of one raw unit (fixed-point), value and delta fields
+        :param offset: value of raw 0, value fields
+        :param clamp: clamp out of range values instead of raising ValueError (delta fields always clamp
+            and carry the rest over to the next message)
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Field {name}: unknown kind {kind}")
+        if kind == 'float' and bits not in _FLOAT_CODES:
+            raise ValueError(f"Field {name}: floats are 16 or 32 bits")
+        if not 1 <= bits <= 64:
+            raise ValueError(f"Field {name}: bits must be 1..64")
+        if scale == 0:
+            raise ValueError(f"Field {name}: scale must not be 0")
+        if kind == 'delta' and not signed:
+            # An unsigned delta would clamp every decrease to 0 and never send it
+            raise ValueError(f"Field {name}: delta fields must be signed")
+        self.name = name
+        self.bits = bits
+        self.signed = signed
+        self.scale = scale
+        self.offset = offset
+        self.kind = kind
+        self.clamp = clamp
+        self.mask = (1 << bits) - 1
+        self.min = -(1 << (bits - 1)) if signed else 0
+        self.max = (1 << (bits - 1)) - 1 if signed else self.mask
+        # Plain integers skip the float conversion
+        self.exact = scale == 1 and offset == 0
+
+    @classmethod
+    def from_dict(cls, config: dict) -> 'Field':
+        return cls(config['name'], config['bits'], config.get('signed', False), config.get('scale', 1),
+                   config.get('offset', 0), config.get('kind', 'value'), config.get('clamp', False))
+
+    def __repr__(self) -> str:
+        return f"Field({self.name!r}, {self.bits}, kind={self.kind!r})"
+
+
+class MessageCodec():
+    """Schema compiled into one struct.Struct; encoding keeps the sequence / delta state"""
+
+    def __init__(self, fields: list, max_size: int = MAX_DEVICE_MESSAGE_LENGTH):
+        """
+        :param fields: list of Field, in message order
+        :param max_size: maximum message size in bytes
+        """
+        names = [field.name for field in fields]
+        if len(set(names)) != len(names):
+            raise ValueError("Field names must be unique")
+        self.fields = list(fields)
+        self._plan = []  # ('native', field) or ('run', fields, pad bits, word shifts)
+        codes = []
+        run = []
+        for field in self.fields:
+            run_bits = sum(f.bits for f in run)
+            if field.kind == 'float':
+                self._flush_run(run, codes)
+                run = []
+                self._plan.append(('native', field))
+                codes.append(_FLOAT_CODES[field.bits])
+            elif field.bits in _INT_CODES and run_bits % 8 == 0:
+                self._flush_run(run, codes)
+                run = []
+                self._plan.append(('native', field))
+                code = _INT_CODES[field.bits]
+                codes.append(code.lower() if field.signed else code)
+            else:
+                run.append(field)
+        self._flush_run(run, codes)
+        self.struct = struct.Struct('>' + ''.join(codes))
+        self.size = self.struct.size
+        if self.size > max_size:
+            raise ValueError(f"Schema needs {self.size} bytes, device messages are up to {max_size} bytes")
+        # Encoder state
+        self.sequence = 0
+        self._previous = {}
+        self._deltas = any(field.kind == 'delta' for field in self.fields)
+        self._values = self._compile_encoder()
+
+    def _flush_run(self, run: list, codes: list) -> None:
+        """Split a run of bit fields, padded to whole bytes, into the fewest big-endian words"""
+        if not run:
+            return
+        bits = sum(field.bits for field in run)
+        size = (bits + 7) // 8
+        shifts = []
+        remaining = size
+        while remaining:
+            word = next(n for n in _WORD_BYTES if n <= remaining)
+            remaining -= word
+            codes.append(_INT_CODES[word * 8])
+            shifts.append((remaining * 8, (1 << (word * 8)) - 1))
+        self._plan.append(('run', tuple(run), size * 8 - bits, tuple(shifts)))
+
+    def _converter(self, field: Field):
+        """:return: function (record, state) -> raw integer (float for float fields) of one field"""
+        name = field.name
+        kind = field.kind
+        if kind == 'float':
+            return lambda record, state: float(record[name])
+        if kind == 'sequence':
+            mask = field.mask
+
+            def sequence(record, state):
+                value = record.get(name)
+                return (state.sequence if value is None else int(value)) & mask
+            return sequence
+        low, high, scale, offset = field.min, field.max, field.scale, field.offset
+        if kind == 'delta':
+
+            def delta(record, state):
+                value = record[name]
+                previous = state.previous
+                last = previous.get(name)
+                if last is None:
+                    previous[name] = value
+                    return 0
+                raw = min(max(round((value - last) / scale), low), high)
+                # What the receiver has summed up so far
+                previous[name] = last + raw * scale
+                return raw
+            return delta
+        clamp = field.clamp
+        exact = field.exact
+
+        def value(record, state):
+            value = record[name]
+            raw = (value if type(value) is int else round(value)) if exact else round((value - offset) / scale)
+            if raw < low or raw > high:
+                if not clamp:
+                    raise ValueError(f"{name}={value} out of range")
+                raw = min(max(raw, low), high)
+            return raw
+        return value
+
+    def _compile_encoder(self):
+        """:return: function (record, state) -> list of the struct arguments, one converter call per field"""
+        steps = []
+        for item in self._plan:
+            if item[0] == 'native':
+                steps.append((self._converter(item[1]), None, 0, ()))
+            else:
+                _, run, pad, shifts = item
+                converters = tuple((self._converter(field), field.bits, field.mask) for field in run)
+                steps.append((None, converters, pad, shifts))
+
+        def values_of(record, state):
+            values = []
+            append = values.append
+            for convert, run, pad, shifts in steps:
+                if run is None:
+                    append(convert(record, state))
+                    continue
+                word = 0
+                for convert, bits, mask in run:
+                    word = (word << bits) | (convert(record, state) & mask)
+                word <<= pad
+                for shift, mask in shifts:
+                    append((word >> shift) & mask)
+            state.sequence += 1
+            return values
+        return values_of
+
+    def _state(self) -> _EncoderState:
+        # Only delta fields write baselines, the others share the committed (empty) dict
+        return _EncoderState(self.sequence, dict(self._previous) if self._deltas else self._previous)
+
+    def commit(self, state: _EncoderState) -> None:
+        """Advance the sequence / delta state past messages returned by prepare()"""
+        self.sequence = state.sequence
+        self._previous = state.previous
+
+    def prepare(self, record: dict) -> tuple:
+        """
+        Encode a message without moving the sequence / delta state
+        :param record: dict of field name -> value, sequence fields may be left out
+        :return: (bytes, state), pass state to commit() once the message was sent
+        """
+        state = self._state()
+        return self.struct.pack(*self._values(record, state)), state
+
+    def encode(self, record: dict) -> bytes:
+        """
+        :param record: dict of field name -> value, sequence fields may be left out
+        :return: bytes, the device message
+        """
+        message, state = self.prepare(record)
+        self.commit(state)
+        return message
+
+    def encode_batch(self, records, out=None) -> list:
+        """
+        Encode many records into one contiguous buffer
+        :param out: optional writable buffer of at least size * len(records) bytes
+        :return: list of memoryview, one message per record, usable as BeaconCore.build_advertising_data_batch messages
+        """
+        records = list(records)
+        size = self.size
+        buffer = memoryview(out if out is not None else bytearray(size * len(records))).cast('B')
+        if len(buffer) < size * len(records):
+            raise ValueError(f"Output buffer too small, need {size * len(records)} bytes")
+        pack_into = self.struct.pack_into
+        values = self._values
+        state = self._state()
+        for i, record in enumerate(records):
+            pack_into(buffer, i * size, *values(record, state))
+        # Only once every record packed
+        self.commit(state)
+        return [buffer[i:i + size] for i in range(0, size * len(records), size)]
+
+    def _decode_values(self, values) -> dict:
+        record = {}
+        position = 0
+        for item in self._plan:
+            if item[0] == 'native':
+                raws = ((item[1], values[position]),)
+                position += 1
+            else:
+                _, run, pad, shifts = item
+                word = 0
+                for shift, _ in shifts:
+                    word |= values[position] << shift
+                    position += 1
+                word >>= pad
+                fields = []
+                for field in reversed(run):
+                    raw = word & field.mask
+                    word >>= field.bits
+                    if field.signed and raw > field.max:
+                        raw -= 1 << field.bits
+                    fields.append((field, raw))
+                raws = reversed(fields)
+            for field, raw in raws:
+                kind = field.kind
+                if kind == 'value':
+                    record[field.name] = raw if field.exact else raw * field.scale + field.offset
+                elif kind == 'delta':
+                    record[field.name] = raw if field.exact else raw * field.scale
+                else:
+                    record[field.name] = raw
+        return record
+
+    def decode(self, message) -> dict:
+        """
+        :param message: bytes-like, at least size bytes (longer messages are cut)
+        :return: dict of field name -> value; delta fields hold the change since the previous message
+        """
+        if len(message) < self.size:
+            raise ValueError(f"Message of {len(message)} bytes, the schema needs {self.size}")
+        return self._decode_values(self.struct.unpack_from(message))
+
+    def decode_batch(self, buffer) -> list:
+        """
+        :param buffer: bytes-like of back to back messages, a multiple of size bytes
+        :return: list of dict, one per message
+        """
+        decode_values = self._decode_values
+        return [decode_values(values) for values in self.struct.iter_unpack(buffer)]
+
+    def reset(self) -> None:
+        """Forget the encoder state: sequence back to 0, next delta fields are 0"""
+        self.sequence = 0
+        self._previous = {}
+
+
+def load_schema(path: str) -> MessageCodec:
+    """
+    Read a schema file: {"fields": [{"name": "temperature", "bits": 10, "scale": 0.1, "offset": -20}, ...]}
+    """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    return MessageCodec([Field.from_dict(field) for field in config['fields']])
+
+
+def parse_record(text: str) -> dict:
+    """
+    Parse a sensor record from a command line or a feed line
+    :param text: JSON object, or name=value pairs separated by commas or spaces
+    """
+    text = text.strip()
+    if text.startswith('{'):
+        return json.loads(text)
+    record = {}
+    for pair in text.replace(',', ' ').split():
+        name, separator, value = pair.partition('=')
+        if not separator:
+            raise ValueError(f"Expected name=value, got {pair}")
+        try:
+            record[name] = int(value)
+        except ValueError:
+            record[name] = float(value)
+    return record
@@ -0,0 +1,226 @@
+"""
+Broadcaster daemon
+Keep the transmitter initialized and accept live updates over a Unix domain socket.
+
+Line protocol, one command per line, one reply line per command, in order.
+Clients may pipeline: send many commands without waiting for replies. Replies are
+queued per client and written when its socket is writable; a client that lets more
+than MAX_PENDING_REPLY_BYTES pile up without reading is disconnected.
+
+    MSG <hex>     set device message (empty for none)   -> OK <latency_us>
+    REC <record>  set device message from a sensor record, needs a schema
+                  (e.g. REC temperature=21.5 humidity=40) -> OK <latency_us>
+    HWID <hex>    set hardware ID                       -> OK <latency_us>
+    START         start advertising                     -> OK <latency_us>
+    STOP          stop advertising                      -> OK <latency_us>
+    STATUS        get status                            -> STATUS key=value ...
+    METRICS       get the metrics snapshot              -> METRICS <json on one line>
+    anything else                                       -> ERR <reason>
+"""
+
+import os
+import selectors
+import socket
+import time
+
+from core.codec import parse_record
+from core.defaults import DEFAULT_SOCKET_PATH
+from core.metrics import registry
+
+COMMAND_SECONDS = registry.histogram('daemon_command_seconds', 'Control socket command handling time')
+
+# Unsent replies a client may leave behind before it is dropped
+MAX_PENDING_REPLY_BYTES = 1 << 20
+
+def _hex(device_message) -> str:
+    return device_message if isinstance(device_message, str) else bytes(device_message).hex()
+
+class ControlServer():
+    """Unix domain socket server applying commands to one transmitter"""
+
+    def __init__(self, transmitter, hwid: str, device_message='', path: str = DEFAULT_SOCKET_PATH, codec=None,
+                 advertising: bool = True):
+        """
+        :param transmitter: initialized platform transmitter
+        :param hwid: hardware ID currently advertised
+        :param device_message: device message currently advertised, hex string or bytes
+        :param path: Unix domain socket path
+        :param codec: optional MessageCodec encoding REC records
+        :param advertising: whether the transmitter is already advertising hwid / device_message
+        """
+        self.transmitter = transmitter
+        self.hwid = hwid
+        self.device_message = device_message
+        self.codec = codec
+        self.advertising = advertising
+        self.path = path
+        self._selector = selectors.DefaultSelector()
+        self._listener = None
+        self._clients = {}  # socket -> pending input bytes
+        self._replies = {}  # socket -> bytearray of replies not sent yet
+        self._running = False
+        # Latency stats, microseconds
+        self.commands = 0
+        self.errors = 0
+        self.last_latency_us = 0
+        self.max_latency_us = 0
+        self.total_latency_us = 0
+
+    def start(self) -> None:
+        """Bind the control socket"""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.path)
+        self._listener.listen()
+        self._listener.setblocking(False)
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._running = True
+
+    def close(self) -> None:
+        self._running = False
+        for sock in list(self._clients):
+            self._drop(sock)
+        if self._listener is not None:
+            self._selector.unregister(self._listener)
+            self._listener.close()
+            self._listener = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        while self._running:
+            self.poll(poll_interval)
+
+    def shutdown(self) -> None:
+        self._running = False
+
+    def poll(self, timeout: float = None) -> None:
+        """Handle whatever is ready on the listener and the client sockets"""
+        for key, events in self._selector.select(timeout):
+            sock = key.fileobj
+            if sock is self._listener:
+                client, _ = sock.accept()
+                client.setblocking(False)
+                self._clients[client] = b''
+                self._replies[client] = bytearray()
+                self._selector.register(client, selectors.EVENT_READ)
+                continue
+            if events & selectors.EVENT_WRITE:
+                self._flush(sock)
+            if events & selectors.EVENT_READ and sock in self._clients:
+                self._read(sock)
+
+    def _read(self, sock) -> None:
+        try:
+            data = sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(sock)
+            return
+
+        *lines, rest = (self._clients[sock] + data).split(b'\n')
+        self._clients[sock] = rest
+        if not lines:
+            return
+        # Answer every complete command of this read in one write
+        replies = [self.handle_line(line.strip()) for line in lines]
+        self._replies[sock] += ('\n'.join(replies) + '\n').encode()
+        self._flush(sock)
+        if sock in self._replies and len(self._replies[sock]) > MAX_PENDING_REPLY_BYTES:
+            print("Dropping a control client that does not read its replies")
+            self._drop(sock)
+
+    def _flush(self, sock) -> None:
+        """Send what the socket takes without blocking, watch it for writability while replies are left"""
+        pending = self._replies[sock]
+        try:
+            sent = sock.send(pending) if pending else 0
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self._drop(sock)
+            return
+        del pending[:sent]
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if pending else selectors.EVENT_READ
+        if self._selector.get_key(sock).events != events:
+            self._selector.modify(sock, events)
+
+    def _drop(self, sock) -> None:
+        self._clients.pop(sock, None)
+        self._replies.pop(sock, None)
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+
+    def handle_line(self, line: bytes) -> str:
+        """Apply one command line and return its reply line"""
+        command, _, argument = line.decode('ascii', 'replace').partition(' ')
+        command = command.upper()
+        argument = argument.strip()
+
+        if command == 'STATUS':
+            return self.status_line()
+        if command == 'METRICS':
+            return f"METRICS {registry.to_json()}"
+
+        start = time.perf_counter()
+        try:
+            if command == 'MSG':
+                ok = self._apply(self.hwid, argument)
+            elif command == 'REC':
+                if self.codec is None:
+                    self.errors += 1
+                    return "ERR REC needs a schema"
+                # Sequence and delta state only move once the message is advertised
+                device_message, state = self.codec.prepare(parse_record(argument))
+                ok = self._apply(self.hwid, device_message)
+                if ok:
+                    self.codec.commit(state)
+            elif command == 'HWID':
+                ok = self._apply(argument, self.device_message)
+            elif command == 'START':
+                ok = self._apply(self.hwid, self.device_message)
+            elif command == 'STOP':
+                self.transmitter.stop_advertising()
+                self.advertising = False
+                ok = True
+            else:
+                self.errors += 1
+                return f"ERR unknown command {command}"
+        except Exception as e:
+            ok = False
+            print(f"Error handling {command}: {e}")
+        latency_us = int((time.perf_counter() - start) * 1e6)
+        COMMAND_SECONDS.record(latency_us)
+
+        self.commands += 1
+        self.last_latency_us = latency_us
+        self.total_latency_us += latency_us
+        if latency_us > self.max_latency_us:
+            self.max_latency_us = latency_us
+        if not ok:
+            self.errors += 1
+            return f"ERR {command} failed"
+        return f"OK {latency_us}"
+
+    def _apply(self, hwid: str, device_message) -> bool:
+        if not self.transmitter.start_advertising(hwid, device_message):
+            return False
+        self.hwid = hwid
+        self.device_message = device_message
+        self.advertising = True
+        return True
+
+    def status_line(self) -> str:
+        mean_us = self.total_latency_us // self.commands if self.commands else 0
+        return (
+            f"STATUS hwid={self.hwid} message={_hex(self.device_message)} "
+            f"advertising={int(self.advertising)} commands={self.commands} errors={self.errors} "
+            f"last_us={self.last_latency_us} mean_us={mean_us} max_us={self.max_latency_us}"
+        )
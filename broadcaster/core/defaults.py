@@ -0,0 +1,7 @@
+"""
+Defaults shared by the broadcaster entry point and its modes
+No imports: broadcaster.py reads them before it knows which mode modules it needs.
+"""
+
+# Control socket of --daemon
+DEFAULT_SOCKET_PATH = '/tmp/line-simple-beacon.sock'
@@ -0,0 +1,135 @@
+"""
+State-reconciling extended advertiser (BLE 5)
+Keep several advertising sets, one per handle, in sync with the desired state
+using the LE Set Extended Advertising Parameters/Data/Enable commands.
+Every set sends legacy ADV_NONCONN_IND PDUs so BLE 4 scanners still see it.
+"""
+
+from core.hci import (
+    HCITransport, HCIError, DEFAULT_ADV_INTERVAL, OWN_ADDRESS_RANDOM, STATUS_COMMAND_DISALLOWED,
+    OGF_LE_CTL,
+    OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS,
+    OCF_LE_SET_EXTENDED_ADVERTISING_PARAMETERS,
+    OCF_LE_SET_EXTENDED_ADVERTISING_DATA,
+    OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE,
+    OCF_LE_REMOVE_ADVERTISING_SET,
+    OCF_LE_CLEAR_ADVERTISING_SETS,
+    build_extended_advertising_parameters,
+    build_extended_advertising_data,
+    build_extended_advertising_enable,
+)
+
+
+def random_static_address(hwid: bytes, handle: int) -> bytes:
+    """
+    Stable random static address of an advertising set (little-endian, two MSBs set)
+    Each set needs its own address, otherwise scanners merge the beacons into one device.
+    """
+    return bytes(hwid[:5]).ljust(5, b'\x00') + bytes([0xC0 | (handle & 0x3F)])
+
+
+class ExtendedAdvertiser():
+    """Keep many extended advertising sets in sync with the desired state"""
+
+    def __init__(self, transport: HCITransport, max_sets: int = 1):
+        self.transport = transport
+        self.max_sets = max_sets
+        # Known controller state per handle: handle -> [parameters, address, data, enabled]
+        self.sets = {}
+        # Counters
+        self.updates = 0
+        self.commands_sent = 0
+        self.last_update_commands = 0
+
+    def clear(self) -> int:
+        """Disable and remove every advertising set, the controller state is known afterwards"""
+        sent = 0
+        try:
+            self._send(OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE, build_extended_advertising_enable(False, []))
+            sent += 1
+        except HCIError as e:
+            # "Command Disallowed" when no set is advertising
+            if e.status != STATUS_COMMAND_DISALLOWED:
+                raise
+        self._send(OCF_LE_CLEAR_ADVERTISING_SETS)
+        self.sets = {}
+        sent += 1
+        self.commands_sent += sent
+        return sent
+
+    def apply(self, desired: dict) -> int:
+        """
+        Reconcile the controller with the desired advertising sets
+        :param desired: handle -> (adv_data, interval, address), address None for the public address;
+            handles missing from the dict are removed
+        :return: int, number of HCI commands sent for this update
+        """
+        if len(desired) > self.max_sets:
+            raise ValueError(f"Controller supports {self.max_sets} advertising sets, {len(desired)} requested")
+
+        sent = 0
+        wanted = {}
+        for handle, (adv_data, interval, address) in desired.items():
+            own_address_type = OWN_ADDRESS_RANDOM if address is not None else 0x00
+            parameters = build_extended_advertising_parameters(
+                handle, interval or DEFAULT_ADV_INTERVAL, own_address_type)
+            wanted[handle] = (parameters, address, bytes(adv_data))
+
+        # Sets to reconfigure or remove must be disabled first, all in one command
+        to_disable = [
+            handle for handle, state in self.sets.items()
+            if state[3] and (handle not in wanted
+                             or wanted[handle][0] != state[0] or wanted[handle][1] != state[1])
+        ]
+        if to_disable:
+            self._send(OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE, build_extended_advertising_enable(False, to_disable))
+            for handle in to_disable:
+                self.sets[handle][3] = False
+            sent += 1
+
+        for handle in [h for h in self.sets if h not in wanted]:
+            self._send(OCF_LE_REMOVE_ADVERTISING_SET, bytes([handle]))
+            del self.sets[handle]
+            sent += 1
+
+        for handle, (parameters, address, adv_data) in wanted.items():
+            state = self.sets.setdefault(handle, [None, None, None, False])
+            if parameters != state[0]:
+                # Creates the set when it does not exist yet
+                self._send(OCF_LE_SET_EXTENDED_ADVERTISING_PARAMETERS, parameters)
+                state[0] = parameters
+                sent += 1
+            if address is not None and address != state[1]:
+                self._send(OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS, bytes([handle]) + address)
+                state[1] = address
+                sent += 1
+            # Legacy PDU data can be replaced while the set stays enabled
+            if adv_data != state[2]:
+                self._send(OCF_LE_SET_EXTENDED_ADVERTISING_DATA, build_extended_advertising_data(handle, adv_data))
+                state[2] = adv_data
+                sent += 1
+
+        to_enable = [handle for handle in wanted if not self.sets[handle][3]]
+        if to_enable:
+            self._send(OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE, build_extended_advertising_enable(True, to_enable))
+            for handle in to_enable:
+                self.sets[handle][3] = True
+            sent += 1
+
+        self.updates += 1
+        self.commands_sent += sent
+        self.last_update_commands = sent
+        return sent
+
+    def disable_all(self) -> int:
+        """Disable every set but keep parameters and data"""
+        if not any(state[3] for state in self.sets.values()):
+            return 0
+        self._send(OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE, build_extended_advertising_enable(False, []))
+        for state in self.sets.values():
+            state[3] = False
+        self.commands_sent += 1
+        return 1
+
+    def _send(self, ocf: int, params: bytes = b'') -> bytes:
+        return self.transport.send_command(OGF_LE_CTL, ocf, params)
@@ -0,0 +1,124 @@
+"""
+Streaming device message feed
+Push device messages from a stream (stdin, FIFO, iterator, async generator) into
+a transmitter. Only the newest pending message is sent, older ones are dropped
+(latest value wins), so a fast producer never builds a backlog.
+With a MessageCodec the stream carries sensor records instead of hex strings,
+encoded right before sending so sequence and delta fields follow what was sent.
+"""
+
+import threading
+import time
+
+from core.codec import parse_record
+
+class MessageFeed():
+    """Coalescing sender: latest pending message wins"""
+
+    def __init__(self, transmitter, hwid: str, min_interval: float = 0.0, codec=None):
+        """
+        :param transmitter: initialized platform transmitter
+        :param hwid: hardware ID advertised with every message
+        :param min_interval: minimum seconds between two advertising updates
+        :param codec: optional MessageCodec, messages are then sensor records (dict or parse_record text)
+        """
+        self.transmitter = transmitter
+        self.hwid = hwid
+        self.min_interval = min_interval
+        self.codec = codec
+        self._cond = threading.Condition()
+        self._pending = None
+        self._closed = False
+        self._thread = None
+        self._last_sent = float('-inf')
+        # Counters
+        self.received = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Start the sender thread"""
+        self._thread = threading.Thread(target=self._run, name='message-feed', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Send the last pending message, then stop the sender thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def push(self, device_message) -> None:
+        """Queue a device message (or a record dict with a codec), replacing any message not sent yet"""
+        with self._cond:
+            self.received += 1
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = device_message
+            self._cond.notify()
+
+    def feed(self, messages) -> None:
+        """Push every message of an iterable (e.g. lines of stdin or a FIFO)"""
+        for message in messages:
+            self._push_line(message)
+
+    async def feed_async(self, messages) -> None:
+        """Push every message of an async iterable"""
+        async for message in messages:
+            self._push_line(message)
+
+    def _push_line(self, message: str) -> None:
+        message = message.strip()
+        if not message:
+            return
+        if self.codec is not None:
+            try:
+                message = parse_record(message)
+            except ValueError as e:
+                print(f"Error parsing record: {e}")
+                self.failed += 1
+                return
+        self.push(message)
+
+    def stats(self) -> dict:
+        return {
+            'received': self.received,
+            'coalesced': self.coalesced,
+            'sent': self.sent,
+            'failed': self.failed,
+        }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+
+            # Wait outside the lock, newer messages replace the pending one meanwhile
+            delay = self._last_sent + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            with self._cond:
+                device_message, self._pending = self._pending, None
+
+            self._last_sent = time.monotonic()
+            try:
+                state = None
+                if self.codec is not None:
+                    device_message, state = self.codec.prepare(device_message)
+                ok = self.transmitter.start_advertising(self.hwid, device_message)
+                if ok and state is not None:
+                    self.codec.commit(state)
+            except Exception as e:
+                print(f"Error updating device message: {e}")
+                ok = False
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
@@ -0,0 +1,310 @@
+"""
+HCI transport
+Send HCI command packets over a raw AF_BLUETOOTH / BTPROTO_HCI socket
+and wait for the matching Command Complete / Command Status event.
+"""
+
+import errno
+import socket
+import struct
+import time
+
+from core.metrics import registry
+
+# Not every Python build exposes the Bluetooth constants (e.g. no bluez headers at build time)
+AF_BLUETOOTH = getattr(socket, 'AF_BLUETOOTH', 31)
+BTPROTO_HCI = getattr(socket, 'BTPROTO_HCI', 1)
+SOL_HCI = getattr(socket, 'SOL_HCI', 0)
+HCI_FILTER = getattr(socket, 'HCI_FILTER', 2)
+
+# ioctl: bring the adapter up (_IOW('H', 201, int))
+HCIDEVUP = 0x400448c9
+
+# HCI packet types
+HCI_COMMAND_PKT = 0x01
+HCI_EVENT_PKT = 0x04
+
+# HCI events
+EVT_CMD_COMPLETE = 0x0E
+EVT_CMD_STATUS = 0x0F
+EVT_LE_META_EVENT = 0x3E
+
+# LE Meta subevents
+EVT_LE_ADVERTISING_REPORT = 0x02
+EVT_LE_EXTENDED_ADVERTISING_REPORT = 0x0D
+
+# HCI status codes
+STATUS_COMMAND_DISALLOWED = 0x0C
+
+# OGF / OCF
+OGF_HOST_CTL = 0x03
+OCF_RESET = 0x0003
+
+OGF_LE_CTL = 0x08
+OCF_LE_READ_LOCAL_SUPPORTED_FEATURES = 0x0003
+OCF_LE_SET_ADVERTISING_PARAMETERS = 0x0006
+OCF_LE_SET_ADVERTISING_DATA = 0x0008
+OCF_LE_SET_ADVERTISE_ENABLE = 0x000A
+OCF_LE_SET_SCAN_PARAMETERS = 0x000B
+OCF_LE_SET_SCAN_ENABLE = 0x000C
+
+# BLE 5 extended advertising
+OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS = 0x0035
+OCF_LE_SET_EXTENDED_ADVERTISING_PARAMETERS = 0x0036
+OCF_LE_SET_EXTENDED_ADVERTISING_DATA = 0x0037
+OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE = 0x0039
+OCF_LE_READ_NUMBER_OF_SUPPORTED_ADVERTISING_SETS = 0x003B
+OCF_LE_REMOVE_ADVERTISING_SET = 0x003C
+OCF_LE_CLEAR_ADVERTISING_SETS = 0x003D
+
+# LE supported features bit: LE Extended Advertising
+LE_FEATURE_EXTENDED_ADVERTISING = 1 << 12
+
+# Legacy advertising data is always 31 bytes
+ADV_DATA_LENGTH = 31
+
+# Advertising types
+ADV_IND = 0x00
+ADV_NONCONN_IND = 0x03
+
+# Advertising interval in 0.625 ms units (0x00A0 = 100 ms)
+DEFAULT_ADV_INTERVAL = 0x00A0
+ADV_CHANNEL_ALL = 0x07
+
+# Extended advertising event properties: legacy PDU, non-connectable non-scannable (ADV_NONCONN_IND)
+ADV_EVENT_PROP_LEGACY_NONCONN = 0x0010
+OWN_ADDRESS_PUBLIC = 0x00
+OWN_ADDRESS_RANDOM = 0x01
+ADV_TX_POWER_NO_PREFERENCE = 0x7F
+LE_PHY_1M = 0x01
+ADV_DATA_OPERATION_COMPLETE = 0x03
+ADV_DATA_NO_FRAGMENTATION = 0x01
+
+DEFAULT_TIMEOUT = 1.0
+
+_HEADER = struct.Struct('<BHB')  # packet type, opcode, parameter length
+
+COMMAND_SECONDS = registry.histogram('hci_command_seconds', 'HCI command round-trip time')
+COMMAND_ERRORS = registry.counter('hci_command_errors_total', 'HCI commands rejected by the controller')
+COMMAND_TIMEOUTS = registry.counter('hci_command_timeouts_total', 'HCI commands not answered in time')
+
+
+def opcode(ogf: int, ocf: int) -> int:
+    """Pack OGF and OCF into a 16-bit HCI opcode"""
+    return (ogf << 10) | ocf
+
+
+def build_command_packet(ogf: int, ocf: int, params: bytes = b'') -> bytes:
+    """Build an HCI command packet: [0x01][opcode LE][plen][params]"""
+    return _HEADER.pack(HCI_COMMAND_PKT, opcode(ogf, ocf), len(params)) + bytes(params)
+
+
+def build_advertising_parameters(interval_min: int = DEFAULT_ADV_INTERVAL,
+                                 interval_max: int = DEFAULT_ADV_INTERVAL,
+                                 adv_type: int = ADV_NONCONN_IND,
+                                 channel_map: int = ADV_CHANNEL_ALL) -> bytes:
+    """Parameters of LE Set Advertising Parameters (15 bytes)"""
+    return struct.pack(
+        '<HHBBB6sBB',
+        interval_min, interval_max, adv_type,
+        0x00,           # own address type: public
+        0x00,           # peer address type
+        bytes(6),       # peer address
+        channel_map,
+        0x00,           # filter policy: allow all
+    )
+
+
+def build_advertising_data(adv_data: bytes) -> bytes:
+    """Parameters of LE Set Advertising Data: [len][31 bytes data]"""
+    if len(adv_data) > ADV_DATA_LENGTH:
+        raise ValueError("Advertising data too long")
+    return bytes([ADV_DATA_LENGTH]) + bytes(adv_data) + bytes(ADV_DATA_LENGTH - len(adv_data))
+
+
+def interval_units(seconds: float) -> int:
+    """Convert an advertising interval in seconds to 0.625 ms units"""
+    return max(0x20, round(seconds / 0.000625))
+
+
+def build_extended_advertising_parameters(handle: int, interval: int = DEFAULT_ADV_INTERVAL,
+                                          own_address_type: int = OWN_ADDRESS_PUBLIC,
+                                          properties: int = ADV_EVENT_PROP_LEGACY_NONCONN,
+                                          channel_map: int = ADV_CHANNEL_ALL) -> bytes:
+    """Parameters of LE Set Extended Advertising Parameters (25 bytes)"""
+    interval = interval.to_bytes(3, 'little')
+    return struct.pack(
+        '<BH3s3sBBB6sBBBBBBB',
+        handle, properties, interval, interval, channel_map,
+        own_address_type,
+        0x00,           # peer address type
+        bytes(6),       # peer address
+        0x00,           # filter policy: allow all
+        ADV_TX_POWER_NO_PREFERENCE,
+        LE_PHY_1M,      # primary PHY
+        0x00,           # secondary max skip
+        LE_PHY_1M,      # secondary PHY
+        handle & 0x0F,  # advertising SID
+        0x00,           # scan request notification disabled
+    )
+
+
+def build_extended_advertising_data(handle: int, adv_data: bytes) -> bytes:
+    """Parameters of LE Set Extended Advertising Data, whole data in one operation"""
+    return bytes([handle, ADV_DATA_OPERATION_COMPLETE, ADV_DATA_NO_FRAGMENTATION, len(adv_data)]) + bytes(adv_data)
+
+
+def build_extended_advertising_enable(enable: bool, handles) -> bytes:
+    """Parameters of LE Set Extended Advertising Enable, no duration or event limit"""
+    handles = list(handles)
+    params = bytearray([1 if enable else 0, len(handles)])
+    for handle in handles:
+        params += bytes([handle, 0, 0, 0])
+    return bytes(params)
+
+
+class HCIError(Exception):
+    """Raised when the controller rejects a command or does not answer in time"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+def open_hci_socket(dev_id: int):
+    """Default socket factory: raw HCI socket bound to hci<dev_id>"""
+    sock = socket.socket(AF_BLUETOOTH, socket.SOCK_RAW, BTPROTO_HCI)
+    try:
+        # Make sure the Bluetooth adapter is up (same as `hciconfig hciX up`)
+        import fcntl
+        try:
+            fcntl.ioctl(sock.fileno(), HCIDEVUP, dev_id)
+        except OSError as e:
+            if e.errno != errno.EALREADY:
+                raise
+        # Only receive event packets, any event code
+        hci_filter = struct.pack('<IIIH2x', 1 << HCI_EVENT_PKT, 0xFFFFFFFF, 0xFFFFFFFF, 0)
+        sock.setsockopt(SOL_HCI, HCI_FILTER, hci_filter)
+        sock.bind((dev_id,))
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+class HCITransport():
+    """Raw HCI socket opened once and reused for every command"""
+
+    def __init__(self, dev_id: int = 0, socket_factory=None, timeout: float = DEFAULT_TIMEOUT):
+        """
+        :param dev_id: adapter index, 0 for hci0
+        :param socket_factory: callable(dev_id) returning a connected socket-like object
+            (send/recv/settimeout/close). Defaults to a raw HCI socket; tests and benchmarks
+            can pass one end of a socketpair instead.
+        :param timeout: seconds to wait for the Command Complete event
+        """
+        self.dev_id = dev_id
+        self.timeout = timeout
+        self._socket_factory = socket_factory or open_hci_socket
+        self._sock = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._sock is not None
+
+    def open(self) -> None:
+        if self._sock is None:
+            self._sock = self._socket_factory(self.dev_id)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def send_command(self, ogf: int, ocf: int, params: bytes = b'') -> bytes:
+        """
+        Send one HCI command and wait for its completion
+        :return: bytes, return parameters of Command Complete (status excluded)
+        """
+        if self._sock is None:
+            raise HCIError("HCI transport is not open")
+
+        op = opcode(ogf, ocf)
+        start = time.perf_counter_ns()
+        self._sock.send(build_command_packet(ogf, ocf, params))
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                COMMAND_TIMEOUTS.inc()
+                raise HCIError(f"Timeout waiting for command 0x{op:04x}")
+            self._sock.settimeout(remaining)
+            try:
+                packet = self._sock.recv(260)
+            except socket.timeout:
+                COMMAND_TIMEOUTS.inc()
+                raise HCIError(f"Timeout waiting for command 0x{op:04x}")
+
+            if len(packet) < 3 or packet[0] != HCI_EVENT_PKT:
+                continue
+
+            event = packet[1]
+            if event == EVT_CMD_COMPLETE and len(packet) >= 7:
+                # [0x04][0x0e][plen][ncmd][opcode LE][status][return params]
+                if packet[4] | (packet[5] << 8) != op:
+                    continue
+                COMMAND_SECONDS.record_since(start)
+                status = packet[6]
+                if status:
+                    COMMAND_ERRORS.inc()
+                    raise HCIError(f"Command 0x{op:04x} failed, status 0x{status:02x}", status)
+                return packet[7:]
+            if event == EVT_CMD_STATUS and len(packet) >= 7:
+                # [0x04][0x0f][plen][status][ncmd][opcode LE]
+                if packet[5] | (packet[6] << 8) != op:
+                    continue
+                COMMAND_SECONDS.record_since(start)
+                status = packet[3]
+                if status:
+                    COMMAND_ERRORS.inc()
+                    raise HCIError(f"Command 0x{op:04x} failed, status 0x{status:02x}", status)
+                return b''
+
+    def recv_into(self, buffer, timeout: float) -> int:
+        """
+        Receive one packet (e.g. an LE Meta event) into a preallocated buffer
+        :return: int, packet size, 0 when nothing arrived within timeout
+        """
+        if self._sock is None:
+            raise HCIError("HCI transport is not open")
+        self._sock.settimeout(timeout)
+        try:
+            return self._sock.recv_into(buffer)
+        except socket.timeout:
+            return 0
+
+    # LE controller information
+
+    def read_le_features(self) -> int:
+        """:return: int, LE supported features bit mask"""
+        features = self.send_command(OGF_LE_CTL, OCF_LE_READ_LOCAL_SUPPORTED_FEATURES)
+        return int.from_bytes(bytes(features[:8]), 'little')
+
+    def read_number_of_advertising_sets(self) -> int:
+        result = self.send_command(OGF_LE_CTL, OCF_LE_READ_NUMBER_OF_SUPPORTED_ADVERTISING_SETS)
+        return result[0] if result else 0
+
+    # LE advertising commands
+
+    def reset(self) -> None:
+        self.send_command(OGF_HOST_CTL, OCF_RESET)
+
+    def set_advertising_parameters(self, params: bytes) -> None:
+        self.send_command(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_PARAMETERS, params)
+
+    def set_advertising_data(self, adv_data: bytes) -> None:
+        self.send_command(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_DATA, build_advertising_data(adv_data))
+
+    def set_advertise_enable(self, enable: bool) -> None:
+        self.send_command(OGF_LE_CTL, OCF_LE_SET_ADVERTISE_ENABLE, bytes([1 if enable else 0]))
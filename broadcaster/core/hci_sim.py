@@ -0,0 +1,513 @@
+"""
+Simulated HCI controller
+In-process controller on the other end of a socketpair, implementing the LE
+subset used by the broadcaster and the detector: reset, LE features, legacy and
+extended advertising, scanning, Command Complete / Command Status events and LE
+Advertising Report traffic at a configurable rate. Faults (command latency,
+dropped events, error statuses) can be injected for load and robustness tests.
+Commands sent out of order (advertising data before parameters, enable before
+data) are rejected with Command Disallowed; command_log keeps the opcode sequence.
+
+    controller = SimulatedController(extended=True, report_rate=1000)
+    transmitter = LinuxTransmitter(socket_factory=controller.socket_factory)
+"""
+
+import random
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from core.hci import (
+    HCI_COMMAND_PKT, HCI_EVENT_PKT, EVT_CMD_COMPLETE, EVT_CMD_STATUS, EVT_LE_META_EVENT,
+    EVT_LE_ADVERTISING_REPORT, EVT_LE_EXTENDED_ADVERTISING_REPORT,
+    OGF_HOST_CTL, OCF_RESET, OGF_LE_CTL, STATUS_COMMAND_DISALLOWED,
+    OCF_LE_READ_LOCAL_SUPPORTED_FEATURES,
+    OCF_LE_SET_ADVERTISING_PARAMETERS,
+    OCF_LE_SET_ADVERTISING_DATA,
+    OCF_LE_SET_ADVERTISE_ENABLE,
+    OCF_LE_SET_SCAN_PARAMETERS,
+    OCF_LE_SET_SCAN_ENABLE,
+    OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS,
+    OCF_LE_SET_EXTENDED_ADVERTISING_PARAMETERS,
+    OCF_LE_SET_EXTENDED_ADVERTISING_DATA,
+    OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE,
+    OCF_LE_READ_NUMBER_OF_SUPPORTED_ADVERTISING_SETS,
+    OCF_LE_REMOVE_ADVERTISING_SET,
+    OCF_LE_CLEAR_ADVERTISING_SETS,
+    LE_FEATURE_EXTENDED_ADVERTISING, ADV_DATA_LENGTH, DEFAULT_ADV_INTERVAL,
+    opcode,
+)
+from core.beacon_core import BeaconCore
+
+# HCI status codes
+STATUS_SUCCESS = 0x00
+STATUS_UNKNOWN_COMMAND = 0x01
+STATUS_UNKNOWN_ADVERTISING_IDENTIFIER = 0x42
+STATUS_INVALID_PARAMETERS = 0x12
+STATUS_LIMIT_EXCEEDED = 0x43
+
+# Public address of the simulated controller, little-endian
+CONTROLLER_ADDRESS = bytes([0x00, 0x53, 0x00, 0x5E, 0x00, 0x00])
+
+# Advertising report: legacy ADV_NONCONN_IND / extended legacy ADV_NONCONN_IND event type
+_LEGACY_REPORT = struct.Struct('<BBBB6sB')        # subevent, num, event type, address type, address, data length
+_EXT_REPORT = struct.Struct('<BBHB6sBBBbbHB6sB')  # ... phys, sid, tx power, rssi, periodic interval, direct address, data length
+_EXT_EVENT_LEGACY_NONCONN = 0x0010
+
+# Max packets per generator wake-up, bounds the burst after a stall
+_MAX_BURST = 1000
+
+# Opcodes kept in SimulatedController.command_log
+COMMAND_LOG_LENGTH = 1024
+
+
+def _socketpair():
+    """Packet-preserving socketpair, SOCK_SEQPACKET where available"""
+    try:
+        return socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    except (AttributeError, OSError):
+        return socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+
+def build_advertising_report(address: bytes, rssi: int, data: bytes, extended: bool = False) -> bytearray:
+    """
+    LE Advertising Report (or Extended Advertising Report) event packet with one report
+    :return: bytearray, the RSSI byte can be patched in place (see report_rssi_offset)
+    """
+    if extended:
+        body = _EXT_REPORT.pack(
+            EVT_LE_EXTENDED_ADVERTISING_REPORT, 1, _EXT_EVENT_LEGACY_NONCONN, 0x00, address,
+            0x01, 0x00, 0xFF, 0x7F, rssi, 0x0000, 0x00, bytes(6), len(data)) + data
+    else:
+        body = _LEGACY_REPORT.pack(EVT_LE_ADVERTISING_REPORT, 1, 0x03, 0x00, address, len(data)) + data + struct.pack('b', rssi)
+    return bytearray([HCI_EVENT_PKT, EVT_LE_META_EVENT, len(body)]) + body
+
+
+def report_rssi_offset(packet, extended: bool = False) -> int:
+    """:return: int, offset of the RSSI byte in a packet built by build_advertising_report"""
+    return 3 + 15 if extended else len(packet) - 1
+
+
+def synthetic_devices(count: int, seed: int = 0) -> list:
+    """
+    Advertising payloads of simulated nearby devices
+    :return: list of (address, data); every other device is a LINE Simple Beacon,
+        the others send a local name and Apple manufacturer data
+    """
+    rng = random.Random(seed)
+    devices = []
+    for i in range(count):
+        address = bytes(rng.getrandbits(8) for _ in range(6))
+        if i % 2:
+            data = BeaconCore.build_advertising_data(f'{i & 0xFFFFFFFFFF:010x}', f'{i & 0xFFFF:04x}')
+        else:
+            name = f'sim{i}'.encode()
+            data = (bytes([0x02, 0x01, 0x06, len(name) + 1, 0x09]) + name
+                    + bytes([0x07, 0xFF, 0x4C, 0x00, 0x12, 0x02, i & 0xFF, 0x00]))
+        devices.append((address, data))
+    return devices
+
+
+class SimulatedController():
+    """Virtual LE controller serving any number of host sockets"""
+
+    def __init__(self, extended: bool = False, advertising_sets: int = 4,
+                 latency: float = 0.0, drop_rate: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = STATUS_COMMAND_DISALLOWED,
+                 report_rate: float = 0.0, report_devices: int = 100, extended_reports: bool = False,
+                 seed: int = None):
+        """
+        :param extended: support BLE 5 extended advertising (LE features bit 12)
+        :param advertising_sets: number of extended advertising sets
+        :param latency: seconds before each command is answered
+        :param drop_rate: probability that an event (command completion or report) is never sent
+        :param error_rate: probability that a valid command fails with error_status
+        :param report_rate: advertising reports per second delivered while scanning
+        :param report_devices: number of simulated devices the reports rotate through
+        :param extended_reports: send LE Extended Advertising Report events instead of legacy ones
+        :param seed: random seed of the fault injection, for reproducible runs
+        The fault and rate attributes can be changed while the controller runs.
+        """
+        self.extended = extended
+        self.advertising_sets = advertising_sets
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.report_rate = report_rate
+        self.extended_reports = extended_reports
+        self._random = random.Random(seed)
+        self._devices = synthetic_devices(report_devices, seed or 0)
+
+        self._lock = threading.Lock()
+        self._connections = []
+        self._threads = []
+        self._running = True
+        self._scan_changed = threading.Condition(self._lock)
+        self._generator = None
+        self._reset_state()
+
+        # Counters
+        self.commands = {}  # opcode -> count
+        self.command_log = deque(maxlen=COMMAND_LOG_LENGTH)  # last opcodes received, in order
+        self.command_errors = 0
+        self.dropped_events = 0
+        self.reports_sent = 0
+        self.reports_overflowed = 0
+
+    def _reset_state(self) -> None:
+        # Parameters and data must be set before advertising is enabled
+        self.advertising_parameters = None
+        self.advertising_data = None
+        self.advertising_enabled = False
+        self.scan_parameters = None
+        self.scan_enabled = False
+        # handle -> {'parameters', 'address', 'data', 'enabled'}
+        self.sets = {}
+
+    # Host side
+
+    def socket_factory(self, dev_id: int = 0):
+        """Return a new host socket connected to the controller, usable as HCITransport socket_factory"""
+        host, controller = _socketpair()
+        with self._lock:
+            self._connections.append(controller)
+        thread = threading.Thread(target=self._serve, args=(controller,), name=f'hci-sim{dev_id}', daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        return host
+
+    def close(self) -> None:
+        """Stop the controller, host sockets see the connection closed"""
+        with self._lock:
+            self._running = False
+            connections = self._connections
+            self._connections = []
+            self._scan_changed.notify_all()
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._generator is not None:
+            self._generator.join()
+            self._generator = None
+
+    # Command handling
+
+    def _serve(self, connection) -> None:
+        while self._running:
+            try:
+                packet = connection.recv(260)
+            except OSError:
+                break
+            if not packet:
+                break
+            if len(packet) < 4 or packet[0] != HCI_COMMAND_PKT:
+                continue
+            op = packet[1] | (packet[2] << 8)
+            params = packet[4:4 + packet[3]]
+            if self.latency > 0:
+                time.sleep(self.latency)
+            self._answer(connection, op, params)
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        connection.close()
+
+    def _answer(self, connection, op: int, params: bytes) -> None:
+        with self._lock:
+            self.commands[op] = self.commands.get(op, 0) + 1
+            self.command_log.append(op)
+            handler = self._HANDLERS.get(op)
+            if handler is None:
+                # Unknown commands are answered with Command Status
+                self.command_errors += 1
+                self._send(connection, bytes([HCI_EVENT_PKT, EVT_CMD_STATUS, 4, STATUS_UNKNOWN_COMMAND, 1])
+                           + op.to_bytes(2, 'little'))
+                return
+            if self.error_rate > 0 and self._random.random() < self.error_rate:
+                status, result = self.error_status, b''
+            else:
+                status, result = handler(self, params)
+            if status:
+                self.command_errors += 1
+        body = bytes([1]) + op.to_bytes(2, 'little') + bytes([status]) + result
+        self._send(connection, bytes([HCI_EVENT_PKT, EVT_CMD_COMPLETE, len(body)]) + body)
+
+    def _send(self, connection, packet) -> bool:
+        if self.drop_rate > 0 and self._random.random() < self.drop_rate:
+            self.dropped_events += 1
+            return False
+        try:
+            connection.send(packet)
+        except OSError:
+            return False
+        return True
+
+    def _reset(self, params):
+        self._reset_state()
+        self._scan_changed.notify_all()
+        return STATUS_SUCCESS, b''
+
+    def _read_features(self, params):
+        features = LE_FEATURE_EXTENDED_ADVERTISING if self.extended else 0
+        return STATUS_SUCCESS, features.to_bytes(8, 'little')
+
+    def _set_advertising_parameters(self, params):
+        if len(params) != 15:
+            return STATUS_INVALID_PARAMETERS, b''
+        if self.advertising_enabled:
+            return STATUS_COMMAND_DISALLOWED, b''
+        self.advertising_parameters = bytes(params)
+        return STATUS_SUCCESS, b''
+
+    def _set_advertising_data(self, params):
+        if len(params) != 1 + ADV_DATA_LENGTH or params[0] > ADV_DATA_LENGTH:
+            return STATUS_INVALID_PARAMETERS, b''
+        if self.advertising_parameters is None:
+            # Out of order: data before parameters
+            return STATUS_COMMAND_DISALLOWED, b''
+        self.advertising_data = bytes(params[1:1 + params[0]])
+        return STATUS_SUCCESS, b''
+
+    def _set_advertise_enable(self, params):
+        if len(params) != 1 or params[0] > 1:
+            return STATUS_INVALID_PARAMETERS, b''
+        if any(state['enabled'] for state in self.sets.values()):
+            # Legacy and extended advertising commands can't be mixed
+            return STATUS_COMMAND_DISALLOWED, b''
+        if params[0] and (self.advertising_parameters is None or self.advertising_data is None):
+            # Out of order: enable before parameters and data
+            return STATUS_COMMAND_DISALLOWED, b''
+        self.advertising_enabled = bool(params[0])
+        return STATUS_SUCCESS, b''
+
+    def _set_scan_parameters(self, params):
+        if len(params) != 7:
+            return STATUS_INVALID_PARAMETERS, b''
+        if self.scan_enabled:
+            return STATUS_COMMAND_DISALLOWED, b''
+        self.scan_parameters = bytes(params)
+        return STATUS_SUCCESS, b''
+
+    def _set_scan_enable(self, params):
+        if len(params) != 2 or params[0] > 1:
+            return STATUS_INVALID_PARAMETERS, b''
+        self.scan_enabled = bool(params[0])
+        if self.scan_enabled and self._generator is None:
+            self._generator = threading.Thread(target=self._generate_reports, name='hci-sim-reports', daemon=True)
+            self._generator.start()
+        self._scan_changed.notify_all()
+        return STATUS_SUCCESS, b''
+
+    def _extended_set(self, handle: int, create: bool = False):
+        state = self.sets.get(handle)
+        if state is None and create and len(self.sets) < self.advertising_sets:
+            state = self.sets[handle] = {'parameters': None, 'address': None, 'data': None, 'enabled': False}
+        return state
+
+    def _set_random_address(self, params):
+        if not self.extended:
+            return STATUS_UNKNOWN_COMMAND, b''
+        if len(params) != 7:
+            return STATUS_INVALID_PARAMETERS, b''
+        state = self._extended_set(params[0])
+        if state is None:
+            return STATUS_UNKNOWN_ADVERTISING_IDENTIFIER, b''
+        state['address'] = bytes(params[1:7])
+        return STATUS_SUCCESS, b''
+
+    def _set_extended_parameters(self, params):
+        if not self.extended:
+            return STATUS_UNKNOWN_COMMAND, b''
+        if len(params) != 25:
+            return STATUS_INVALID_PARAMETERS, b''
+        if self.advertising_enabled:
+            return STATUS_COMMAND_DISALLOWED, b''
+        state = self._extended_set(params[0], create=True)
+        if state is None:
+            return STATUS_LIMIT_EXCEEDED, b''
+        if state['enabled']:
+            return STATUS_COMMAND_DISALLOWED, b''
+        state['parameters'] = bytes(params)
+        return STATUS_SUCCESS, bytes([0])  # selected TX power
+
+    def _set_extended_data(self, params):
+        if not self.extended:
+            return STATUS_UNKNOWN_COMMAND, b''
+        if len(params) < 4 or len(params) != 4 + params[3]:
+            return STATUS_INVALID_PARAMETERS, b''
+        state = self._extended_set(params[0])
+        if state is None:
+            return STATUS_UNKNOWN_ADVERTISING_IDENTIFIER, b''
+        # Legacy PDU sets: at most 31 bytes, complete data in one operation
+        if params[3] > ADV_DATA_LENGTH:
+            return STATUS_INVALID_PARAMETERS, b''
+        state['data'] = bytes(params[4:])
+        return STATUS_SUCCESS, b''
+
+    def _set_extended_enable(self, params):
+        if not self.extended:
+            return STATUS_UNKNOWN_COMMAND, b''
+        if len(params) < 2 or len(params) != 2 + 4 * params[1]:
+            return STATUS_INVALID_PARAMETERS, b''
+        enable, count = params[0], params[1]
+        if count == 0:
+            if enable:
+                return STATUS_INVALID_PARAMETERS, b''
+            for state in self.sets.values():
+                state['enabled'] = False
+            return STATUS_SUCCESS, b''
+        if enable and self.advertising_enabled:
+            return STATUS_COMMAND_DISALLOWED, b''
+        handles = [params[2 + 4 * i] for i in range(count)]
+        if any(handle not in self.sets for handle in handles):
+            return STATUS_UNKNOWN_ADVERTISING_IDENTIFIER, b''
+        if enable and any(self.sets[handle]['parameters'] is None or self.sets[handle]['data'] is None
+                          for handle in handles):
+            # Out of order: enable before parameters and data
+            return STATUS_COMMAND_DISALLOWED, b''
+        for handle in handles:
+            self.sets[handle]['enabled'] = bool(enable)
+        return STATUS_SUCCESS, b''
+
+    def _read_number_of_sets(self, params):
+        if not self.extended:
+            return STATUS_UNKNOWN_COMMAND, b''
+        return STATUS_SUCCESS, bytes([self.advertising_sets])
+
+    def _remove_set(self, params):
+        if not self.extended:
+            return STATUS_UNKNOWN_COMMAND, b''
+        if len(params) != 1:
+            return STATUS_INVALID_PARAMETERS, b''
+        state = self.sets.get(params[0])
+        if state is None:
+            return STATUS_UNKNOWN_ADVERTISING_IDENTIFIER, b''
+        if state['enabled']:
+            return STATUS_COMMAND_DISALLOWED, b''
+        del self.sets[params[0]]
+        return STATUS_SUCCESS, b''
+
+    def _clear_sets(self, params):
+        if not self.extended:
+            return STATUS_UNKNOWN_COMMAND, b''
+        if any(state['enabled'] for state in self.sets.values()):
+            return STATUS_COMMAND_DISALLOWED, b''
+        self.sets = {}
+        return STATUS_SUCCESS, b''
+
+    _HANDLERS = {
+        opcode(OGF_HOST_CTL, OCF_RESET): _reset,
+        opcode(OGF_LE_CTL, OCF_LE_READ_LOCAL_SUPPORTED_FEATURES): _read_features,
+        opcode(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_PARAMETERS): _set_advertising_parameters,
+        opcode(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_DATA): _set_advertising_data,
+        opcode(OGF_LE_CTL, OCF_LE_SET_ADVERTISE_ENABLE): _set_advertise_enable,
+        opcode(OGF_LE_CTL, OCF_LE_SET_SCAN_PARAMETERS): _set_scan_parameters,
+        opcode(OGF_LE_CTL, OCF_LE_SET_SCAN_ENABLE): _set_scan_enable,
+        opcode(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS): _set_random_address,
+        opcode(OGF_LE_CTL, OCF_LE_SET_EXTENDED_ADVERTISING_PARAMETERS): _set_extended_parameters,
+        opcode(OGF_LE_CTL, OCF_LE_SET_EXTENDED_ADVERTISING_DATA): _set_extended_data,
+        opcode(OGF_LE_CTL, OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE): _set_extended_enable,
+        opcode(OGF_LE_CTL, OCF_LE_READ_NUMBER_OF_SUPPORTED_ADVERTISING_SETS): _read_number_of_sets,
+        opcode(OGF_LE_CTL, OCF_LE_REMOVE_ADVERTISING_SET): _remove_set,
+        opcode(OGF_LE_CTL, OCF_LE_CLEAR_ADVERTISING_SETS): _clear_sets,
+    }
+
+    # Advertising report traffic
+
+    def advertisers(self) -> list:
+        """:return: list of (address, data, interval in seconds) the controller is advertising"""
+        with self._lock:
+            return self._advertisers()
+
+    def _advertisers(self) -> list:
+        result = []
+        if self.advertising_enabled:
+            parameters = self.advertising_parameters
+            interval = parameters[0] | (parameters[1] << 8) if parameters else DEFAULT_ADV_INTERVAL
+            result.append((CONTROLLER_ADDRESS, self.advertising_data, interval * 0.000625))
+        for state in self.sets.values():
+            if state['enabled']:
+                interval = int.from_bytes(state['parameters'][3:6], 'little')
+                result.append((state['address'] or CONTROLLER_ADDRESS, state['data'], interval * 0.000625))
+        return result
+
+    def _generate_reports(self) -> None:
+        """
+        Deliver synthetic reports at report_rate to every connection while scanning,
+        plus the controller's own advertising once per advertising interval (loopback).
+        Sends never block: a host that does not read fast enough loses reports, like
+        a controller whose event buffer overflows.
+        """
+        rng = random.Random(0)
+        templates = {}
+        index = 0
+        sent = 0
+        origin = time.monotonic()
+        own_due = {}  # address -> next loopback report time
+        while True:
+            with self._lock:
+                while self._running and not self.scan_enabled:
+                    self._scan_changed.wait()
+                    sent = 0
+                    origin = time.monotonic()
+                if not self._running:
+                    return
+                connections = list(self._connections)
+                rate = self.report_rate
+                extended = self.extended_reports
+                own = self._advertisers()
+
+            now = time.monotonic()
+            for address, data, interval in own:
+                if now >= own_due.get(address, 0.0):
+                    own_due[address] = now + interval
+                    self._deliver(connections, build_advertising_report(address, -40, data, extended))
+
+            due = min(int((now - origin) * rate) - sent, _MAX_BURST) if rate > 0 else 0
+            if due <= 0:
+                time.sleep(min(0.001, 1.0 / rate) if rate > 0 else 0.001)
+                continue
+            for _ in range(due):
+                key = (index, extended)
+                packet = templates.get(key)
+                if packet is None:
+                    address, data = self._devices[index]
+                    packet = templates[key] = build_advertising_report(address, -60, data, extended)
+                packet[report_rssi_offset(packet, extended)] = rng.randrange(-100, -30) & 0xFF
+                self._deliver(connections, packet)
+                index = (index + 1) % len(self._devices)
+            sent += due
+            if due == _MAX_BURST:
+                # Fell behind, don't try to catch up
+                sent = int((time.monotonic() - origin) * rate)
+
+    def _deliver(self, connections, packet) -> None:
+        for connection in connections:
+            if self.drop_rate > 0 and self._random.random() < self.drop_rate:
+                self.dropped_events += 1
+                continue
+            try:
+                connection.send(packet, socket.MSG_DONTWAIT)
+                self.reports_sent += 1
+            except BlockingIOError:
+                self.reports_overflowed += 1
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            'commands': sum(self.commands.values()),
+            'command_errors': self.command_errors,
+            'dropped_events': self.dropped_events,
+            'reports_sent': self.reports_sent,
+            'reports_overflowed': self.reports_overflowed,
+        }
@@ -0,0 +1,267 @@
+"""
+Metrics
+Counters, gauges and log-bucketed latency histograms, with a JSON / Prometheus
+text snapshot and an optional HTTP endpoint.
+
+Instruments live in a registry that is disabled by default: the hot-path methods
+(Counter.inc, Histogram.record / record_since) of disabled instruments are
+replaced by a no-op function, so an instrumented call costs one empty call.
+Recording keeps fixed-size storage, nothing is kept per sample.
+
+    from core.metrics import registry
+    COMMAND_SECONDS = registry.histogram('hci_command_seconds', 'HCI command round-trip time')
+    start = time.perf_counter_ns()
+    ...
+    COMMAND_SECONDS.record_since(start)
+"""
+
+import json
+import threading
+import time
+from array import array
+
+
+def _noop(*args) -> None:
+    pass
+
+
+class Counter():
+    """Monotonic count, or read from fn() at snapshot time"""
+
+    HOT_METHODS = ('inc',)
+    TYPE = 'counter'
+
+    def __init__(self, name: str, help: str = '', fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self._value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self._value += amount
+
+    @property
+    def value(self):
+        return self.fn() if self.fn is not None else self._value
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge(Counter):
+    """Current value, set() or read from fn() at snapshot time"""
+
+    HOT_METHODS = ('set',)
+    TYPE = 'gauge'
+
+    def set(self, value) -> None:
+        self._value = value
+
+
+class Histogram():
+    """Power-of-two buckets of durations in microseconds, bucket i counts values below 2**i us"""
+
+    HOT_METHODS = ('record', 'record_since')
+    TYPE = 'histogram'
+    BUCKETS = 24  # last bucket: >= 2**22 us (~4 s)
+
+    def __init__(self, name: str = '', help: str = ''):
+        self.name = name
+        self.help = help
+        self.counts = array('q', bytes(8 * self.BUCKETS))
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, value_us: int) -> None:
+        if value_us < 0:
+            value_us = 0
+        index = value_us.bit_length()
+        if index >= self.BUCKETS:
+            index = self.BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def record_since(self, start_ns: int) -> None:
+        """Record the time elapsed since start_ns (time.perf_counter_ns())"""
+        self.record((time.perf_counter_ns() - start_ns) // 1000)
+
+    def buckets(self) -> list:
+        """:return: list of (upper bound in us, count) of non-empty buckets"""
+        return [(1 << i, n) for i, n in enumerate(self.counts) if n]
+
+    def mean_us(self) -> float:
+        return self.total_us / self.count if self.count else 0.0
+
+    def quantile_us(self, q: float) -> int:
+        """:return: int, upper bound in us of the bucket holding the q quantile"""
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return 1 << i
+        return 0
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum_seconds': self.total_us / 1e6,
+            'max_seconds': self.max_us / 1e6,
+            'p50_seconds': self.quantile_us(0.5) / 1e6,
+            'p99_seconds': self.quantile_us(0.99) / 1e6,
+            'buckets': [[bound / 1e6, n] for bound, n in self.buckets()],
+        }
+
+    def __str__(self) -> str:
+        rows = [f"  < {bound:>8} us: {n}" for bound, n in self.buckets()]
+        return '\n'.join([f"{self.name or 'samples'}: {self.count} mean: {self.mean_us():.0f} us max: {self.max_us} us"] + rows)
+
+
+class Registry():
+    """Named instruments, enabled or disabled together"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._instruments = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, *args):
+        with self._lock:
+            instrument = self._instruments.get(name)
+            if instrument is None:
+                instrument = self._instruments[name] = cls(name, *args)
+                self._apply(instrument)
+            elif not isinstance(instrument, cls):
+                raise ValueError(f"Metric {name} already registered as {instrument.TYPE}")
+            return instrument
+
+    def counter(self, name: str, help: str = '', fn=None) -> Counter:
+        """Get or create a counter; fn (e.g. reading an existing attribute) replaces any previous one"""
+        counter = self._get(Counter, name, help)
+        if fn is not None:
+            counter.fn = fn
+        return counter
+
+    def gauge(self, name: str, help: str = '', fn=None) -> Gauge:
+        gauge = self._get(Gauge, name, help)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name: str, help: str = '') -> Histogram:
+        return self._get(Histogram, name, help)
+
+    def enable(self) -> None:
+        self._set_enabled(True)
+
+    def disable(self) -> None:
+        self._set_enabled(False)
+
+    def _set_enabled(self, enabled: bool) -> None:
+        with self._lock:
+            self.enabled = enabled
+            for instrument in self._instruments.values():
+                self._apply(instrument)
+
+    def _apply(self, instrument) -> None:
+        # Instance attributes shadow the class methods
+        for method in instrument.HOT_METHODS:
+            if self.enabled:
+                instrument.__dict__.pop(method, None)
+            else:
+                setattr(instrument, method, _noop)
+
+    def snapshot(self) -> dict:
+        """:return: dict with counters, gauges and histograms by name"""
+        result = {'enabled': self.enabled, 'counters': {}, 'gauges': {}, 'histograms': {}}
+        with self._lock:
+            instruments = list(self._instruments.values())
+        for instrument in instruments:
+            result[instrument.TYPE + 's'][instrument.name] = instrument.snapshot()
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), separators=(',', ':'))
+
+    def to_prometheus(self) -> str:
+        """:return: str, Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            instruments = sorted(self._instruments.values(), key=lambda instrument: instrument.name)
+        for instrument in instruments:
+            name = instrument.name
+            if instrument.help:
+                lines.append(f"# HELP {name} {instrument.help}")
+            lines.append(f"# TYPE {name} {instrument.TYPE}")
+            if isinstance(instrument, Histogram):
+                cumulative = 0
+                for i, n in enumerate(instrument.counts[:-1]):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{le="{(1 << i) / 1e6:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{le="+Inf"}} {instrument.count}')
+                lines.append(f"{name}_sum {instrument.total_us / 1e6:g}")
+                lines.append(f"{name}_count {instrument.count}")
+            else:
+                lines.append(f"{name} {instrument.value:g}")
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry, enabled by --metrics-port
+registry = Registry()
+
+
+class MetricsServer():
+    """HTTP endpoint: GET /metrics (Prometheus text) and GET /metrics.json"""
+
+    def __init__(self, metrics: Registry = None, port: int = 9464, host: str = '127.0.0.1'):
+        self.registry = metrics or registry
+        self.port = port
+        self.host = host
+        self._server = None
+        self._thread = None
+
+    def start(self) -> None:
+        # http.server is only imported when metrics are served, it is most of the import time otherwise
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+
+        class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        metrics = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = metrics.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
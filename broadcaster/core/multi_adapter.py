@@ -0,0 +1,235 @@
+"""
+Multi-adapter broadcaster
+Drive hci0..hciN from one process, one worker thread per adapter, so a slow or
+hung adapter never blocks updates to the others.
+
+Config file (JSON):
+
+    {
+        "repeat_interval": 1.0,
+        "beacons": [
+            {"hwid": "0123456789", "message": "01", "adapter": "hci0"},
+            {"hwid": "abcdefabcd", "message": "", "interval": 0.2}
+        ]
+    }
+
+Beacons without "adapter" are spread over the discovered adapters. Every hwid may
+appear once: beacons are keyed by hwid, a second entry would replace the first.
+"""
+
+import json
+import os
+import threading
+import time
+from core.scheduler import BeaconScheduler
+
+SYSFS_BLUETOOTH = '/sys/class/bluetooth'
+
+
+def discover_adapters(sysfs: str = SYSFS_BLUETOOTH) -> list:
+    """:return: list of int, adapter indexes (0 for hci0) found in sysfs"""
+    if not os.path.isdir(sysfs):
+        return []
+    return sorted(int(name[3:]) for name in os.listdir(sysfs) if name.startswith('hci') and name[3:].isdigit())
+
+
+def _adapter_index(adapter) -> int:
+    if isinstance(adapter, int):
+        return adapter
+    adapter = str(adapter)
+    return int(adapter[3:] if adapter.startswith('hci') else adapter)
+
+
+def load_config(path: str, adapters: list = None) -> tuple:
+    """
+    Read a multi-adapter config file and assign every beacon to an adapter
+    :param adapters: adapter indexes to use for unassigned beacons, discovered when None
+    :return: (assignment, repeat_interval), assignment maps adapter index -> list of (hwid, message, interval)
+    """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+
+    if adapters is None:
+        adapters = discover_adapters()
+    assignment = {index: [] for index in adapters}
+    unassigned = []
+    seen = set()
+    for beacon in config.get('beacons', []):
+        hwid = str(beacon['hwid']).lower()
+        if hwid in seen:
+            raise ValueError(f"Duplicate hwid {beacon['hwid']} in {path}")
+        seen.add(hwid)
+        entry = (beacon['hwid'], beacon.get('message', ''), beacon.get('interval'))
+        if 'adapter' in beacon:
+            assignment.setdefault(_adapter_index(beacon['adapter']), []).append(entry)
+        else:
+            unassigned.append(entry)
+
+    if unassigned:
+        if not assignment:
+            raise Exception("No Bluetooth adapter found")
+        for entry in unassigned:
+            # Least loaded adapter first
+            index = min(assignment, key=lambda i: (len(assignment[i]), i))
+            assignment[index].append(entry)
+
+    return {index: beacons for index, beacons in assignment.items() if beacons}, config.get('repeat_interval', 1.0)
+
+
+class AdapterWorker():
+    """Own one transmitter and apply the updates of its beacons on a dedicated thread"""
+
+    def __init__(self, name: str, transmitter, beacons, repeat_interval: float = 1.0):
+        """
+        :param name: adapter name, e.g. hci0
+        :param transmitter: platform transmitter, not initialized yet
+        :param beacons: list of (hwid, message, interval)
+        :param repeat_interval: per-beacon repeat interval when the beacons have to be time-sliced
+        """
+        self.name = name
+        self.transmitter = transmitter
+        self.beacons = {hwid: [message, interval] for hwid, message, interval in beacons}
+        if len(self.beacons) != len(beacons):
+            raise ValueError(f"Duplicate hwid in the beacons of {name}")
+        self.repeat_interval = repeat_interval
+        self.scheduler = None
+        self.error = None
+        self._slots = {hwid: index for index, hwid in enumerate(self.beacons)}
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._running = False
+        self._thread = None
+        # Counters
+        self.submitted = 0
+        self.applied = 0
+        self.failed = 0
+        self.last_latency = 0.0
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'adapter-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the worker, a hung adapter is abandoned after timeout seconds"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+            if self.scheduler is not None:
+                self.scheduler.stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, hwid: str, device_message: str) -> None:
+        """Queue a new device message for one of this adapter's beacons, never blocks on the adapter"""
+        if hwid not in self.beacons:
+            raise KeyError(f"{hwid} is not assigned to {self.name}")
+        with self._cond:
+            self.submitted += 1
+            if self.scheduler is None:
+                self._pending[hwid] = device_message
+                self._cond.notify()
+                return
+        # Time-sliced: the next slot of this beacon picks up the new data
+        self.scheduler.set_entry(self._slots[hwid], hwid, device_message)
+        self.beacons[hwid][0] = device_message
+        self.applied += 1
+
+    def _needs_time_slicing(self) -> bool:
+        if len(self.beacons) == 1:
+            return False
+        ext_advertiser = getattr(self.transmitter, 'ext_advertiser', None)
+        return ext_advertiser is None or ext_advertiser.max_sets < len(self.beacons)
+
+    def _apply(self) -> bool:
+        if len(self.beacons) == 1:
+            hwid, (message, _) = next(iter(self.beacons.items()))
+            return self.transmitter.start_advertising(hwid, message)
+        return self.transmitter.start_advertising_sets(
+            [(hwid, message, interval) if interval else (hwid, message)
+             for hwid, (message, interval) in self.beacons.items()])
+
+    def _run(self) -> None:
+        try:
+            if not self.transmitter.initialize():
+                raise Exception(f"Failed to initialize {self.name}")
+
+            if self._needs_time_slicing():
+                with self._cond:
+                    for hwid, message in self._pending.items():
+                        self.beacons[hwid][0] = message
+                    self.applied += len(self._pending)
+                    self._pending = {}
+                    self.scheduler = BeaconScheduler(
+                        self.transmitter, [(hwid, self.beacons[hwid][0]) for hwid in self._slots],
+                        self.repeat_interval)
+                if self._running:
+                    self.scheduler.run()
+            else:
+                if not self._apply():
+                    self.failed += 1
+                while True:
+                    with self._cond:
+                        while not self._pending and self._running:
+                            self._cond.wait()
+                        if not self._running:
+                            break
+                        pending, self._pending = self._pending, {}
+                    for hwid, message in pending.items():
+                        self.beacons[hwid][0] = message
+                    start = time.perf_counter()
+                    if self._apply():
+                        self.applied += len(pending)
+                    else:
+                        self.failed += len(pending)
+                    self.last_latency = time.perf_counter() - start
+
+            self.transmitter.stop_advertising()
+        except Exception as e:
+            self.error = e
+            print(f"Error on {self.name}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            'beacons': len(self.beacons),
+            'mode': 'time-sliced' if self.scheduler is not None else 'direct',
+            'submitted': self.submitted,
+            'applied': self.applied,
+            'failed': self.failed,
+            'last_latency_us': int(self.last_latency * 1e6),
+            'error': str(self.error) if self.error else None,
+        }
+
+
+class MultiAdapterBroadcaster():
+    """Broadcast beacons from several adapters concurrently"""
+
+    def __init__(self, assignment: dict, repeat_interval: float = 1.0, transmitter_factory=None):
+        """
+        :param assignment: adapter index -> list of (hwid, message, interval), see load_config()
+        :param repeat_interval: per-beacon repeat interval for time-sliced adapters
+        :param transmitter_factory: callable(dev_id) returning a transmitter, LinuxTransmitter by default
+        """
+        if transmitter_factory is None:
+            from platforms.linux import LinuxTransmitter
+            transmitter_factory = LinuxTransmitter
+        self.workers = [
+            AdapterWorker(f'hci{index}', transmitter_factory(index), beacons, repeat_interval)
+            for index, beacons in sorted(assignment.items())
+        ]
+        self._routes = {hwid: worker for worker in self.workers for hwid in worker.beacons}
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        for worker in self.workers:
+            worker.stop(timeout)
+
+    def update(self, hwid: str, device_message: str) -> None:
+        """Queue a new device message for a beacon on whichever adapter carries it"""
+        self._routes[hwid].submit(hwid, device_message)
+
+    def stats(self) -> dict:
+        return {worker.name: worker.stats() for worker in self.workers}
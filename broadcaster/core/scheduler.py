@@ -0,0 +1,95 @@
+"""
+Virtual beacon scheduler
+Time-multiplex many (hwid, device_message) entries through one advertiser.
+Every entry gets a slot once per repeat interval; the advertising data of all
+entries is built up front and the slots are kept in a heap ordered by their
+planned monotonic time.
+"""
+
+import heapq
+import time
+from core.beacon_core import BeaconCore
+from core.metrics import Histogram
+
+class BeaconScheduler():
+    """Rotate virtual beacons through one transmitter"""
+
+    def __init__(self, transmitter, entries, repeat_interval: float = 1.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        :param transmitter: initialized transmitter with advertise_pdu(adv_data) -> bool
+        :param entries: sequence of (hwid, device_message), hex strings or bytes
+        :param repeat_interval: seconds between two slots of the same entry
+        :param clock: monotonic clock, replaceable for tests
+        :param sleep: sleep function, replaceable for tests
+        """
+        entries = list(entries)
+        if not entries:
+            raise ValueError("At least one beacon entry is required")
+        self.transmitter = transmitter
+        self.entries = entries
+        self.repeat_interval = repeat_interval
+        self.slot_interval = repeat_interval / len(entries)
+        self.clock = clock
+        self.sleep = sleep
+        # Prebuilt advertising data, one 31 bytes memoryview per entry
+        self.pdus = BeaconCore.build_advertising_data_batch(entries)
+        # Slot lateness, always recorded (not part of the shared registry)
+        self.jitter = Histogram('slot lateness')
+        self.slots = 0
+        self.failed = 0
+        self.skipped = 0
+        self._heap = []
+        self._running = False
+
+    def set_entry(self, index: int, hwid, device_message) -> None:
+        """
+        Replace the hwid/message of one entry, safe to call from another thread while running
+        The new advertising data is built aside and swapped in, a slot never sends a half-written frame.
+        """
+        self.pdus[index] = BeaconCore.build_advertising_data_batch([(hwid, device_message)])[0]
+        self.entries[index] = (hwid, device_message)
+
+    def _reset_heap(self, start: float) -> None:
+        # Entries are spread evenly over the repeat interval
+        self._heap = [(start + i * self.slot_interval, i) for i in range(len(self.pdus))]
+        heapq.heapify(self._heap)
+
+    def run(self, duration: float = None, max_slots: int = None) -> None:
+        """
+        Run the rotation until stop(), duration seconds, or max_slots slots
+        """
+        start = self.clock()
+        end = start + duration if duration is not None else None
+        self._reset_heap(start)
+        self._running = True
+
+        while self._running:
+            planned, index = self._heap[0]
+            if end is not None and planned >= end:
+                break
+            if max_slots is not None and self.slots >= max_slots:
+                break
+
+            delay = planned - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+
+            now = self.clock()
+            if not self.transmitter.advertise_pdu(self.pdus[index]):
+                self.failed += 1
+            self.slots += 1
+            self.jitter.record(int((now - planned) * 1e6))
+
+            next_planned = planned + self.repeat_interval
+            if next_planned < now:
+                # Fell behind by a whole rotation: skip the missed slots instead of bursting
+                missed = int((now - planned) // self.repeat_interval)
+                self.skipped += missed
+                next_planned = planned + (missed + 1) * self.repeat_interval
+            heapq.heapreplace(self._heap, (next_planned, index))
+
+        self._running = False
+
+    def stop(self) -> None:
+        self._running = False
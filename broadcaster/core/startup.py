@@ -0,0 +1,53 @@
+"""
+Startup timeline
+Named marks from process start to the first advertisement, printed by
+broadcaster.py --timing. A mark is one perf_counter() call and a list append,
+so the platforms mark their bring-up steps unconditionally.
+
+    from core.startup import timeline
+    timeline.mark('hci open')
+"""
+
+import os
+import time
+
+
+def _process_start_offset() -> float:
+    """:return: float, seconds from process creation to now (Linux /proc, 0 elsewhere), 10 ms resolution"""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            # Fields after the parenthesized command name, starttime is field 22
+            start_ticks = int(f.read().rsplit(b')', 1)[1].split()[19])
+        with open('/proc/uptime', 'rb') as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupTimeline():
+    """Ordered (name, perf_counter) marks"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.marks = []
+
+    def mark(self, name: str) -> None:
+        self.marks.append((name, time.perf_counter()))
+
+    def report(self) -> str:
+        """:return: str, one line per step with its duration and the time since the timeline origin"""
+        lines = []
+        # Interpreter start-up and the imports before core.startup happen before the origin
+        before = _process_start_offset() - (time.perf_counter() - self.origin)
+        if before > 0:
+            lines.append(f"{'interpreter start':<28} {before * 1000:8.2f} ms")
+        previous = self.origin
+        for name, when in self.marks:
+            lines.append(f"{name:<28} {(when - previous) * 1000:8.2f} ms  (at {(when - self.origin) * 1000:8.2f} ms)")
+            previous = when
+        return '\n'.join(lines)
+
+
+# Process-wide timeline, its origin is the first import of this module
+timeline = StartupTimeline()
@@ -1,78 +1,148 @@
 """
 LINE Simple Beacon Linux platform implementation
-Using hcitool command.
+Using a raw HCI socket (see core/hci.py).
 """
 
-import subprocess
 import time
-from core.beacon_core import BeaconCore
+
+from core.beacon_core import BeaconCore, HWID_OFFSET, HWID_BYTES
+from core.hci import (
+    HCITransport, HCIError, LE_FEATURE_EXTENDED_ADVERTISING,
+    build_advertising_parameters, interval_units,
+)
+from core.advertiser import Advertiser
+from core.ext_advertiser import ExtendedAdvertiser, random_static_address
+from core.metrics import registry
+from core.startup import timeline
+
+ADVERTISING_START_SECONDS = registry.histogram(
+    'advertising_start_seconds', 'Time to start advertising, controller setup included')
+ADVERTISING_UPDATE_SECONDS = registry.histogram(
+    'advertising_update_seconds', 'Time to change the data of running advertising')
 
 class LinuxTransmitter():
-    def __init__(self):
-        self.hcitool_process = None
+    def __init__(self, dev_id: int = 0, socket_factory=None, use_extended: bool = True, capability_cache=None):
+        """
+        :param dev_id: adapter index, 0 for hci0
+        :param socket_factory: optional callable(dev_id) returning a socket-like object,
+            used instead of a real HCI socket (e.g. one end of a socketpair)
+        :param use_extended: use BLE 5 extended advertising when the controller supports it
+        :param capability_cache: optional AdapterCache, skips the capability probe on repeat starts
+        """
+        self.dev_id = dev_id
+        self.transport = HCITransport(dev_id, socket_factory=socket_factory)
+        self.advertiser = Advertiser(self.transport)
+        self.adv_parameters = build_advertising_parameters()
+        self.use_extended = use_extended
+        self.capability_cache = capability_cache
+        # Set by initialize() when the controller supports extended advertising
+        self.ext_advertiser = None
+        self._advertising = False
+        # ((hwid, device_message), advertising data) set by prepare()
+        self._prepared = None
+
+    def prepare(self, hwid, device_message='') -> None:
+        """
+        Build the advertising data of the first beacon before the adapter is brought up,
+        initialize() advertises it as soon as the controller is ready
+        """
+        self._prepared = ((hwid, device_message), self.create_line_simple_beacon_pdu(hwid, device_message))
 
     def initialize(self):
         """Initialize the BLE adapter"""
         try:
-            # Make sure the Bluetooth adapter is up
-            subprocess.run(['sudo', 'hciconfig', 'hci0', 'up'], check=True)
-            # Stop any existing broadcasts
-            subprocess.run(['sudo', 'hciconfig', 'hci0', 'noleadv'], check=False)
+            # Open the HCI socket, this also makes sure the Bluetooth adapter is up
+            self.transport.open()
+            timeline.mark('hci open')
+            cached = self._load_capabilities()
+            try:
+                self._reset_advertising()
+            except HCIError:
+                if not cached:
+                    raise
+                # The cached capabilities do not match the controller, probe again
+                self.capability_cache.invalidate(self.dev_id)
+                self._load_capabilities()
+                self._reset_advertising()
+            timeline.mark('advertising reset')
+            if self._prepared is not None and not self.advertise_pdu(self._prepared[1]):
+                return False
             return True
         except Exception as e:
             print(f"Error initializing BLE: {e}")
             return False
 
+    def _reset_advertising(self) -> None:
+        """Stop any existing broadcasts, the controller state is unknown until now"""
+        if self.ext_advertiser is not None:
+            self.ext_advertiser.clear()
+        else:
+            self.advertiser.invalidate()
+            self.advertiser.update(enabled=False)
+        self._advertising = False
+
     def create_line_simple_beacon_pdu(self, hwid: str, device_message: str = '') -> bytes:
-        """Create LINE Simple Beacon advertising PDU"""
-        # Get service data from BeaconCore
-        service_data = BeaconCore.build_line_simple_beacon_service_data(hwid, device_message)
-        
-        # Create the advertising data
-        # Flags (0x02): LE General Discoverable Mode
-        flags = bytes([0x02, 0x01, 0x06])
-        
-        # LINE Simple Beacon Service UUID (0xFE6F)
-        service_uuid = bytes([0x03, 0x02, 0x6F, 0xFE])
-        
-        # Combine all data
-        return flags + service_uuid + service_data
+        """Create LINE Simple Beacon advertising PDU (31 bytes advertising data from BeaconCore)"""
+        return BeaconCore.build_advertising_data(hwid, device_message)
 
     def start_advertising(self, hwid: str, device_message: str = '') -> bool:
-        """Start advertising LINE Simple Beacon signal"""
+        """
+        Start advertising LINE Simple Beacon signal
+        Calling it again while advertising only sends what changed,
+        a new device message is a single LE Set Advertising Data command.
+        """
         try:
-            self.stop_advertising()
-
-            # 1. Flags
-            flags = bytes([0x02, 0x01, 0x06])
-            # 2. Complete List of 16-bit Service UUIDs
-            uuid = bytes([0x03, 0x02, 0x6F, 0xFE])
-            # 3. Service Data (from BeaconCore)
-            service_data = BeaconCore.build_line_simple_beacon_service_data(hwid, device_message)
-            # 3.1. Service Data AD structure: [len][0x16][UUID][payload]
-            # len = 1 (type) + 2 (uuid) + payload
-            service_data_ad = bytes([len(service_data)+1, 0x16]) + service_data
-
-            # Combine complete broadcast data
-            adv_data = flags + uuid + service_data_ad
-
-            # Pad to 31 bytes
-            if len(adv_data) < 31:
-                adv_data += bytes([0x00] * (31 - len(adv_data)))
-            elif len(adv_data) > 31:
-                print("Warning: Advertising data too long, truncated to 31 bytes")
-                adv_data = adv_data[:31]
-
-            # Convert to hcitool cmd format
-            hex_data = ' '.join(f'{b:02x}' for b in adv_data)
-            cmd = f"sudo hcitool -i hci0 cmd 0x08 0x0008 1f {hex_data}"
-
-            # Set broadcast data
-            subprocess.run(cmd, shell=True, check=True)
-
-            # Enable broadcasting
-            subprocess.run(['sudo', 'hciconfig', 'hci0', 'leadv'], check=True)
+            # Flags + Complete List of 16-bit Service UUIDs + Service Data (from BeaconCore)
+            if self._prepared is not None and self._prepared[0] == (hwid, device_message):
+                adv_data = self._prepared[1]
+            else:
+                adv_data = self.create_line_simple_beacon_pdu(hwid, device_message)
+        except Exception as e:
+            print(f"Error starting advertising: {e}")
+            return False
+        return self.advertise_pdu(adv_data)
 
+    def advertise_pdu(self, adv_data: bytes) -> bool:
+        """Advertise prebuilt advertising data (up to 31 bytes, e.g. from BeaconCore.build_advertising_data_batch)"""
+        try:
+            start = time.perf_counter_ns()
+            # Set broadcast parameters/data and enable broadcasting, as far as needed
+            if self.ext_advertiser is not None:
+                self.ext_advertiser.apply({0: (adv_data, None, None)})
+            else:
+                self.advertiser.update(adv_data, self.adv_parameters, enabled=True)
+            self._record_advertising_latency(start)
+            return True
+        except Exception as e:
+            print(f"Error starting advertising: {e}")
+            return False
+
+    def start_advertising_sets(self, beacons) -> bool:
+        """
+        Advertise several LINE Simple Beacons at the same time, one extended advertising set each
+        :param beacons: sequence of (hwid, device_message) or (hwid, device_message, interval in seconds)
+        :return: bool, False when the controller cannot carry all beacons
+        """
+        beacons = list(beacons)
+        if self.ext_advertiser is None:
+            if len(beacons) == 1:
+                return self.start_advertising(beacons[0][0], beacons[0][1])
+            print("Error starting advertising: controller does not support extended advertising, "
+                  "use core.scheduler.BeaconScheduler to time-slice the beacons")
+            return False
+        try:
+            start = time.perf_counter_ns()
+            pdus = BeaconCore.build_advertising_data_batch([(b[0], b[1]) for b in beacons])
+            desired = {}
+            for handle, (beacon, pdu) in enumerate(zip(beacons, pdus)):
+                interval = interval_units(beacon[2]) if len(beacon) > 2 else None
+                # Set 0 keeps the public address, the others get their own random static address
+                address = None
+                if handle:
+                    address = random_static_address(pdu[HWID_OFFSET:HWID_OFFSET + HWID_BYTES], handle)
+                desired[handle] = (pdu, interval, address)
+            self.ext_advertiser.apply(desired)
+            self._record_advertising_latency(start)
             return True
         except Exception as e:
             print(f"Error starting advertising: {e}")
@@ -81,12 +151,60 @@ class LinuxTransmitter():
     def stop_advertising(self):
         """Stop advertising"""
         try:
-            # Stop broadcasting
-            subprocess.run(['sudo', 'hciconfig', 'hci0', 'noleadv'], check=False)
-            
-            # Reset the Bluetooth adapter
-            subprocess.run(['sudo', 'hciconfig', 'hci0', 'reset'], check=False)
-            
+            # Stop broadcasting, the adapter keeps its parameters and data
+            if self.ext_advertiser is not None:
+                self.ext_advertiser.disable_all()
+            else:
+                self.advertiser.update(enabled=False)
+            self._advertising = False
         except Exception as e:
             print(f"Error stopping advertising: {e}")
 
+    def _record_advertising_latency(self, start_ns: int) -> None:
+        if self._advertising:
+            ADVERTISING_UPDATE_SECONDS.record_since(start_ns)
+        else:
+            ADVERTISING_START_SECONDS.record_since(start_ns)
+            self._advertising = True
+
+    def _load_capabilities(self) -> bool:
+        """
+        Set ext_advertiser from the cached or probed controller capabilities
+        :return: bool, True when they came from the cache
+        """
+        if not self.use_extended:
+            self.ext_advertiser = None
+            return False
+        cache = self.capability_cache
+        capabilities = cache.get(self.dev_id) if cache is not None else None
+        cached = capabilities is not None
+        if not cached:
+            capabilities = self._probe_capabilities()
+            if capabilities is not None and cache is not None:
+                cache.put(self.dev_id, *capabilities)
+        # A failed probe (timeout, busy controller) means legacy advertising for this run only
+        le_features, max_sets = capabilities if capabilities is not None else (0, 0)
+        if le_features & LE_FEATURE_EXTENDED_ADVERTISING and max_sets:
+            self.ext_advertiser = ExtendedAdvertiser(self.transport, max_sets)
+        else:
+            self.ext_advertiser = None
+        timeline.mark('capabilities (cached)' if cached else 'capabilities (probed)')
+        return cached
+
+    def _probe_capabilities(self):
+        """
+        :return: (LE features bit mask, number of advertising sets, 0 without extended advertising),
+            None when the controller did not answer
+        """
+        try:
+            le_features = self.transport.read_le_features()
+            if not le_features & LE_FEATURE_EXTENDED_ADVERTISING:
+                return le_features, 0
+            return le_features, self.transport.read_number_of_advertising_sets()
+        except HCIError:
+            return None
+
+    def cleanup(self) -> None:
+        """Close the HCI socket"""
+        self.transport.close()
+
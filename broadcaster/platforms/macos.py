@@ -9,6 +9,8 @@ from typing import Dict, Any
 import time
 import binascii
 from core.beacon_core import BeaconCore
+from core.metrics import registry
+from core.startup import timeline
 
 # Load CoreBluetooth framework
 CoreBluetooth = objc.loadBundle(
@@ -26,6 +28,15 @@ CBUUID = objc.lookUpClass('CBUUID')
 # Load Foundation classes
 from Foundation import NSMutableDictionary, NSString, NSArray
 
+ADVERTISING_START_SECONDS = registry.histogram(
+    'advertising_start_seconds', 'Time to start advertising, controller setup included')
+ADVERTISING_UPDATE_SECONDS = registry.histogram(
+    'advertising_update_seconds', 'Time to change the data of running advertising')
+POWER_ON_WAIT_SECONDS = registry.histogram(
+    'macos_power_on_wait_seconds', 'Wait for CBPeripheralManager to report PoweredOn')
+START_WAIT_SECONDS = registry.histogram(
+    'macos_start_advertising_wait_seconds', 'Wait from startAdvertising_ to peripheralManagerDidStartAdvertising')
+
 
 class MacOSBeaconDelegate(NSObject):
     """CoreBluetooth Peripheral Manager Delegate"""
@@ -60,8 +71,14 @@ class MacOSBeaconDelegate(NSObject):
         print(f"Bluetooth state: {state_name}")
         
         if state == 5:  # CBPeripheralManagerStatePoweredOn
+            timeline.mark('powered on')
             self.transmitter._set_initialized_state(True)
             self._init_complete = True
+            if self.transmitter._prepared is not None:
+                # Advertise the prebuilt data right away, the event loop stops in the started callback
+                self.transmitter._start_requested_ns = time.perf_counter_ns()
+                peripheral.startAdvertising_(self.transmitter._prepared[1])
+                return
             # Stop event loop after getting PoweredOn state.
             AppHelper.stopEventLoop()
         else:
@@ -74,9 +91,13 @@ class MacOSBeaconDelegate(NSObject):
         if error:
             print(f"DEBUG: Broadcasting failed, error: {error}")
             self.transmitter._set_advertising_state(False)
+            self.transmitter._set_start_result(False)
         else:
             print("DEBUG: Broadcasting started successfully")
+            START_WAIT_SECONDS.record_since(self.transmitter._start_requested_ns)
+            timeline.mark('advertising started')
             self.transmitter._set_advertising_state(True)
+            self.transmitter._set_start_result(True)
         # Stop event loop after broadcasting starts. Important!
         AppHelper.stopEventLoop()
 
@@ -90,7 +111,14 @@ class MacOSTransmitter():
         self._delegate = None
         self._should_stop = False
         self._is_initialized = False
-        self._is_advertising = False    
+        self._is_advertising = False
+        self._start_requested_ns = 0
+        # Outcome of the last startAdvertising_ request, None until its callback arrives
+        self._start_result = None
+        # ((hwid, device_message), advertisement dictionary) set by prepare()
+        self._prepared = None
+        # (hwid, device_message) being advertised
+        self._advertised = None
 
     def _set_initialized_state(self, state: bool) -> None:
         self._is_initialized = state
@@ -98,6 +126,9 @@ class MacOSTransmitter():
     def _set_advertising_state(self, state: bool) -> None:
         self._is_advertising = state
 
+    def _set_start_result(self, started: bool) -> None:
+        self._start_result = started
+
     def _run_event_loop(self, timeout):
         """Execute event loop, and set timeout
         
@@ -115,6 +146,36 @@ class MacOSTransmitter():
         except Exception as e:
             print(f"DEBUG: Event loop exception: {e}")
     
+    def prepare(self, hwid, device_message='') -> None:
+        """
+        Build the advertisement of the first beacon before Bluetooth is powered on,
+        initialize() starts advertising it from the PoweredOn callback
+        """
+        self._prepared = ((hwid, device_message), self._build_advertisement(hwid, device_message))
+
+    def _build_advertisement(self, hwid, device_message):
+        """Return the CoreBluetooth advertisement dictionary of one LINE Simple Beacon"""
+        print("DEBUG: Building LINE Simple Beacon Service Data")
+        service_data_bytes = BeaconCore.build_line_simple_beacon_service_data(hwid, device_message)
+        print(f"DEBUG: Service Data (hex)：{binascii.hexlify(service_data_bytes).decode()}")
+
+        # Assemble CoreBluetooth broadcast data
+        line_service_uuid_str = "FE6F"
+        beacon_nsdata = NSData.dataWithBytes_length_(service_data_bytes, len(service_data_bytes))
+
+        adv_data = NSMutableDictionary.dictionary()
+        service_uuids_key = NSString.stringWithString_("CBAdvertisementDataServiceUUIDsKey")
+        service_data_key = NSString.stringWithString_("CBAdvertisementDataServiceDataKey")
+
+        # Use NSString string directly, don't use CBUUID
+        adv_data.setObject_forKey_([NSString.stringWithString_(line_service_uuid_str)], service_uuids_key)
+        service_data_dict = NSMutableDictionary.dictionary()
+        service_data_dict.setObject_forKey_(beacon_nsdata, NSString.stringWithString_(line_service_uuid_str))
+        adv_data.setObject_forKey_(service_data_dict, service_data_key)
+
+        print(f"DEBUG: Broadcast data: {adv_data}")
+        return adv_data
+
     def initialize(self) -> bool:
         """Initialize CoreBluetooth
         
@@ -122,6 +183,7 @@ class MacOSTransmitter():
             bool: If initialization is successful, return True
         """
         print("DEBUG: Entering initialize()")
+        start = time.perf_counter_ns()
         self._delegate = MacOSBeaconDelegate.alloc().initWithTransmitter_(self)
         self._peripheral_manager = CBPeripheralManager.alloc().initWithDelegate_queue_options_(
             self._delegate, None, None
@@ -135,6 +197,10 @@ class MacOSTransmitter():
             AppHelper.stopEventLoop() # Ensure stop event loop when Ctrl+C is pressed
         
         if self._is_initialized:
+            POWER_ON_WAIT_SECONDS.record_since(start)
+            if self._is_advertising:
+                self._advertised = self._prepared[0]
+                ADVERTISING_START_SECONDS.record_since(self._start_requested_ns)
             print("DEBUG: Initialization successful.")
             return True
         else:
@@ -146,11 +212,16 @@ class MacOSTransmitter():
         Start broadcasting LINE Simple Beacon (macOS specific)
         Args:
             hwid: Hardware ID (10-digit hexadecimal string)
-            device_message: Device message (16-digit hexadecimal string)
+            device_message: Device message (hexadecimal string or bytes, up to 13 bytes)
         Returns:
             bool: If broadcasting starts successfully, return True
         """
         print("==== DEBUG: Calling start_advertising ====")
+        if self._is_advertising and self._advertised == (hwid, device_message):
+            # Already started from the PoweredOn callback (prepare)
+            return True
+        start = time.perf_counter_ns()
+        was_advertising = self._is_advertising
         if not self._is_initialized:
             print("DEBUG: Not initialized!")
             raise Exception("Not initialized")
@@ -160,43 +231,42 @@ class MacOSTransmitter():
             raise Exception("Bluetooth not powered on")
 
         try:
-            print("DEBUG: Building LINE Simple Beacon Service Data")
-            service_data_bytes = BeaconCore.build_line_simple_beacon_service_data(hwid, device_message)
-            print(f"DEBUG: Service Data (hex)：{binascii.hexlify(service_data_bytes).decode()}")
-
-            # Assemble CoreBluetooth broadcast data
-            line_service_uuid_str = "FE6F"
-            beacon_nsdata = NSData.dataWithBytes_length_(service_data_bytes, len(service_data_bytes))
-
-            adv_data = NSMutableDictionary.dictionary()
-            service_uuids_key = NSString.stringWithString_("CBAdvertisementDataServiceUUIDsKey")
-            service_data_key = NSString.stringWithString_("CBAdvertisementDataServiceDataKey")
-
-            # Use NSString string directly, don't use CBUUID
-            adv_data.setObject_forKey_([NSString.stringWithString_(line_service_uuid_str)], service_uuids_key)
-            service_data_dict = NSMutableDictionary.dictionary()
-            service_data_dict.setObject_forKey_(beacon_nsdata, NSString.stringWithString_(line_service_uuid_str))
-            adv_data.setObject_forKey_(service_data_dict, service_data_key)
+            if self._prepared is not None and self._prepared[0] == (hwid, device_message):
+                adv_data = self._prepared[1]
+            else:
+                adv_data = self._build_advertisement(hwid, device_message)
 
-            print(f"DEBUG: Broadcast data: {adv_data}")
+            if was_advertising:
+                # CoreBluetooth refuses a second startAdvertising_ (CBErrorAlreadyAdvertising),
+                # stop first so the callback below answers the new data
+                self._peripheral_manager.stopAdvertising()
+                self._set_advertising_state(False)
+                self._advertised = None
 
             print("DEBUG: Calling startAdvertising_")
+            self._start_result = None
+            self._start_requested_ns = time.perf_counter_ns()
             self._peripheral_manager.startAdvertising_(adv_data)
             print("DEBUG: Called startAdvertising_, waiting for callback")
 
-            # Use timeout and check _is_advertising in the delegate.
+            # Use timeout and wait for the delegate to answer this request.
             timeout = 10
             start_time = time.time()
-            while not self._is_advertising and time.time() - start_time < timeout:
+            while self._start_result is None and time.time() - start_time < timeout:
                 self._run_event_loop(0.1)  # Short timeout, to keep the loop responsive.
 
-            if self._is_advertising:
+            if self._start_result:
+                self._advertised = (hwid, device_message)
+                (ADVERTISING_UPDATE_SECONDS if was_advertising else ADVERTISING_START_SECONDS).record_since(start)
                 print("DEBUG: Broadcasting started successfully!")
                 return True
-            else:
+            elif self._start_result is None:
                 self._peripheral_manager.stopAdvertising()
                 print("DEBUG: Broadcasting did not start after timeout.")
                 return False
+            else:
+                print("DEBUG: Broadcasting failed to start.")
+                return False
 
         except Exception as e:
             import traceback
@@ -216,6 +286,7 @@ class MacOSTransmitter():
         try:
             self._peripheral_manager.stopAdvertising()
             self._set_advertising_state(False)
+            self._advertised = None
             print("DEBUG: Broadcasting stopped.")
             return True
             
@@ -0,0 +1,267 @@
+"""
+Advertisement capture files
+Append-only binary log of received advertisements (timestamp, address, RSSI,
+raw advertising payload), read back through a memory map without copies.
+
+File layout (little-endian):
+    header   magic 'LSBC', version, reserved, capture start (unix time, float64)
+    records  type, rssi, address length, reserved, payload length (uint32),
+             timestamp in ns since the capture start (uint64), address, payload
+    trailer  magic 'LSBE', offset of the last index record (written by close)
+
+Every INDEX_INTERVAL reports an index record is appended describing the chunk
+of reports before it (start offset, first / last timestamp, count) and pointing
+to the previous index record, so seeking walks the index chain instead of the
+whole file. A capture without trailer (recorder killed) is still readable, the
+index is then rebuilt with one pass over the fixed record headers.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid as uuid_module
+from bisect import bisect_right
+
+MAGIC = b'LSBC'
+TRAILER_MAGIC = b'LSBE'
+VERSION = 1
+
+RECORD_REPORT = 0x01
+RECORD_INDEX = 0x02
+
+INDEX_INTERVAL = 256
+
+_FILE_HEADER = struct.Struct('<4sHxxd')
+_RECORD = struct.Struct('<BbBxIQ')
+_INDEX = struct.Struct('<qQQQI')  # previous index offset (-1: none), chunk offset, first ts, last ts, count
+_TRAILER = struct.Struct('<4sxxxxQ')
+
+
+class CaptureError(Exception):
+    pass
+
+
+def format_capture_address(address) -> str:
+    """
+    Recorded address to the identifier shown by the detector
+    :param address: 6 bytes little-endian BD_ADDR (Linux) or 16 bytes peripheral UUID (macOS)
+    """
+    if len(address) == 16:
+        return str(uuid_module.UUID(bytes=bytes(address))).upper()
+    return ':'.join(f'{b:02X}' for b in reversed(bytes(address)))
+
+
+class CaptureWriter():
+    """Append advertisements to a new capture file; write() may be called from the scanner thread"""
+
+    def __init__(self, path: str, clock=time.monotonic_ns):
+        """
+        :param path: capture file, replaced if it exists
+        :param clock: monotonic clock in ns, replaceable for tests
+        """
+        self.path = path
+        self.clock = clock
+        self._file = open(path, 'wb', buffering=1 << 16)
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._offset = _FILE_HEADER.size
+        self._start = clock()
+        self._lock = threading.Lock()
+        # Current chunk, described by the next index record
+        self._chunk_offset = self._offset
+        self._chunk_first = 0
+        self._chunk_last = 0
+        self._chunk_count = 0
+        self._last_index = -1
+        self.records = 0
+
+    def write(self, address, rssi: int, payload, timestamp_ns: int = None) -> None:
+        """
+        Append one advertisement
+        :param address: bytes-like, see format_capture_address
+        :param payload: bytes-like raw advertising data, memoryviews are written without copy
+        :param timestamp_ns: ns since the capture start, taken from the clock by default
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            if timestamp_ns is None:
+                timestamp_ns = self.clock() - self._start
+            f = self._file
+            f.write(_RECORD.pack(RECORD_REPORT, rssi, len(address), len(payload), timestamp_ns))
+            f.write(address)
+            f.write(payload)
+            if not self._chunk_count:
+                self._chunk_offset = self._offset
+                self._chunk_first = timestamp_ns
+            self._chunk_last = timestamp_ns
+            self._chunk_count += 1
+            self._offset += _RECORD.size + len(address) + len(payload)
+            self.records += 1
+            if self._chunk_count >= INDEX_INTERVAL:
+                self._write_index()
+
+    def _write_index(self) -> None:
+        self._file.write(_RECORD.pack(RECORD_INDEX, 0, 0, _INDEX.size, self._chunk_last))
+        self._file.write(_INDEX.pack(self._last_index, self._chunk_offset,
+                                     self._chunk_first, self._chunk_last, self._chunk_count))
+        self._last_index = self._offset
+        self._offset += _RECORD.size + _INDEX.size
+        self._chunk_count = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        """Index the last chunk and write the trailer"""
+        with self._lock:
+            if self._file is None:
+                return
+            if self._chunk_count:
+                self._write_index()
+            self._file.write(_TRAILER.pack(TRAILER_MAGIC, self._last_index))
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CaptureReader():
+    """Memory-mapped capture file, reports are yielded as memoryview slices of the map"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _FILE_HEADER.size:
+                raise CaptureError(f"{path}: not a capture file")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, self.start_time = _FILE_HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            self.close()
+            raise CaptureError(f"{path}: not a capture file")
+        if version != VERSION:
+            self.close()
+            raise CaptureError(f"{path}: unsupported capture version {version}")
+
+        # Data ends before the trailer, or at the last complete record of an unterminated capture
+        self._end = size
+        self._last_index = -1
+        self.complete = False
+        if size >= _FILE_HEADER.size + _TRAILER.size:
+            magic, last_index = _TRAILER.unpack_from(self._view, size - _TRAILER.size)
+            if magic == TRAILER_MAGIC:
+                self._end = size - _TRAILER.size
+                self._last_index = last_index
+                self.complete = True
+        self._chunks = None
+        self._chunk_ends = None
+
+    def _load_index(self) -> list:
+        """:return: list of (first ts, last ts, chunk offset, count), oldest first"""
+        if self._chunks is not None:
+            return self._chunks
+        view = self._view
+        chunks = []
+        if self.complete:
+            offset = self._last_index
+            while offset >= 0:
+                previous, chunk_offset, first, last, count = _INDEX.unpack_from(view, offset + _RECORD.size)
+                chunks.append((first, last, chunk_offset, count))
+                offset = previous
+            chunks.reverse()
+        else:
+            # No trailer: one pass over the record headers
+            first = last = None
+            count = 0
+            chunk_offset = offset = _FILE_HEADER.size
+            end = self._end
+            while offset + _RECORD.size <= end:
+                kind, _, address_length, length, timestamp = _RECORD.unpack_from(view, offset)
+                next_offset = offset + _RECORD.size + address_length + length
+                if next_offset > end:
+                    break
+                if kind == RECORD_REPORT:
+                    if not count:
+                        chunk_offset = offset
+                        first = timestamp
+                    last = timestamp
+                    count += 1
+                    if count >= INDEX_INTERVAL:
+                        chunks.append((first, last, chunk_offset, count))
+                        count = 0
+                offset = next_offset
+            if count:
+                chunks.append((first, last, chunk_offset, count))
+            self._end = offset
+        self._chunks = chunks
+        self._chunk_ends = [chunk[1] for chunk in chunks]
+        return chunks
+
+    def __len__(self) -> int:
+        return sum(chunk[3] for chunk in self._load_index())
+
+    @property
+    def duration(self) -> float:
+        """:return: seconds between the capture start and the last report"""
+        chunks = self._load_index()
+        return chunks[-1][1] / 1e9 if chunks else 0.0
+
+    def seek(self, seconds: float) -> int:
+        """:return: file offset of the chunk holding the first report at or after seconds"""
+        chunks = self._load_index()
+        position = bisect_right(self._chunk_ends, seconds * 1e9 - 1)
+        if position >= len(chunks):
+            return self._end
+        return chunks[position][2]
+
+    def __iter__(self):
+        return self.iter_reports()
+
+    def iter_reports(self, start: float = 0.0):
+        """
+        Iterate the reports from start seconds on
+        :return: generator of (timestamp in s since the capture start, address, rssi, payload);
+            address and payload are memoryview slices of the map
+        """
+        view = self._view
+        end = self._end
+        unpack_from = _RECORD.unpack_from
+        header_size = _RECORD.size
+        start_ns = start * 1e9
+        offset = self.seek(start) if start > 0 else _FILE_HEADER.size
+        while offset + header_size <= end:
+            kind, rssi, address_length, length, timestamp = unpack_from(view, offset)
+            address_offset = offset + header_size
+            payload_offset = address_offset + address_length
+            offset = payload_offset + length
+            if offset > end:
+                return
+            if kind != RECORD_REPORT or timestamp < start_ns:
+                continue
+            yield (timestamp / 1e9, view[address_offset:payload_offset], rssi, view[payload_offset:offset])
+
+    def close(self) -> None:
+        if self._map is None:
+            return
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # Reports still referenced by the caller, the map is closed when they are released
+            pass
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
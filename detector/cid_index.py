@@ -0,0 +1,131 @@
+"""
+Compiled company ID index
+cid.csv is compiled once into a binary snapshot (cid.idx) holding a 65,536-entry
+table indexed by the raw 16-bit company ID. The snapshot is memory-mapped on the
+first lookup and rebuilt only when cid.csv changes (size or mtime).
+
+Snapshot layout (little-endian):
+    header   magic 'CIDX', version, csv size, csv mtime_ns, names size
+    table    65,536 x uint32: (offset << 8) | length of the name in the names blob, 0 = unknown
+    names    UTF-8 company names
+"""
+
+import csv
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'CIDX'
+VERSION = 1
+TABLE_SIZE = 0x10000
+
+_HEADER = struct.Struct('<4sHxxQQI')
+_TABLE_BYTES = TABLE_SIZE * 4
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cid.csv')
+
+
+def _csv_stamp(csv_path: str) -> tuple:
+    stat = os.stat(csv_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def compile_snapshot(csv_path: str) -> bytes:
+    """Parse cid.csv and return the binary snapshot"""
+    table = [0] * TABLE_SIZE
+    names = bytearray(b'\x00')  # offset 0 is reserved for "unknown"
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 2:
+                continue
+            try:
+                cid = int(row[0].strip(), 16)
+            except ValueError:
+                continue
+            if not 0 <= cid < TABLE_SIZE:
+                continue
+            name = row[1].strip().strip('"').encode('utf-8')[:255]
+            table[cid] = (len(names) << 8) | len(name)
+            names += name
+
+    size, mtime_ns = _csv_stamp(csv_path)
+    return (_HEADER.pack(MAGIC, VERSION, size, mtime_ns, len(names))
+            + struct.pack(f'<{TABLE_SIZE}I', *table) + bytes(names))
+
+
+class CidIndex():
+    """Company ID -> company name, loaded lazily from the compiled snapshot"""
+
+    def __init__(self, csv_path: str = DEFAULT_CSV, snapshot_path: str = None):
+        self.csv_path = csv_path
+        self.snapshot_path = snapshot_path or os.path.splitext(csv_path)[0] + '.idx'
+        self._data = None       # mmap or bytes of the snapshot
+        self._table = None      # memoryview of uint32, or None on big-endian hosts
+        self._names = None      # decoded names cache, one slot per company ID
+
+    def _snapshot_is_current(self) -> bool:
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                header = f.read(_HEADER.size)
+        except OSError:
+            return False
+        if len(header) != _HEADER.size:
+            return False
+        magic, version, size, mtime_ns, _ = _HEADER.unpack(header)
+        return magic == MAGIC and version == VERSION and (size, mtime_ns) == _csv_stamp(self.csv_path)
+
+    def load(self) -> None:
+        """Map the snapshot, compiling it first when missing or outdated"""
+        if self._data is not None:
+            return
+        if not os.path.exists(self.csv_path):
+            data = _HEADER.pack(MAGIC, VERSION, 0, 0, 0) + bytes(_TABLE_BYTES)
+        elif self._snapshot_is_current():
+            with open(self.snapshot_path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = compile_snapshot(self.csv_path)
+            try:
+                tmp_path = self.snapshot_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.snapshot_path)
+            except OSError:
+                # Read-only install: keep the compiled snapshot in memory
+                pass
+
+        self._data = data
+        if sys.byteorder == 'little':
+            self._table = memoryview(data)[_HEADER.size:_HEADER.size + _TABLE_BYTES].cast('I')
+        self._names = [None] * TABLE_SIZE
+
+    def lookup(self, cid: int):
+        """
+        :param cid: int, company ID as read little-endian from the manufacturer data
+        :return: str company name, or None when unknown
+        """
+        names = self._names
+        if names is None:
+            self.load()
+            names = self._names
+        name = names[cid]
+        if name is None:
+            if self._table is not None:
+                entry = self._table[cid]
+            else:
+                entry = struct.unpack_from('<I', self._data, _HEADER.size + cid * 4)[0]
+            if not entry:
+                return None
+            start = _HEADER.size + _TABLE_BYTES + (entry >> 8)
+            name = names[cid] = bytes(self._data[start:start + (entry & 0xFF)]).decode('utf-8')
+        return name
+
+    def close(self) -> None:
+        if self._table is not None:
+            self._table.release()
+            self._table = None
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+        self._names = None
@@ -1,135 +1,315 @@
 import platform
 import sys
-
-if platform.system().lower() != 'darwin':
-    print("Error: This program is only available on macOS")
-    sys.exit(1)
-
-import objc;
-from Foundation import NSObject, NSRunLoop, NSDate
-import CoreBluetooth
+import argparse
 import curses
 import time
 import os
-import csv
-
-objc.loadBundle("CoreBluetooth", globals(), bundle_path="/System/Library/Frameworks/CoreBluetooth.framework")
-CBCentralManager = objc.lookUpClass("CBCentralManager")
-CBPeripheral = objc.lookUpClass("CBPeripheral")
-
-devices = {}
-
-class MyDelegate(NSObject):
-    def init(self):
-        self = objc.super(MyDelegate, self).init()
-        if self is None:
-            return None
-        self.centralManager = CBCentralManager.alloc().initWithDelegate_queue_options_(self, None, None)
-        return self
-
-    def centralManagerDidUpdateState_(self, central):
-        if central.state() == 5:
-            self.centralManager.scanForPeripheralsWithServices_options_(None, None)
-	
-    def centralManager_didDiscoverPeripheral_advertisementData_RSSI_(self, central, peripheral, advData, RSSI):
-        name = peripheral.name() or "Unknown"
-        uuid = peripheral.identifier().UUIDString()
-        manufacturer_data = advData.get("kCBAdvDataManufacturerData")
-
-        if manufacturer_data:
-            raw_bytes = manufacturer_data.bytes().tobytes()
-            hex_str = raw_bytes.hex().upper()
-            if len(raw_bytes) >= 2:
-                cid_le = raw_bytes[0] + (raw_bytes[1] << 8)  # Little-endian
-                cid_str = f"{cid_le:04X}"
-            else:
-                cid_str = "N/A"
+
+# Shared metrics of the broadcaster
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'broadcaster'))
+
+from core.metrics import registry, MetricsServer
+from core.beacon_core import DEFAULT_MEASURED_POWER
+from core.codec import load_schema
+from device_table import DeviceTable, NO_COMPANY_ID
+from cid_index import CidIndex
+from ingest import IngestQueue
+from renderer import TableRenderer, codec_message_format
+from capture import CaptureWriter
+from filters import ReportFilter, load_filter_config
+from proximity import ProximityEngine, DEFAULT_REFERENCE_POWER, METHODS
+
+# Devices not seen for DEVICE_TTL seconds are dropped, at most MAX_DEVICES are kept
+DEVICE_TTL = 60.0
+MAX_DEVICES = 5000
+DEFAULT_FPS = 10
+
+devices = DeviceTable(DEVICE_TTL, MAX_DEVICES)
+
+def create_scanner(on_report, recorder=None, replay=None, replay_speed=1.0, report_filter=None, dev_id=0):
+    """
+    Return the scanner implementation of the operating system
+    :param recorder: optional CaptureWriter receiving every accepted advertisement
+    :param replay: capture file to replay instead of scanning
+    :param report_filter: optional ReportFilter applied before reports are decoded
+    :param dev_id: Linux adapter index, 0 for hci0
+    """
+    if replay is not None:
+        from scanners.replay import ReplayScanner
+        return ReplayScanner(on_report, replay, replay_speed, report_filter=report_filter)
+
+    system = platform.system().lower()
+
+    if system == 'darwin':  # macOS
+        from scanners.macos import MacOSScanner
+        return MacOSScanner(on_report, recorder, report_filter)
+    elif system == 'linux':
+        from scanners.linux import LinuxScanner
+        return LinuxScanner(on_report, dev_id, recorder=recorder, report_filter=report_filter)
+    else:
+        print(f"Error: Unsupported operating system: {system}")
+        sys.exit(1)
+
+def record_device(uuid, name, rssi, manufacturer_data, hwid=None, message=None, measured_power=None, adapter=None):
+    """Store one advertisement, applied from the ingest queue (adapter: only with several sources)"""
+    if manufacturer_data:
+        hex_str = manufacturer_data.hex().upper()
+        if len(manufacturer_data) >= 2:
+            cid_le = manufacturer_data[0] + (manufacturer_data[1] << 8)  # Little-endian
+            company_name = cid_index.lookup(cid_le) or "Unknown"
         else:
-            hex_str = "N/A"
-            cid_str = "N/A"
-
-        company_name = cid_map.get(cid_str, "Unknown")
-        devices[uuid] = {
-            'name': name,
-            'uuid': uuid,
-            'rssi': RSSI,
-            'manufacturer': hex_str,
-            'company_id': cid_str,
-            'company_name': company_name
-        }
-
-def load_cid_map(filename='cid.csv'):
-    cid_map = {}
-    if not os.path.exists(filename):
-        return cid_map
-
-    with open(filename, newline='', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) >= 2:
-                cid_hex = row[0].strip().lower().replace('0x', '')
-                cid_hex = cid_hex.zfill(4).upper()
-                company = row[1].strip().strip('"')
-                cid_map[cid_hex] = company
-    return cid_map
-
-def curses_main(stdscr):
-    delegate = MyDelegate.alloc().init()
+            cid_le = NO_COMPANY_ID
+            company_name = "Unknown"
+    else:
+        hex_str = "N/A"
+        cid_le = NO_COMPANY_ID
+        company_name = "Unknown"
+
+    # LINE Simple Beacons carry their RSSI at 1 m, DEFAULT_MEASURED_POWER means not calibrated
+    if measured_power is None:
+        reference = None
+    elif measured_power == DEFAULT_MEASURED_POWER:
+        reference = DEFAULT_REFERENCE_POWER
+    else:
+        reference = measured_power
+
+    devices.update(uuid, name, rssi, hex_str, cid_le, company_name, hwid, message, reference, adapter)
+
+def curses_main(stdscr, fps=DEFAULT_FPS, record=None, replay=None, replay_speed=1.0, report_filter=None,
+                sources=None, dev_id=0, codec=None):
+    """
+    :param sources: several scan sources for WorkerScanner, replaces record / replay / dev_id
+    :param codec: optional MessageCodec, LINE device messages are shown decoded
+    """
+    if sources:
+        # One worker process per source, the scanner drains like an ingest queue
+        # (multiprocessing.shared_memory, Python 3.8+: only imported in this mode)
+        from scanners.workers import WorkerScanner
+        scanner = ingest = WorkerScanner(sources, report_filter)
+        recorder = None
+        filter_counts = scanner
+    else:
+        # Scanning runs on its own thread and fills the ingest queue
+        ingest = IngestQueue()
+        recorder = CaptureWriter(record) if record else None
+        scanner = create_scanner(ingest.on_report, recorder, replay, replay_speed, report_filter, dev_id)
+        filter_counts = report_filter
+    scanner.start()
     curses.curs_set(0)
     stdscr.nodelay(True)
 
     sort_modes = [
-        ('RSSI high → low', lambda d: sorted(d.values(), key=lambda x: x['rssi'], reverse=True)),
-        ('RSSI low → high', lambda d: sorted(d.values(), key=lambda x: x['rssi'])),
-        ('CID z → a', lambda d: sorted(d.values(), key=lambda x: x['company_id'], reverse=True)),
-        ('CID a → z', lambda d: sorted(d.values(), key=lambda x: x['company_id'])),
+        ('RSSI high → low', lambda d, n: d.top('rssi', n, descending=True)),
+        ('RSSI low → high', lambda d, n: d.top('rssi', n)),
+        ('CID z → a', lambda d, n: d.top('company_id', n, descending=True)),
+        ('CID a → z', lambda d, n: d.top('company_id', n)),
+        ('Smoothed RSSI high → low', lambda d, n: d.top('smoothed', n, descending=True)),
+        ('Smoothed RSSI low → high', lambda d, n: d.top('smoothed', n)),
     ]
     sort_idx = 0
+    frame_interval = 1.0 / fps
+    next_frame = time.monotonic()
+    header = None
+    dirty = True
+    renderer = TableRenderer(stdscr, format_message=codec_message_format(codec) if codec is not None else None)
+
+    # Read from the existing counters at snapshot time, nothing is added to the hot path
+    registry.counter('detector_reports_total', 'Advertising reports received from the scanner', fn=lambda: ingest.received)
+    registry.counter('detector_reports_dropped_total', 'Reports dropped because the ingest queue was full', fn=lambda: ingest.dropped)
+    registry.gauge('detector_reports_per_second', 'Reports received per second', fn=ingest.rate)
+    registry.gauge('detector_queue_depth', 'Reports waiting in the ingest queue', fn=lambda: len(ingest))
+    registry.gauge('detector_devices', 'Devices in the device table', fn=lambda: len(devices))
+    registry.counter('detector_devices_evicted_total', 'Devices dropped to stay under the table size cap', fn=lambda: devices.evicted)
+    registry.counter('detector_frames_total', 'Screen frames drawn', fn=lambda: renderer.frames)
+    if report_filter is not None:
+        registry.counter('detector_reports_accepted_total', 'Reports passing the filter rules', fn=lambda: filter_counts.accepted)
+        registry.counter('detector_reports_rejected_total', 'Reports rejected by the filter rules', fn=lambda: filter_counts.rejected)
 
-    while True:
-        stdscr.clear()
-        height, width = stdscr.getmaxyx()
-        sort_title, sort_func = sort_modes[sort_idx]
-        stdscr.addstr(0, 0, f"LITE-SIMPLE-BEACON Detector ({sort_title}) | o: Sort Order | Ctrl+C to exit")
-        stdscr.addstr(1, 0, "-" * (width - 1))
-
-        # Sort devices by current sort mode
-        sorted_devices = sort_func(devices)
-
-        for i, device in enumerate(sorted_devices, start=2):
-            if i >= height - 1:
-                break
-            name = device['name'][:20]
-            rssi = device['rssi']
-            uuid = device['uuid'][:8]
-            manuf = device['manufacturer'][:32]
-            line = (
-                f"{name:<20} RSSI: {rssi:<4} UUID: {uuid} "
-                f"CID: {device['company_id']} ({device['company_name']}) MANUF: {manuf}"
+    try:
+        while True:
+            # The scanner keeps running meanwhile, reports wait in the ingest queue
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_frame = max(next_frame + frame_interval, time.monotonic())
+
+            if ingest.drain(record_device):
+                dirty = True
+            # RSSI filtering, one batch per frame
+            if devices.smooth():
+                dirty = True
+
+            # Process key
+            try:
+                key = stdscr.getch()
+                if key == ord('o') or key == ord('O'):
+                    sort_idx = (sort_idx + 1) % len(sort_modes)
+                    dirty = True
+                elif key == curses.KEY_RESIZE:
+                    renderer.invalidate()
+                    dirty = True
+            except Exception:
+                pass
+
+            # Drop stale devices
+            if devices.expire():
+                dirty = True
+
+            sort_title, sort_func = sort_modes[sort_idx]
+            new_header = (
+                f"LITE-SIMPLE-BEACON Detector ({sort_title}) | o: Sort Order | Ctrl+C to exit"
+                f" | {ingest.rate():.0f} reports/s, {ingest.dropped} dropped, {len(devices)} devices"
             )
-            stdscr.addstr(i, 0, line[:width - 1])
+            if sources:
+                new_header += f" | {scanner.alive()}/{len(sources)} workers"
+            if report_filter is not None:
+                new_header += f" | filter: {filter_counts.accepted} accepted, {filter_counts.rejected} rejected"
+            if not dirty and new_header == header:
+                continue
+            header = new_header
+            dirty = False
 
-        stdscr.refresh()
-        NSRunLoop.currentRunLoop().runUntilDate_(NSDate.dateWithTimeIntervalSinceNow_(0.1))
-        time.sleep(0.9)
+            # Take the visible rows in current sort order, only changed cells are redrawn
+            height, _ = stdscr.getmaxyx()
+            renderer.render(header, sort_func(devices, max(height - 3, 0)))
+    finally:
+        scanner.stop()
+        if recorder is not None:
+            recorder.close()
 
-        # Process key
-        try:
-            key = stdscr.getch()
-            if key == ord('o') or key == ord('O'):
-                sort_idx = (sort_idx + 1) % len(sort_modes)
-        except Exception:
-            pass
+def main():
+    parser = argparse.ArgumentParser(description='LINE Simple Beacon detector')
+    parser.add_argument(
+        '--fps',
+        type=float,
+        default=DEFAULT_FPS,
+        help=f'Maximum screen refreshes per second (default: {DEFAULT_FPS})'
+    )
+    parser.add_argument(
+        '--record',
+        metavar='FILE',
+        help='Append every received advertisement to a capture file'
+    )
+    parser.add_argument(
+        '--replay',
+        metavar='FILE',
+        action='append',
+        default=[],
+        help='Replay a capture file instead of scanning, repeat for one worker process per capture'
+    )
+    parser.add_argument(
+        '--adapter',
+        type=int,
+        action='append',
+        default=[],
+        metavar='N',
+        help='Linux: scan with hciN (default: hci0), repeat for one worker process per adapter'
+    )
+    parser.add_argument(
+        '--replay-speed',
+        type=float,
+        default=1.0,
+        help='Replay rate, 1 is the recorded pace, 0 as fast as possible (default: 1)'
+    )
+    parser.add_argument(
+        '--cid',
+        action='append',
+        default=[],
+        metavar='CID',
+        help='Only show devices with manufacturer data of this company ID (hex, e.g. 004C), repeatable'
+    )
+    parser.add_argument(
+        '--uuid',
+        action='append',
+        default=[],
+        metavar='UUID',
+        help='Only show devices advertising this 16-bit service UUID (hex, e.g. FE6F for LINE Simple Beacons), repeatable'
+    )
+    parser.add_argument(
+        '--hwid',
+        action='append',
+        default=[],
+        help='Only show LINE Simple Beacons with this HWID (10 hexadecimal characters), repeatable'
+    )
+    parser.add_argument(
+        '--min-rssi',
+        type=int,
+        help='Ignore reports weaker than this RSSI (dBm)'
+    )
+    parser.add_argument(
+        '--filter',
+        metavar='FILE',
+        help='JSON file of filter rules (company_ids, service_uuids, hwids, min_rssi), added to the options above'
+    )
+    parser.add_argument(
+        '--smoothing',
+        choices=METHODS,
+        default='kalman',
+        help='RSSI smoothing filter for the AVG column and the distance estimate (default: kalman)'
+    )
+    parser.add_argument(
+        '--schema',
+        metavar='FILE',
+        help='JSON message schema of the broadcaster, show LINE device messages decoded'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Serve metrics over HTTP on 127.0.0.1 (/metrics Prometheus text, /metrics.json)'
+    )
+    args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error('--record and --replay are exclusive')
+    if args.adapter and args.replay:
+        parser.error('--adapter and --replay are exclusive')
+    if args.adapter and platform.system().lower() != 'linux':
+        parser.error('--adapter is only supported on Linux')
+    # Several sources: one scanning worker process each
+    sources = []
+    if len(args.replay) > 1:
+        sources = [('replay', path, args.replay_speed, False) for path in args.replay]
+    elif len(args.adapter) > 1:
+        sources = [('hci', dev_id) for dev_id in args.adapter]
+    if sources and args.record:
+        parser.error('--record needs a single adapter')
 
-cid_map = load_cid_map() 
+    try:
+        rules = load_filter_config(args.filter) if args.filter else {}
+        report_filter = ReportFilter(
+            args.cid + rules.get('company_ids', []),
+            args.uuid + rules.get('service_uuids', []),
+            args.hwid + rules.get('hwids', []),
+            args.min_rssi if args.min_rssi is not None else rules.get('min_rssi'),
+        )
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid filter: {e}")
+    if not report_filter.active:
+        report_filter = None
+
+    try:
+        codec = load_schema(args.schema) if args.schema else None
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"invalid schema: {e}")
+
+    if args.metrics_port is not None:
+        registry.enable()
+        MetricsServer(registry, args.metrics_port).start()
+
+    devices.proximity = ProximityEngine(args.smoothing)
 
-if __name__ == "__main__":
     try:
-        curses.wrapper(curses_main)
+        curses.wrapper(curses_main, args.fps, args.record, args.replay[0] if args.replay else None,
+                       args.replay_speed, report_filter, sources, args.adapter[0] if args.adapter else 0, codec)
     except KeyboardInterrupt:
-        curses.endwin() 
+        curses.endwin()
         print("\nStop Scanning.\n")
     except Exception as e:
         curses.endwin()
         print("\nStop Scanning.\n")
         raise
+
+# Compiled lazily on the first lookup
+cid_index = CidIndex()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Device table
+Devices seen by the scanner, with incrementally maintained sort indexes,
+time based expiry of stale devices and a hard cap on the table size.
+Raw RSSI samples go to a ProximityEngine, smooth() applies them once per frame.
+With several adapters the RSSI of a device is the best recent one among them.
+"""
+
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from proximity import ProximityEngine
+
+# company_id of devices without manufacturer data, sorts after every real company ID
+NO_COMPANY_ID = 0x10000
+
+class DeviceRecord():
+    """One device, updated in place on every advertisement"""
+
+    __slots__ = (
+        'uuid', 'name', 'rssi', 'manufacturer', 'company_id', 'company_name',
+        'hwid', 'message', 'last_seen', 'version',
+        'slot', 'reference', 'smoothed_rssi', 'distance', 'adapter', 'adapters',
+    )
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+        self.name = None
+        self.rssi = None
+        self.manufacturer = None
+        self.company_id = None
+        self.company_name = None
+        self.hwid = None
+        self.message = None
+        self.last_seen = 0.0
+        self.version = 0
+        self.slot = None            # ProximityEngine slot
+        self.reference = None       # RSSI at 1 m, dBm
+        self.smoothed_rssi = None   # float, rounded to 0.1 dB
+        self.distance = None        # float, metres
+        self.adapter = None         # adapter index of the best RSSI
+        self.adapters = None        # adapter index -> (last rssi, last seen)
+
+
+class DeviceTable():
+    """Devices by uuid, oldest first, plus sorted (key, uuid) lists per sort index"""
+
+    # index name -> record attribute used as sort key
+    INDEXES = {'rssi': 'rssi', 'company_id': 'company_id', 'smoothed': 'smoothed_rssi'}
+
+    # Seconds an adapter's RSSI stays a candidate for the best RSSI of a device
+    ADAPTER_WINDOW = 5.0
+
+    def __init__(self, ttl: float = 60.0, max_devices: int = 5000, clock=time.monotonic, proximity=None):
+        """
+        :param ttl: seconds after which a device that was not seen again is dropped
+        :param max_devices: hard cap, the least recently seen devices are dropped first
+        :param clock: monotonic clock, replaceable for tests
+        :param proximity: ProximityEngine smoothing the RSSI, a Kalman filter by default
+        """
+        self.ttl = ttl
+        self.max_devices = max_devices
+        self.clock = clock
+        self.proximity = proximity or ProximityEngine()
+        self._records = OrderedDict()  # uuid -> DeviceRecord, least recently seen first
+        self._slots = {}  # proximity slot -> DeviceRecord
+        self._indexes = {name: [] for name in self.INDEXES}
+        self.evicted = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, uuid) -> bool:
+        return uuid in self._records
+
+    def get(self, uuid: str):
+        return self._records.get(uuid)
+
+    def values(self):
+        return self._records.values()
+
+    def update(self, uuid: str, name: str, rssi: int, manufacturer: str, company_id: int,
+               company_name: str, hwid: str = None, message: str = None, reference: int = None,
+               adapter: int = None) -> DeviceRecord:
+        """
+        Insert or refresh a device, only the indexes whose key changed are touched
+        :param reference: RSSI at 1 m (dBm) for the distance estimate, None if unknown
+        :param adapter: index of the adapter that received the report, rssi is then
+            the best one among the adapters that saw the device within ADAPTER_WINDOW
+        """
+        records = self._records
+        proximity = self.proximity
+        now = self.clock()
+        record = records.get(uuid)
+        if adapter is not None:
+            adapters = record.adapters if record is not None and record.adapters is not None else {}
+            adapters[adapter] = (rssi, now)
+            if len(adapters) > 1:
+                limit = now - self.ADAPTER_WINDOW
+                rssi, adapter = max((seen_rssi, index) for index, (seen_rssi, seen) in adapters.items() if seen >= limit)
+        if record is None:
+            record = DeviceRecord(uuid)
+            record.rssi = rssi
+            record.company_id = company_id
+            record.smoothed_rssi = float(rssi)
+            record.slot = proximity.acquire()
+            self._slots[record.slot] = record
+            records[uuid] = record
+            for index_name, attribute in self.INDEXES.items():
+                insort(self._indexes[index_name], (getattr(record, attribute), uuid))
+            if len(records) > self.max_devices:
+                self._evict_oldest(len(records) - self.max_devices)
+        else:
+            records.move_to_end(uuid)
+            if rssi != record.rssi:
+                self._reindex('rssi', record.rssi, rssi, uuid)
+                record.rssi = rssi
+            if company_id != record.company_id:
+                self._reindex('company_id', record.company_id, company_id, uuid)
+                record.company_id = company_id
+        if adapter is not None:
+            record.adapters = adapters
+        proximity.push(record.slot, rssi)
+        if reference != record.reference:
+            record.reference = reference
+            proximity.set_reference(record.slot, reference)
+
+        if (name != record.name or manufacturer != record.manufacturer or hwid != record.hwid
+                or message != record.message or adapter != record.adapter or record.version == 0):
+            record.name = name
+            record.manufacturer = manufacturer
+            record.company_name = company_name
+            record.hwid = hwid
+            record.message = message
+            record.adapter = adapter
+            record.version += 1
+        record.last_seen = now
+        return record
+
+    def smooth(self) -> int:
+        """
+        Filter the RSSI samples received since the last call, once per frame
+        :return: int, number of devices whose smoothed RSSI or distance changed
+        """
+        proximity = self.proximity
+        slots = self._slots
+        changed = 0
+        for slot in proximity.update():
+            record = slots[slot]
+            smoothed = round(proximity.smoothed(slot), 1)
+            distance = proximity.distance(slot)
+            if distance is not None:
+                distance = round(distance, 1)
+            if smoothed != record.smoothed_rssi:
+                self._reindex('smoothed', record.smoothed_rssi, smoothed, record.uuid)
+                record.smoothed_rssi = smoothed
+            elif distance == record.distance:
+                continue
+            record.distance = distance
+            record.version += 1
+            changed += 1
+        return changed
+
+    def top(self, index_name: str, count: int, descending: bool = False) -> list:
+        """:return: list of the first count DeviceRecord in index order, O(count)"""
+        index = self._indexes[index_name]
+        keys = index[:-count - 1:-1] if descending else index[:count]
+        records = self._records
+        return [records[uuid] for _, uuid in keys]
+
+    def expire(self, now: float = None) -> int:
+        """Drop devices not seen for ttl seconds, O(number of dropped devices)"""
+        if now is None:
+            now = self.clock()
+        limit = now - self.ttl
+        dropped = 0
+        records = self._records
+        while records:
+            record = next(iter(records.values()))
+            if record.last_seen >= limit:
+                break
+            self._remove(record)
+            dropped += 1
+        self.expired += dropped
+        return dropped
+
+    def _evict_oldest(self, count: int) -> None:
+        records = self._records
+        for _ in range(count):
+            self._remove(next(iter(records.values())))
+        self.evicted += count
+
+    def _remove(self, record: DeviceRecord) -> None:
+        del self._records[record.uuid]
+        del self._slots[record.slot]
+        self.proximity.release(record.slot)
+        for index_name, attribute in self.INDEXES.items():
+            index = self._indexes[index_name]
+            del index[bisect_left(index, (getattr(record, attribute), record.uuid))]
+
+    def _reindex(self, index_name: str, old_key, new_key, uuid: str) -> None:
+        index = self._indexes[index_name]
+        del index[bisect_left(index, (old_key, uuid))]
+        insort(index, (new_key, uuid))
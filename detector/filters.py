@@ -0,0 +1,188 @@
+"""
+Pre-ingest report filter
+Rules given on the command line or in a JSON file are compiled once into integer
+sets and one byte pattern, and checked on the raw advertising payload on the scanner
+thread, before anything is decoded, copied into the ingest queue or formatted.
+Most reports are rejected by the RSSI compare or the pattern search alone.
+
+A report is accepted when all the configured rules match:
+- RSSI floor: rssi >= min_rssi
+- company IDs / service UUIDs: manufacturer data of one of the company IDs, or a
+  16-bit service UUID (service data or UUID list) among the service UUIDs
+- HWID allowlist: a LINE Simple Beacon with one of the HWIDs
+
+    {"company_ids": ["004C"], "service_uuids": ["FE6F"], "hwids": ["0123456789"], "min_rssi": -80}
+"""
+
+import json
+import os
+import re
+import sys
+
+# Shared LINE Simple Beacon constants of the broadcaster
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'broadcaster'))
+
+from core.beacon_core import FRAME_TYPE, HWID_LENGTH, HWID_BYTES, ADTYPE_SERVICE_DATA
+from core.beacon_decoder import (
+    ADTYPE_INCOMPLETE_16_BIT_SERVICE_UUID, ADTYPE_COMPLETE_16_BIT_SERVICE_UUID,
+    ADTYPE_MANUFACTURER_SPECIFIC_DATA, LINECORP_UUID16,
+)
+
+_UUID_LIST_TYPES = (ADTYPE_INCOMPLETE_16_BIT_SERVICE_UUID, ADTYPE_COMPLETE_16_BIT_SERVICE_UUID)
+
+
+def _parse_uint16(value, name: str) -> int:
+    """:param value: int or hex string, e.g. 004C, 0x004C, FE6F"""
+    try:
+        number = value if isinstance(value, int) else int(value, 16)
+    except ValueError:
+        raise ValueError(f"{name} must be a hexadecimal number: {value}")
+    if not 0 <= number <= 0xFFFF:
+        raise ValueError(f"{name} must be 16 bits: {value}")
+    return number
+
+
+def _parse_hwid(value: str) -> bytes:
+    if len(value) != HWID_LENGTH:
+        raise ValueError(f"HWID must be {HWID_LENGTH} hexadecimal characters: {value}")
+    try:
+        return bytes.fromhex(value)
+    except ValueError:
+        raise ValueError(f"HWID must be {HWID_LENGTH} hexadecimal characters: {value}")
+
+
+def load_filter_config(path: str) -> dict:
+    """:return: dict of ReportFilter keyword arguments read from a JSON file"""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    return {
+        'company_ids': config.get('company_ids', []),
+        'service_uuids': config.get('service_uuids', []),
+        'hwids': config.get('hwids', []),
+        'min_rssi': config.get('min_rssi'),
+    }
+
+
+class ReportFilter():
+    """Compiled filter rules, match_payload() / match_fields() count accepted and rejected reports"""
+
+    def __init__(self, company_ids=(), service_uuids=(), hwids=(), min_rssi: int = None):
+        """
+        :param company_ids: company IDs, int or hex string (e.g. 004C)
+        :param service_uuids: 16-bit service UUIDs, int or hex string (e.g. FE6F)
+        :param hwids: LINE Simple Beacon HWIDs, 10 hexadecimal characters each
+        :param min_rssi: reports weaker than this (dBm) are rejected
+        """
+        self.company_ids = frozenset(_parse_uint16(cid, 'Company ID') for cid in company_ids)
+        self.service_uuids = frozenset(_parse_uint16(uuid, 'Service UUID') for uuid in service_uuids)
+        self.hwids = frozenset(_parse_hwid(hwid) for hwid in hwids)
+        self.min_rssi = -128 if min_rssi is None else int(min_rssi)
+        # A matching payload contains one of these byte sequences, searched before walking the AD structures
+        needles = [bytes([ADTYPE_MANUFACTURER_SPECIFIC_DATA, cid & 0xFF, cid >> 8]) for cid in self.company_ids]
+        needles += [bytes([uuid & 0xFF, uuid >> 8]) for uuid in self.service_uuids]
+        line_prefix = bytes([ADTYPE_SERVICE_DATA, LINECORP_UUID16 & 0xFF, LINECORP_UUID16 >> 8, FRAME_TYPE])
+        if not needles and self.hwids:
+            needles = [line_prefix]
+        self._search = re.compile(b'|'.join(re.escape(needle) for needle in needles)).search if needles else None
+        # HWID right after the LINE Simple Beacon service data prefix, looked up before the exact check
+        self._line_search = re.compile(re.escape(line_prefix)).search if self.hwids else None
+        # Counters, updated on the scanner thread
+        self.accepted = 0
+        self.rejected = 0
+
+    @property
+    def active(self) -> bool:
+        return self._search is not None or self.min_rssi > -128
+
+    def match_payload(self, rssi: int, payload) -> bool:
+        """
+        :param payload: raw advertising data, bytes or memoryview (searched in place)
+        :return: bool, True when the report passes every rule
+        """
+        if rssi < self.min_rssi:
+            self.rejected += 1
+            return False
+        search = self._search
+        if search is not None:
+            if search(payload) is None:
+                self.rejected += 1
+                return False
+            if self._line_search is not None and not self._match_hwid(payload):
+                self.rejected += 1
+                return False
+            if not self._match_ad_structures(payload):
+                self.rejected += 1
+                return False
+        self.accepted += 1
+        return True
+
+    def _match_hwid(self, payload) -> bool:
+        """Any allowed HWID after a LINE Simple Beacon prefix, confirmed by _match_ad_structures"""
+        line_search = self._line_search
+        hwids = self.hwids
+        found = line_search(payload)
+        while found is not None:
+            end = found.end()
+            if bytes(payload[end:end + HWID_BYTES]) in hwids:
+                return True
+            found = line_search(payload, end)
+        return False
+
+    def _match_ad_structures(self, data) -> bool:
+        """Exact check of a candidate payload, the byte sequence found may sit in an unrelated value"""
+        company_ids = self.company_ids
+        service_uuids = self.service_uuids
+        hwids = self.hwids
+        matched = not (company_ids or service_uuids)
+        line_hwid = None
+        offset = 0
+        end = len(data)
+        while offset < end:
+            length = data[offset]
+            if length == 0 or offset + 1 + length > end:
+                break
+            ad_type = data[offset + 1]
+            value_end = offset + 1 + length
+            if length >= 3:
+                uuid16 = data[offset + 2] | (data[offset + 3] << 8)
+                if ad_type == ADTYPE_SERVICE_DATA:
+                    if uuid16 in service_uuids:
+                        matched = True
+                    if (uuid16 == LINECORP_UUID16 and length >= 4 + HWID_BYTES
+                            and data[offset + 4] == FRAME_TYPE):
+                        line_hwid = bytes(data[offset + 5:offset + 5 + HWID_BYTES])
+                elif ad_type == ADTYPE_MANUFACTURER_SPECIFIC_DATA:
+                    if uuid16 in company_ids:
+                        matched = True
+                elif ad_type in _UUID_LIST_TYPES and service_uuids:
+                    for i in range(offset + 2, value_end - 1, 2):
+                        if data[i] | (data[i + 1] << 8) in service_uuids:
+                            matched = True
+            offset = value_end
+        return matched and (not hwids or line_hwid in hwids)
+
+    def match_fields(self, rssi: int, manufacturer_data, service_data) -> bool:
+        """
+        Same rules on the decoded fields CoreBluetooth reports
+        :param manufacturer_data: bytes, company ID (LE) + data, or None
+        :param service_data: list of (16-bit uuid int, value bytes)
+        """
+        if rssi < self.min_rssi:
+            self.rejected += 1
+            return False
+        company_ids = self.company_ids
+        service_uuids = self.service_uuids
+        matched = not (company_ids or service_uuids)
+        line_hwid = None
+        if not matched and manufacturer_data and len(manufacturer_data) >= 2:
+            matched = (manufacturer_data[0] | (manufacturer_data[1] << 8)) in company_ids
+        for uuid16, value in service_data:
+            if uuid16 in service_uuids:
+                matched = True
+            if uuid16 == LINECORP_UUID16 and len(value) >= 1 + HWID_BYTES and value[0] == FRAME_TYPE:
+                line_hwid = bytes(value[1:1 + HWID_BYTES])
+        if not matched or (self.hwids and line_hwid not in self.hwids):
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
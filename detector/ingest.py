@@ -0,0 +1,64 @@
+"""
+Scan ingest queue
+The scanner delivers advertisements on its own thread; they are copied into a
+bounded queue and applied to the device table by the render loop. When the
+queue is full new reports are dropped and counted, the scanner never waits.
+"""
+
+import time
+from collections import deque
+
+class IngestQueue():
+    """Bounded single-producer / single-consumer queue of advertisement reports"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._items = deque()
+        # Counters
+        self.received = 0
+        self.dropped = 0
+        self.drained = 0
+        # Ingest rate, updated by rate()
+        self._rate = 0.0
+        self._rate_time = time.monotonic()
+        self._rate_received = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def on_report(self, uuid, name, rssi, manufacturer_data, line_beacon=None) -> None:
+        """Scanner callback, called on the scanner thread; memoryview arguments are copied"""
+        self.received += 1
+        if len(self._items) >= self.maxsize:
+            self.dropped += 1
+            return
+        self._items.append((
+            uuid, name, rssi,
+            bytes(manufacturer_data) if manufacturer_data is not None else None,
+            line_beacon.hwid_hex if line_beacon is not None else None,
+            line_beacon.device_message_hex if line_beacon is not None else None,
+            line_beacon.measured_power if line_beacon is not None else None,
+        ))
+
+    def drain(self, handler, limit: int = None) -> int:
+        """
+        Apply pending reports, handler(uuid, name, rssi, manufacturer_data, hwid, message, measured_power)
+        :return: int, number of reports applied
+        """
+        items = self._items
+        count = 0
+        while items and (limit is None or count < limit):
+            handler(*items.popleft())
+            count += 1
+        self.drained += count
+        return count
+
+    def rate(self) -> float:
+        """:return: reports/s received by the scanner, averaged over at least one second"""
+        now = time.monotonic()
+        elapsed = now - self._rate_time
+        if elapsed >= 1.0:
+            self._rate = (self.received - self._rate_received) / elapsed
+            self._rate_time = now
+            self._rate_received = self.received
+        return self._rate
@@ -0,0 +1,182 @@
+"""
+RSSI smoothing and proximity estimation
+Raw RSSI samples of every device go into one contiguous ring buffer (WINDOW samples
+per device slot). Pushing a sample is an array store; the filtering is deferred to
+update(), once per frame and only over the slots that received samples.
+
+update() is not vectorised: without NumPy it runs the filter step for each new
+sample in plain Python, so its cost is the same as filtering per report. What the
+deferral saves is the work in the report callbacks, and samples that fall out of
+the window before an update are never filtered.
+
+Smoothing is a one-dimensional Kalman filter (default) or an exponential moving
+average. The distance of a device with a reference power (measured RSSI at 1 m)
+follows the log-distance path loss model:
+
+    distance = 10 ** ((reference - rssi) / (10 * path_loss))
+"""
+
+import math
+from array import array
+
+# Reference power used for LINE Simple Beacons that advertise DEFAULT_MEASURED_POWER (not calibrated)
+DEFAULT_REFERENCE_POWER = -59
+# Path loss exponent, 2 in free space, 2.5 ~ 4 indoors
+DEFAULT_PATH_LOSS = 2.0
+
+METHODS = ('kalman', 'ema')
+
+
+class ProximityEngine():
+    """Per device slot: ring of raw samples, smoothed RSSI and estimated distance"""
+
+    WINDOW = 16
+
+    def __init__(self, method: str = 'kalman', alpha: float = 0.3, process_noise: float = 0.05,
+                 measurement_noise: float = 4.0, path_loss: float = DEFAULT_PATH_LOSS, window: int = WINDOW):
+        """
+        :param method: 'kalman' or 'ema'
+        :param alpha: EMA weight of a new sample
+        :param process_noise: Kalman process noise (dB^2 per sample), how fast the true RSSI may move
+        :param measurement_noise: Kalman measurement noise (dB^2), variance of one raw sample
+        :param path_loss: path loss exponent of the distance model
+        :param window: raw samples kept per device
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown smoothing method: {method}")
+        self.method = method
+        self.alpha = alpha
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.path_loss = path_loss
+        self.window = window
+        self.capacity = 0
+        # Contiguous per slot storage
+        self._samples = array('b')      # window raw samples per slot
+        self._written = array('Q')      # samples pushed since the slot was acquired
+        self._applied = array('Q')      # samples already filtered
+        self._value = array('d')        # smoothed RSSI
+        self._variance = array('d')     # Kalman estimate variance
+        self._reference = array('d')    # RSSI at 1 m, NaN without one
+        self._distance = array('d')     # metres, NaN without a reference
+        self._free = []
+        self._pending = set()
+        # Counters
+        self.samples_pushed = 0
+        self.samples_filtered = 0
+
+    def _grow(self) -> None:
+        grow = max(self.capacity, 64)
+        self._samples.extend(bytes(grow * self.window))
+        zeros = bytes(8 * grow)
+        for column in (self._written, self._applied, self._value, self._variance):
+            column.frombytes(zeros)
+        nan = array('d', [math.nan]) * grow
+        self._reference.extend(nan)
+        self._distance.extend(nan)
+        self._free.extend(range(self.capacity + grow - 1, self.capacity - 1, -1))
+        self.capacity += grow
+
+    def acquire(self) -> int:
+        """:return: int, a free slot"""
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self._written[slot] = 0
+        self._applied[slot] = 0
+        self._reference[slot] = math.nan
+        self._distance[slot] = math.nan
+        return slot
+
+    def release(self, slot: int) -> None:
+        self._pending.discard(slot)
+        self._free.append(slot)
+
+    def push(self, slot: int, rssi: int) -> None:
+        """Store one raw sample, filtered on the next update()"""
+        written = self._written[slot]
+        self._samples[slot * self.window + written % self.window] = rssi
+        self._written[slot] = written + 1
+        self._pending.add(slot)
+        self.samples_pushed += 1
+
+    def set_reference(self, slot: int, power) -> None:
+        """:param power: RSSI at 1 m in dBm, None when the device has no reference"""
+        reference = math.nan if power is None else float(power)
+        if reference != self._reference[slot]:
+            self._reference[slot] = reference
+            self._pending.add(slot)
+
+    def update(self) -> list:
+        """
+        Filter the samples pushed since the last update, one scalar filter step per sample
+        :return: list of the slots whose smoothed RSSI or distance was recomputed
+        """
+        slots = list(self._pending)
+        self._pending.clear()
+        samples = self._samples
+        written_column = self._written
+        applied_column = self._applied
+        values = self._value
+        variances = self._variance
+        references = self._reference
+        distances = self._distance
+        window = self.window
+        kalman = self.method == 'kalman'
+        alpha = self.alpha
+        q = self.process_noise
+        r = self.measurement_noise
+        exponent = 10.0 * self.path_loss
+        filtered = 0
+        for slot in slots:
+            written = written_column[slot]
+            applied = applied_column[slot]
+            if written > applied:
+                # Never filtered since acquire(): seed from a sample, not from the previous owner's state
+                first = applied == 0
+                # Samples older than the window were overwritten, start from the oldest kept one
+                if written - applied > window:
+                    applied = written - window
+                base = slot * window
+                if first:
+                    value = float(samples[base + applied % window])
+                    variance = r
+                    applied += 1
+                else:
+                    value = values[slot]
+                    variance = variances[slot]
+                for i in range(applied, written):
+                    z = samples[base + i % window]
+                    if kalman:
+                        variance += q
+                        gain = variance / (variance + r)
+                        value += gain * (z - value)
+                        variance *= 1.0 - gain
+                    else:
+                        value += alpha * (z - value)
+                filtered += written - applied
+                values[slot] = value
+                variances[slot] = variance
+                applied_column[slot] = written
+            reference = references[slot]
+            if reference == reference and written:
+                distances[slot] = 10.0 ** ((reference - values[slot]) / exponent)
+            else:
+                distances[slot] = math.nan
+        self.samples_filtered += filtered
+        return slots
+
+    def smoothed(self, slot: int):
+        """:return: float, smoothed RSSI, None before the first sample"""
+        return self._value[slot] if self._applied[slot] else None
+
+    def distance(self, slot: int):
+        """:return: float, estimated distance in metres, None without a reference power"""
+        distance = self._distance[slot]
+        return distance if distance == distance else None
+
+    def samples(self, slot: int) -> list:
+        """:return: list of the raw samples kept for the slot, oldest first"""
+        written = self._written[slot]
+        base = slot * self.window
+        return [self._samples[base + i % self.window] for i in range(max(0, written - self.window), written)]
@@ -0,0 +1,163 @@
+"""
+Differential table renderer
+Remember what is on screen and only rewrite the changed part of changed lines,
+batched with noutrefresh/doupdate. Formatted rows are cached per device and
+only reformatted when the device changed.
+Screen positions are display columns: full-width (CJK, emoji) characters take
+two cells, combining marks none.
+"""
+
+import curses
+import unicodedata
+from device_table import NO_COMPANY_ID
+
+
+def format_company_id(cid):
+    return f"{cid:04X}" if cid != NO_COMPANY_ID else "N/A"
+
+
+def codec_message_format(codec):
+    """
+    :param codec: MessageCodec of the beacons' device messages
+    :return: function hex message -> "name=value ..." text, the hex string when it does not decode
+    """
+    def format_message(message: str) -> str:
+        try:
+            record = codec.decode(bytes.fromhex(message))
+        except ValueError:
+            return message
+        return ' '.join(f"{name}={value:g}" if isinstance(value, float) else f"{name}={value}"
+                        for name, value in record.items())
+    return format_message
+
+
+def format_row(device, format_message=None) -> str:
+    name = device.name[:20]
+    rssi = device.rssi
+    uuid = device.uuid[:8]
+    manuf = device.manufacturer[:32]
+    adapter = f"@{device.adapter:<2} " if device.adapter is not None else ""
+    line = (
+        f"{name:<20} RSSI: {rssi:<4} {adapter}AVG: {device.smoothed_rssi:<6.1f} UUID: {uuid} "
+        f"CID: {format_company_id(device.company_id)} ({device.company_name}) MANUF: {manuf}"
+    )
+    if device.hwid:
+        message = format_message(device.message) if format_message is not None else device.message
+        line += f" LINE HWID: {device.hwid} MSG: {message}"
+        if device.distance is not None:
+            line += f" ~{device.distance:.1f} m"
+    return line
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _combined_prefix_length(a: str, b: str, i: int) -> int:
+    """:return: int, common prefix length i moved back so it does not split a character from its combining marks"""
+    while i and (i < len(a) and unicodedata.combining(a[i]) or i < len(b) and unicodedata.combining(b[i])):
+        i -= 1
+    return i
+
+
+def _char_columns(char: str) -> int:
+    if unicodedata.combining(char):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+def _columns(text: str) -> int:
+    """:return: int, number of screen cells text takes"""
+    if text.isascii():
+        return len(text)
+    return sum(_char_columns(char) for char in text)
+
+
+def _clip(text: str, limit: int) -> str:
+    """:return: str, the longest prefix of text that fits in limit screen cells"""
+    if text.isascii():
+        return text[:limit]
+    columns = 0
+    for i, char in enumerate(text):
+        columns += _char_columns(char)
+        if columns > limit:
+            return text[:i]
+    return text
+
+
+class TableRenderer():
+    """Draw a header and device rows, writing only what differs from the previous frame"""
+
+    def __init__(self, stdscr, doupdate=None, format_message=None):
+        """
+        :param stdscr: curses window (or a fake with the same methods)
+        :param doupdate: screen flush function, curses.doupdate by default
+        :param format_message: optional LINE device message formatter, e.g. codec_message_format(codec);
+            only called when a row is reformatted
+        """
+        self.stdscr = stdscr
+        self._doupdate = doupdate or curses.doupdate
+        self._format_message = format_message
+        self._lines = []
+        self._size = None
+        self._rows = {}  # uuid -> (version, rssi, formatted row) of the devices drawn last frame
+        # Counters
+        self.frames = 0
+        self.lines_written = 0
+        self.chars_written = 0
+
+    def invalidate(self) -> None:
+        """Forget the screen content, the next frame redraws everything"""
+        self._size = None
+
+    def render(self, header: str, devices) -> None:
+        stdscr = self.stdscr
+        height, width = stdscr.getmaxyx()
+        if (height, width) != self._size:
+            self._size = (height, width)
+            self._lines = []
+            stdscr.clear()
+        limit = width - 1
+
+        lines = [_clip(header, limit), "-" * limit]
+        cache = self._rows
+        rows = {}
+        format_message = self._format_message
+        for device in devices:
+            if len(lines) >= height - 1:
+                break
+            cached = cache.get(device.uuid)
+            if cached is None or cached[0] != device.version or cached[1] != device.rssi:
+                cached = (device.version, device.rssi, format_row(device, format_message))
+            rows[device.uuid] = cached
+            lines.append(_clip(cached[2], limit))
+        self._rows = rows
+
+        previous = self._lines
+        for y in range(max(len(lines), len(previous))):
+            text = lines[y] if y < len(lines) else ''
+            old = previous[y] if y < len(previous) else ''
+            if text == old:
+                continue
+            x = _common_prefix_length(text, old)
+            if text.isascii() and old.isascii():
+                column, columns, old_columns = x, len(text), len(old)
+            else:
+                x = _combined_prefix_length(text, old, x)
+                column, columns, old_columns = _columns(text[:x]), _columns(text), _columns(old)
+            if x < len(text):
+                stdscr.addstr(y, column, text[x:])
+                self.chars_written += len(text) - x
+            if old_columns > columns:
+                stdscr.move(y, columns)
+                stdscr.clrtoeol()
+            self.lines_written += 1
+        self._lines = lines
+
+        stdscr.noutrefresh()
+        self._doupdate()
+        self.frames += 1
@@ -0,0 +1,199 @@
+"""
+Detector Linux scanner
+Read HCI LE Meta events (Advertising Report / Extended Advertising Report)
+from a raw HCI socket and parse them without intermediate copies.
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+
+# Shared HCI transport of the broadcaster
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'broadcaster'))
+
+from core.hci import (
+    HCITransport, HCIError, HCI_EVENT_PKT, EVT_LE_META_EVENT, STATUS_COMMAND_DISALLOWED,
+    EVT_LE_ADVERTISING_REPORT, EVT_LE_EXTENDED_ADVERTISING_REPORT,
+    OGF_LE_CTL, OCF_LE_SET_SCAN_PARAMETERS, OCF_LE_SET_SCAN_ENABLE,
+)
+from core.beacon_decoder import decode_advertising_data
+
+# Scan interval/window in 0.625 ms units, window == interval: scan all the time
+SCAN_INTERVAL = 0x0010
+SCAN_WINDOW = 0x0010
+SCAN_TYPE_PASSIVE = 0x00
+
+# Legacy event types mapped onto extended event type bits, for one record format
+_LEGACY_EVENT_TYPES = {
+    0x00: 0x0013,  # ADV_IND: legacy, connectable, scannable
+    0x01: 0x0015,  # ADV_DIRECT_IND: legacy, connectable, directed
+    0x02: 0x0012,  # ADV_SCAN_IND: legacy, scannable
+    0x03: 0x0010,  # ADV_NONCONN_IND: legacy
+    0x04: 0x001B,  # SCAN_RSP to ADV_IND
+}
+
+_EXT_REPORT_HEADER = 24  # event type .. data length, before data
+
+
+def iter_advertising_reports(packet):
+    """
+    Parse one HCI event packet into advertising reports
+    :param packet: memoryview (or bytes) of [0x04][0x3e][plen][subevent][...]
+    :return: generator of (event_type, address_type, address, rssi, data); address and data are
+        memoryview slices of packet, only valid as long as the packet buffer is not reused
+    """
+    if len(packet) < 5 or packet[0] != HCI_EVENT_PKT or packet[1] != EVT_LE_META_EVENT:
+        return
+    end = min(len(packet), 3 + packet[2])
+    subevent = packet[3]
+
+    if subevent == EVT_LE_ADVERTISING_REPORT:
+        # [num][event type][address type][address 6][data len][data][rssi] per report
+        offset = 5
+        for _ in range(packet[4]):
+            if offset + 9 > end:
+                return
+            data_len = packet[offset + 8]
+            data_end = offset + 9 + data_len
+            if data_end >= end:
+                return
+            rssi = packet[data_end]
+            yield (
+                _LEGACY_EVENT_TYPES.get(packet[offset], 0x0010),
+                packet[offset + 1],
+                packet[offset + 2:offset + 8],
+                rssi - 256 if rssi > 127 else rssi,
+                packet[offset + 9:data_end],
+            )
+            offset = data_end + 1
+
+    elif subevent == EVT_LE_EXTENDED_ADVERTISING_REPORT:
+        # [num][event type 2][address type][address 6][phy 2][sid][tx power][rssi]
+        # [periodic interval 2][direct address type][direct address 6][data len][data] per report
+        offset = 5
+        for _ in range(packet[4]):
+            if offset + _EXT_REPORT_HEADER > end:
+                return
+            data_end = offset + _EXT_REPORT_HEADER + packet[offset + 23]
+            if data_end > end:
+                return
+            rssi = packet[offset + 13]
+            yield (
+                packet[offset] | (packet[offset + 1] << 8),
+                packet[offset + 2],
+                packet[offset + 3:offset + 9],
+                rssi - 256 if rssi > 127 else rssi,
+                packet[offset + _EXT_REPORT_HEADER:data_end],
+            )
+            offset = data_end
+
+
+def iter_reports(packets):
+    """Parse a stream of HCI event packets (e.g. a capture) into advertising reports"""
+    for packet in packets:
+        yield from iter_advertising_reports(memoryview(packet))
+
+
+def format_address(address) -> str:
+    """Little-endian 6 bytes address to AA:BB:CC:DD:EE:FF"""
+    return ':'.join(f'{b:02X}' for b in reversed(bytes(address)))
+
+
+def report_advertisement(on_report, address: str, rssi: int, data) -> None:
+    """Decode a raw advertising payload and pass it to a detector on_report callback"""
+    adv = decode_advertising_data(data)
+    on_report(
+        address,
+        bytes(adv.local_name).decode('utf-8', 'replace') if adv.local_name is not None else "Unknown",
+        rssi,
+        adv.manufacturer_data,
+        adv.line_beacon,
+    )
+
+
+class LinuxScanner():
+    """LE scanner on a raw HCI socket"""
+
+    def __init__(self, on_report, dev_id: int = 0, socket_factory=None, recorder=None, report_filter=None):
+        """
+        :param on_report: callable(uuid, name, rssi, manufacturer_data, line_beacon) called per advertisement,
+            memoryviews in the arguments are only valid during the call
+        :param dev_id: adapter index, 0 for hci0
+        :param socket_factory: optional callable(dev_id) returning a socket-like object
+        :param recorder: optional CaptureWriter, every accepted advertisement is appended to it
+        :param report_filter: optional ReportFilter, checked on the raw payload before decoding
+        """
+        self.on_report = on_report
+        self.recorder = recorder
+        self.report_filter = report_filter
+        self.transport = HCITransport(dev_id, socket_factory=socket_factory)
+        self._buffer = bytearray(260)
+        self._thread = None
+        self._running = False
+        self.reports = 0
+
+    def start(self, background: bool = True) -> None:
+        """
+        Enable scanning
+        :param background: deliver reports from a reader thread until stop(), otherwise call run()
+        """
+        self.transport.open()
+        try:
+            self._set_scan_enable(False)
+        except HCIError as e:
+            # "Command Disallowed" when scanning is already off
+            if e.status != STATUS_COMMAND_DISALLOWED:
+                raise
+        self.transport.send_command(
+            OGF_LE_CTL, OCF_LE_SET_SCAN_PARAMETERS,
+            struct.pack('<BHHBB', SCAN_TYPE_PASSIVE, SCAN_INTERVAL, SCAN_WINDOW, 0x00, 0x00))
+        self._set_scan_enable(True)
+        if background:
+            self._running = True
+            self._thread = threading.Thread(target=self._read_loop, name='hci-scanner', daemon=True)
+            self._thread.start()
+
+    def _read_loop(self) -> None:
+        while self._running:
+            self.run(0.2)
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.transport.is_open:
+            try:
+                self._set_scan_enable(False)
+            finally:
+                self.transport.close()
+
+    def _set_scan_enable(self, enable: bool) -> None:
+        # No duplicate filtering: every advertisement updates the RSSI
+        self.transport.send_command(OGF_LE_CTL, OCF_LE_SET_SCAN_ENABLE, bytes([1 if enable else 0, 0x00]))
+
+    def run(self, seconds: float) -> None:
+        """Read and deliver advertising reports for a while"""
+        transport = self.transport
+        buffer = self._buffer
+        view = memoryview(buffer)
+        on_report = self.on_report
+        recorder = self.recorder
+        match = self.report_filter.match_payload if self.report_filter is not None else None
+        deadline = time.monotonic() + seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            size = transport.recv_into(buffer, remaining)
+            if not size:
+                return
+            for _, _, address, rssi, data in iter_advertising_reports(view[:size]):
+                self.reports += 1
+                if match is not None and not match(rssi, data):
+                    continue
+                if recorder is not None:
+                    recorder.write(address, rssi, data)
+                report_advertisement(on_report, format_address(address), rssi, data)
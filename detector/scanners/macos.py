@@ -0,0 +1,125 @@
+"""
+Detector macOS scanner
+Use CoreBluetooth framework
+"""
+
+import objc
+from Foundation import NSObject
+import CoreBluetooth
+import dispatch
+import os
+import sys
+import uuid as uuid_module
+
+# Shared LINE Simple Beacon decoder of the broadcaster
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'broadcaster'))
+
+from core.beacon_decoder import (
+    decode_line_simple_beacon_service_data, UUID16LE_FOR_LINECORP,
+    ADTYPE_COMPLETE_LOCAL_NAME, ADTYPE_MANUFACTURER_SPECIFIC_DATA, ADTYPE_SERVICE_DATA,
+)
+
+objc.loadBundle("CoreBluetooth", globals(), bundle_path="/System/Library/Frameworks/CoreBluetooth.framework")
+CBCentralManager = objc.lookUpClass("CBCentralManager")
+CBPeripheral = objc.lookUpClass("CBPeripheral")
+
+def _ad_structure(ad_type: int, value: bytes) -> bytes:
+    value = value[:254]
+    return bytes([len(value) + 1, ad_type]) + value
+
+
+def build_capture_payload(name, manufacturer_data, service_data) -> bytes:
+    """
+    CoreBluetooth hands out decoded fields only, rebuild AD structures for the capture file
+    :param service_data: list of (16-bit uuid as 2 bytes little-endian, value)
+    """
+    payload = b''
+    if name:
+        payload += _ad_structure(ADTYPE_COMPLETE_LOCAL_NAME, name.encode('utf-8'))
+    for uuid16, value in service_data:
+        payload += _ad_structure(ADTYPE_SERVICE_DATA, uuid16 + value)
+    if manufacturer_data:
+        payload += _ad_structure(ADTYPE_MANUFACTURER_SPECIFIC_DATA, manufacturer_data)
+    return payload
+
+
+class MyDelegate(NSObject):
+    def initWithCallback_queue_recorder_filter_(self, on_report, queue, recorder, report_filter):
+        self = objc.super(MyDelegate, self).init()
+        if self is None:
+            return None
+        self.on_report = on_report
+        self.recorder = recorder
+        self.report_filter = report_filter
+        self.centralManager = CBCentralManager.alloc().initWithDelegate_queue_options_(self, queue, None)
+        return self
+
+    def centralManagerDidUpdateState_(self, central):
+        if central.state() == 5:
+            self.centralManager.scanForPeripheralsWithServices_options_(None, None)
+
+    def centralManager_didDiscoverPeripheral_advertisementData_RSSI_(self, central, peripheral, advData, RSSI):
+        manufacturer_data = advData.get("kCBAdvDataManufacturerData")
+        raw_bytes = manufacturer_data.bytes().tobytes() if manufacturer_data else None
+        service_data = advData.get("kCBAdvDataServiceData")
+
+        if self.report_filter is not None:
+            # Only 16-bit service UUIDs can match a filter rule
+            fields = []
+            for service_uuid, value in (service_data or {}).items():
+                uuid16 = service_uuid.UUIDString()
+                if len(uuid16) == 4:
+                    fields.append((int(uuid16, 16), value.bytes().tobytes()))
+            if not self.report_filter.match_fields(int(RSSI), raw_bytes, fields):
+                return
+
+        name = peripheral.name() or "Unknown"
+        uuid = peripheral.identifier().UUIDString()
+
+        # CoreBluetooth strips the UUID from the service data, put it back for the decoder
+        line_beacon = None
+        if service_data:
+            for service_uuid, value in service_data.items():
+                if service_uuid.UUIDString().upper() == "FE6F":
+                    line_beacon = decode_line_simple_beacon_service_data(UUID16LE_FOR_LINECORP + value.bytes().tobytes())
+                    break
+
+        if self.recorder is not None:
+            # Only 16-bit service UUIDs fit the AD structure written here
+            records = []
+            for service_uuid, value in (service_data or {}).items():
+                uuid16 = service_uuid.UUIDString()
+                if len(uuid16) == 4:
+                    records.append((bytes.fromhex(uuid16)[::-1], value.bytes().tobytes()))
+            self.recorder.write(
+                uuid_module.UUID(uuid).bytes, int(RSSI),
+                build_capture_payload(peripheral.name(), raw_bytes, records))
+
+        self.on_report(uuid, name, int(RSSI), raw_bytes, line_beacon)
+
+class MacOSScanner():
+    """
+    CoreBluetooth central manager scanning every peripheral
+    Callbacks run on a private dispatch queue, scanning does not depend on the caller pumping a run loop.
+    """
+
+    def __init__(self, on_report, recorder=None, report_filter=None):
+        """
+        :param on_report: callable(uuid, name, rssi, manufacturer_data, line_beacon) called per advertisement
+        :param recorder: optional CaptureWriter, every accepted advertisement is appended to it
+        :param report_filter: optional ReportFilter, checked before the fields are decoded
+        """
+        self.on_report = on_report
+        self.recorder = recorder
+        self.report_filter = report_filter
+        self._delegate = None
+
+    def start(self) -> None:
+        queue = dispatch.dispatch_queue_create(b"line-simple-beacon.detector.scan", None)
+        self._delegate = MyDelegate.alloc().initWithCallback_queue_recorder_filter_(
+            self.on_report, queue, self.recorder, self.report_filter)
+
+    def stop(self) -> None:
+        if self._delegate is not None:
+            self._delegate.centralManager.stopScan()
+            self._delegate = None
@@ -0,0 +1,75 @@
+"""
+Detector capture replay
+Feed a capture file through the same decoding and callback path as a live scanner,
+at the recorded pace or as fast as possible.
+"""
+
+import threading
+import time
+
+from capture import CaptureReader, format_capture_address
+from scanners.linux import report_advertisement
+
+
+class ReplayScanner():
+    """Scanner replaying a capture file on its own thread"""
+
+    def __init__(self, on_report, path: str, speed: float = 1.0, loop: bool = False, clock=time.monotonic, sleep=time.sleep,
+                 report_filter=None):
+        """
+        :param on_report: callable(uuid, name, rssi, manufacturer_data, line_beacon) called per advertisement
+        :param path: capture file written with --record
+        :param speed: playback rate, 1.0 is the recorded pace, 0 replays as fast as possible
+        :param loop: start over at the end of the capture until stop()
+        :param report_filter: optional ReportFilter, checked on the raw payload before decoding
+        """
+        self.on_report = on_report
+        self.report_filter = report_filter
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.clock = clock
+        self.sleep = sleep
+        self._thread = None
+        self._running = False
+        self.reports = 0
+        self.finished = False
+
+    def start(self, background: bool = True) -> None:
+        """
+        :param background: replay from a thread until the end or stop(), otherwise call run()
+        """
+        self._running = True
+        if background:
+            self._thread = threading.Thread(target=self.run, name='capture-replay', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self) -> None:
+        """Replay the capture, returns at the end (or on stop() when looping)"""
+        on_report = self.on_report
+        speed = self.speed
+        clock = self.clock
+        match = self.report_filter.match_payload if self.report_filter is not None else None
+        with CaptureReader(self.path) as reader:
+            while self._running:
+                origin = clock()
+                for timestamp, address, rssi, payload in reader:
+                    if not self._running:
+                        break
+                    if speed > 0:
+                        delay = origin + timestamp / speed - clock()
+                        if delay > 0:
+                            self.sleep(delay)
+                    self.reports += 1
+                    if match is not None and not match(rssi, payload):
+                        continue
+                    report_advertisement(on_report, format_capture_address(address), rssi, payload)
+                if not self.loop:
+                    break
+        self.finished = True
@@ -0,0 +1,175 @@
+"""
+Detector multi-process scanning
+One worker process per source (an HCI adapter, or a capture file to replay) runs
+the scanner, the report filter and the advertisement decoding, and publishes
+compact observation records into its own shared-memory ring. The UI process only
+drains the rings into the device table, so decoding uses as many cores as there
+are sources.
+"""
+
+import multiprocessing
+import time
+
+from shared_ring import ObservationRing, DEFAULT_CAPACITY
+
+# Seconds between two updates of the counters a worker publishes in its ring
+COUNTERS_INTERVAL = 0.1
+
+
+def _create_source_scanner(source: tuple, on_report, report_filter):
+    """
+    :param source: ('hci', dev_id) or ('replay', path, speed, loop)
+    """
+    kind = source[0]
+    if kind == 'hci':
+        from scanners.linux import LinuxScanner
+        return LinuxScanner(on_report, dev_id=source[1], report_filter=report_filter)
+    elif kind == 'replay':
+        from scanners.replay import ReplayScanner
+        _, path, speed, loop = source
+        return ReplayScanner(on_report, path, speed, loop, report_filter=report_filter)
+    raise ValueError(f"Unknown scan source: {kind}")
+
+
+def scan_worker(source: tuple, adapter: int, ring_name: str, ring_lock, report_filter, stop_event) -> None:
+    """Worker process entry point: scan source into the ring until stop_event is set"""
+    ring = ObservationRing(ring_name, create=False, lock=ring_lock)
+    publish = ring.publish
+
+    def on_report(uuid, name, rssi, manufacturer_data, line_beacon=None):
+        publish(uuid, name, rssi, manufacturer_data, line_beacon, adapter)
+
+    def publish_counters():
+        if report_filter is not None:
+            ring.publish_counters(report_filter.accepted, report_filter.rejected)
+        else:
+            ring.publish_counters(ring.received, 0)
+
+    try:
+        scanner = _create_source_scanner(source, on_report, report_filter)
+        scanner.start()
+        try:
+            while not stop_event.wait(COUNTERS_INTERVAL):
+                publish_counters()
+        finally:
+            scanner.stop()
+            publish_counters()
+    except KeyboardInterrupt:
+        # CTRL+C reaches the whole process group, the UI process stops the workers
+        pass
+    finally:
+        ring.close()
+
+
+class WorkerScanner():
+    """
+    Scanner over several sources in worker processes
+    Started and stopped like a scanner, drained like an IngestQueue; the handler
+    gets the index of the source (adapter) as an extra last argument.
+    """
+
+    def __init__(self, sources: list, report_filter=None, capacity: int = DEFAULT_CAPACITY, start_method: str = 'spawn'):
+        """
+        :param sources: list of ('hci', dev_id) or ('replay', path, speed, loop), the adapter index is
+            the dev_id for HCI sources and the position in the list otherwise
+        :param report_filter: optional ReportFilter, copied into every worker
+        :param capacity: observations per ring
+        :param start_method: multiprocessing start method, spawn does not copy the UI process state
+        """
+        self.sources = sources
+        self.report_filter = report_filter
+        self.capacity = capacity
+        self._context = multiprocessing.get_context(start_method)
+        self._rings = []
+        self._processes = []
+        self._stop_event = None
+        self._final_counters = []
+        self.drained = 0
+        # Ingest rate, updated by rate()
+        self._rate = 0.0
+        self._rate_time = time.monotonic()
+        self._rate_received = 0
+
+    def start(self) -> None:
+        self._stop_event = self._context.Event()
+        try:
+            for position, source in enumerate(self.sources):
+                adapter = source[1] if source[0] == 'hci' else position
+                ring = ObservationRing(capacity=self.capacity, lock=self._context.Lock())
+                self._rings.append(ring)
+                process = self._context.Process(
+                    target=scan_worker, name=f'scan-worker-{adapter}', daemon=True,
+                    args=(source, adapter, ring.name, ring.lock, self.report_filter, self._stop_event))
+                process.start()
+                self._processes.append(process)
+        except Exception:
+            self.stop()
+            raise
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+        # Keep the last published counters
+        self._final_counters = [ring.counters() for ring in self._rings]
+        for ring in self._rings:
+            ring.close()
+        self._rings = []
+
+    def alive(self) -> int:
+        """:return: int, number of worker processes still running"""
+        return sum(process.is_alive() for process in self._processes)
+
+    def counters(self) -> list:
+        """:return: list of (received, dropped, accepted, rejected) per worker, as last published"""
+        if self._rings:
+            return [ring.counters() for ring in self._rings]
+        return self._final_counters
+
+    @property
+    def received(self) -> int:
+        return sum(counters[0] for counters in self.counters())
+
+    @property
+    def dropped(self) -> int:
+        return sum(counters[1] for counters in self.counters())
+
+    @property
+    def accepted(self) -> int:
+        return sum(counters[2] for counters in self.counters())
+
+    @property
+    def rejected(self) -> int:
+        return sum(counters[3] for counters in self.counters())
+
+    def __len__(self) -> int:
+        return sum(len(ring) for ring in self._rings)
+
+    def drain(self, handler, limit: int = None) -> int:
+        """
+        Apply pending observations of every worker,
+        handler(uuid, name, rssi, manufacturer_data, hwid, message, measured_power, adapter)
+        :param limit: maximum observations per worker
+        :return: int, number of observations applied
+        """
+        count = 0
+        for ring in self._rings:
+            count += ring.drain(handler, limit)
+        self.drained += count
+        return count
+
+    def rate(self) -> float:
+        """:return: reports/s received by the workers, averaged over at least one second"""
+        now = time.monotonic()
+        elapsed = now - self._rate_time
+        if elapsed >= 1.0:
+            received = self.received
+            self._rate = (received - self._rate_received) / elapsed
+            self._rate_time = now
+            self._rate_received = received
+        return self._rate
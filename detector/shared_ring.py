@@ -0,0 +1,170 @@
+"""
+Shared-memory observation ring
+Single-producer / single-consumer ring of fixed-size observation records in a
+multiprocessing.shared_memory block: a scanner worker process publishes, the
+UI process drains. Nothing is pickled or sent through a pipe; publishing is one
+struct.pack_into and one index store under the ring lock.
+
+Block layout (little-endian):
+    header   write index, read index, received, dropped, accepted, rejected (uint64 each),
+             padded to 64 bytes
+    records  capacity x OBSERVATION_SIZE (128) bytes, each slot on a 64 byte boundary
+
+The indexes only grow, slot = index % capacity. The producer writes the record
+before advancing the write index, the consumer reads before advancing the read
+index; when the ring is full new observations are dropped and counted.
+
+Memory ordering: Python has no memory barriers, so the indexes are only read and
+written while holding a multiprocessing.Lock shared by both sides. Its acquire /
+release orders the record stores before the write index on weakly ordered CPUs
+(ARM gateways) as well; the consumer holds it only around the index accesses,
+not while handling the records.
+"""
+
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+DEFAULT_CAPACITY = 8192
+
+_HEADER = struct.Struct('<QQQQQQ')
+_INDEX = struct.Struct('<Q')
+_INDEXES = struct.Struct('<QQ')
+_COUNTERS = struct.Struct('<QQQQ')
+_WRITE_OFFSET = 0
+_READ_OFFSET = 8
+_COUNTERS_OFFSET = 16
+_RECORDS_OFFSET = 64
+
+# uuid, rssi, measured power, adapter, flags, name, manufacturer data, hwid, device message;
+# variable length fields are (length, padded bytes). 123 bytes padded to 128: every slot covers
+# exactly two 64 byte cache lines and shares none with its neighbours
+_OBSERVATION = struct.Struct('<B36sbbBBB32sB29s5sB13s5x')
+OBSERVATION_SIZE = _OBSERVATION.size
+
+FLAG_LINE_BEACON = 0x01
+FLAG_MANUFACTURER_DATA = 0x02
+
+MAX_NAME_BYTES = 32
+MAX_MANUFACTURER_BYTES = 29
+
+
+class ObservationRing():
+    """Ring of observation records in a named shared memory block"""
+
+    def __init__(self, name: str = None, capacity: int = DEFAULT_CAPACITY, create: bool = True, lock=None):
+        """
+        :param name: shared memory name, chosen by the system when creating without one
+        :param capacity: number of records, only used when creating
+        :param create: create the block (consumer side), otherwise attach to an existing one (worker side)
+        :param lock: multiprocessing Lock guarding the indexes, from the context of the worker processes;
+            created from the default context when creating without one, required when attaching
+        """
+        if lock is None:
+            if not create:
+                raise ValueError("Attaching to a ring needs the lock of the creating side")
+            lock = multiprocessing.Lock()
+        self.lock = lock
+        if create:
+            self._shm = shared_memory.SharedMemory(name, create=True, size=_RECORDS_OFFSET + capacity * OBSERVATION_SIZE)
+            _HEADER.pack_into(self._shm.buf, 0, 0, 0, 0, 0, 0, 0)
+        else:
+            self._shm = shared_memory.SharedMemory(name)
+        self.name = self._shm.name
+        self.capacity = (self._shm.size - _RECORDS_OFFSET) // OBSERVATION_SIZE
+        self._owner = create
+        self._buf = self._shm.buf
+        # Producer side counters, mirrored into the header by publish_counters()
+        self.received = 0
+        self.dropped = 0
+
+    def publish(self, uuid: str, name, rssi: int, manufacturer_data, line_beacon, adapter: int = 0) -> bool:
+        """
+        Scanner on_report callback plus adapter index, producer side
+        :return: bool, False when the ring is full and the observation was dropped
+        """
+        buf = self._buf
+        self.received += 1
+        uuid_bytes = uuid.encode('ascii', 'replace')[:36]
+        name_bytes = name.encode('utf-8')[:MAX_NAME_BYTES] if name else b''
+        flags = 0
+        if manufacturer_data is not None:
+            flags |= FLAG_MANUFACTURER_DATA
+            manufacturer = bytes(manufacturer_data[:MAX_MANUFACTURER_BYTES])
+        else:
+            manufacturer = b''
+        if line_beacon is not None:
+            flags |= FLAG_LINE_BEACON
+            hwid = bytes(line_beacon.hwid)
+            message = bytes(line_beacon.device_message)
+            measured_power = line_beacon.measured_power
+        else:
+            hwid = message = b''
+            measured_power = 0
+        with self.lock:
+            write_index, read_index = _INDEXES.unpack_from(buf, _WRITE_OFFSET)
+            if write_index - read_index >= self.capacity:
+                self.dropped += 1
+                return False
+            _OBSERVATION.pack_into(
+                buf, _RECORDS_OFFSET + (write_index % self.capacity) * OBSERVATION_SIZE,
+                len(uuid_bytes), uuid_bytes, rssi, measured_power, adapter, flags,
+                len(name_bytes), name_bytes, len(manufacturer), manufacturer, hwid, len(message), message)
+            _INDEX.pack_into(buf, _WRITE_OFFSET, write_index + 1)
+        return True
+
+    def publish_counters(self, accepted: int = 0, rejected: int = 0) -> None:
+        """Producer side: make received / dropped and the filter counters visible to the consumer"""
+        _COUNTERS.pack_into(self._buf, _COUNTERS_OFFSET, self.received, self.dropped, accepted, rejected)
+
+    def counters(self) -> tuple:
+        """:return: (received, dropped, accepted, rejected) last published by the producer"""
+        return _COUNTERS.unpack_from(self._buf, _COUNTERS_OFFSET)
+
+    def __len__(self) -> int:
+        with self.lock:
+            write_index, read_index = _INDEXES.unpack_from(self._buf, _WRITE_OFFSET)
+        return write_index - read_index
+
+    def drain(self, handler, limit: int = None) -> int:
+        """
+        Consumer side, handler(uuid, name, rssi, manufacturer_data, hwid, message, measured_power, adapter)
+        with the same value types as IngestQueue.drain plus the adapter index
+        :return: int, number of observations applied
+        """
+        buf = self._buf
+        with self.lock:
+            write_index, read_index = _INDEXES.unpack_from(buf, _WRITE_OFFSET)
+        end = write_index if limit is None else min(write_index, read_index + limit)
+        capacity = self.capacity
+        unpack_from = _OBSERVATION.unpack_from
+        for index in range(read_index, end):
+            (uuid_length, uuid, rssi, measured_power, adapter, flags, name_length, name,
+             manufacturer_length, manufacturer, hwid, message_length, message) = unpack_from(
+                buf, _RECORDS_OFFSET + (index % capacity) * OBSERVATION_SIZE)
+            if flags & FLAG_LINE_BEACON:
+                hwid = hwid.hex()
+                message = message[:message_length].hex()
+            else:
+                hwid = message = measured_power = None
+            handler(
+                uuid[:uuid_length].decode('ascii'),
+                name[:name_length].decode('utf-8', 'ignore') if name_length else "Unknown",
+                rssi,
+                manufacturer[:manufacturer_length] if flags & FLAG_MANUFACTURER_DATA else None,
+                hwid, message, measured_power, adapter,
+            )
+        # Records are copied out by unpack_from, the slots can be reused
+        with self.lock:
+            _INDEX.pack_into(buf, _READ_OFFSET, end)
+        return end - read_index
+
+    def close(self) -> None:
+        """Detach, the creating side also removes the block"""
+        if self._shm is None:
+            return
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
@@ -0,0 +1,11 @@
+"""
+Both tools import their modules relative to their own directory (core.*, platforms.*, scanners.*),
+the tests use the same search path as the benchmarks.
+"""
+
+import os
+import sys
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(BASE_DIR, 'broadcaster'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'detector'))
@@ -0,0 +1,50 @@
+import pytest
+
+from core.adapter_cache import AdapterCache
+from core.hci import HCIError
+from core.hci_sim import SimulatedController
+from platforms.linux import LinuxTransmitter
+
+
+def _transmitter(controller, cache):
+    return LinuxTransmitter(socket_factory=controller.socket_factory, capability_cache=cache)
+
+
+def test_probe_result_is_cached(tmp_path):
+    path = str(tmp_path / 'adapters.json')
+    controller = SimulatedController(extended=True, advertising_sets=4)
+    transmitter = _transmitter(controller, AdapterCache(path))
+    assert transmitter.initialize()
+    assert transmitter.ext_advertiser is not None
+    transmitter.cleanup()
+
+    cache = AdapterCache(path)
+    assert cache.get(0) is not None
+    transmitter = _transmitter(controller, cache)
+    transmitter._probe_capabilities = lambda: pytest.fail('probed despite a cache entry')
+    assert transmitter.initialize()
+    assert transmitter.ext_advertiser.max_sets == 4
+    transmitter.cleanup()
+
+
+def test_failed_probe_is_not_cached(tmp_path):
+    path = str(tmp_path / 'adapters.json')
+    controller = SimulatedController(extended=True)
+    cache = AdapterCache(path)
+    transmitter = _transmitter(controller, cache)
+
+    def timeout():
+        raise HCIError("Timeout waiting for the command completion")
+    transmitter.transport.read_le_features = timeout
+    assert transmitter.initialize()
+    # Legacy advertising for this run only
+    assert transmitter.ext_advertiser is None
+    assert cache.get(0) is None
+    assert AdapterCache(path).get(0) is None
+    transmitter.cleanup()
+
+    # The next start probes again and finds extended advertising
+    transmitter = _transmitter(controller, AdapterCache(path))
+    assert transmitter.initialize()
+    assert transmitter.ext_advertiser is not None
+    transmitter.cleanup()
@@ -0,0 +1,36 @@
+import pytest
+
+from core.advertiser import Advertiser
+from core.hci import HCIError, STATUS_COMMAND_DISALLOWED
+
+STATUS_HARDWARE_FAILURE = 0x03
+
+
+class RejectingTransport():
+    """Answers every advertise enable with the given status"""
+
+    def __init__(self, status):
+        self.status = status
+
+    def set_advertise_enable(self, enable: bool) -> None:
+        raise HCIError(f"Command failed, status {self.status}", self.status)
+
+
+def test_disable_tolerates_command_disallowed():
+    advertiser = Advertiser(RejectingTransport(STATUS_COMMAND_DISALLOWED))
+    assert advertiser.update(enabled=False) == 1
+    assert advertiser.enabled is False
+
+
+@pytest.mark.parametrize('status', [STATUS_HARDWARE_FAILURE, None])
+def test_disable_raises_other_errors(status):
+    advertiser = Advertiser(RejectingTransport(status))
+    with pytest.raises(HCIError):
+        advertiser.update(enabled=False)
+    assert advertiser.enabled is None
+
+
+def test_enable_raises_command_disallowed():
+    advertiser = Advertiser(RejectingTransport(STATUS_COMMAND_DISALLOWED))
+    with pytest.raises(HCIError):
+        advertiser.update(enabled=True)
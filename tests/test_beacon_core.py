@@ -0,0 +1,30 @@
+import pytest
+
+from core.beacon_core import BeaconCore
+
+
+def test_batch_matches_single_frames():
+    frames = [('0123456789', '01'), (bytes.fromhex('0123456788'), b'\xca\xfe'), ('0123456787', '')]
+    batch = BeaconCore.build_advertising_data_batch(frames)
+    for (hwid, message), data in zip(frames, batch):
+        service_data = BeaconCore.build_line_simple_beacon_service_data(hwid, message)
+        assert bytes(data[9:9 + len(service_data)]) == service_data
+
+
+@pytest.mark.parametrize('hwid, message', [
+    ('0123456789', '01  '),
+    ('0123456789', 'zz'),
+    ('01234567 9', '01'),
+    ('0123456789', '0 1 '),
+])
+def test_invalid_hex_is_rejected_with_the_same_message(hwid, message):
+    with pytest.raises(ValueError, match='must be a hexadecimal string') as batch_error:
+        BeaconCore.build_advertising_data_batch([('0123456788', '02'), (hwid, message)])
+    with pytest.raises(ValueError) as single_error:
+        BeaconCore.build_line_simple_beacon_service_data(hwid, message)
+    assert str(batch_error.value) == str(single_error.value)
+
+
+def test_invalid_hex_mixed_with_bytes():
+    with pytest.raises(ValueError, match='Device message must be a hexadecimal string'):
+        BeaconCore.build_advertising_data_batch([('0123456789', b'\x01'), ('0123456789', '01  ')])
@@ -0,0 +1,77 @@
+import pytest
+
+from core.codec import Field, MessageCodec
+from core.daemon import ControlServer
+
+
+def _codec():
+    return MessageCodec([
+        Field('seq', 4, kind='sequence'),
+        Field('flow', 12, signed=True, scale=0.01, kind='delta'),
+        Field('humidity', 8),
+    ])
+
+
+def test_failed_encode_keeps_the_state():
+    codec = _codec()
+    codec.encode({'flow': 1.0, 'humidity': 40})
+    # humidity is packed after flow and out of range
+    with pytest.raises(ValueError):
+        codec.encode({'flow': 5.0, 'humidity': 400})
+    record = codec.decode(codec.encode({'flow': 1.5, 'humidity': 40}))
+    assert record['seq'] == 1
+    assert record['flow'] == pytest.approx(0.5)
+
+
+def test_failed_batch_keeps_the_state():
+    codec = _codec()
+    codec.encode({'flow': 1.0, 'humidity': 40})
+    with pytest.raises(ValueError):
+        codec.encode_batch([{'flow': 2.0, 'humidity': 40}, {'flow': 3.0, 'humidity': 400}])
+    messages = codec.encode_batch([{'flow': 2.0, 'humidity': 40}, {'flow': 3.0, 'humidity': 40}])
+    records = codec.decode_batch(b''.join(messages))
+    assert [record['seq'] for record in records] == [1, 2]
+    assert [record['flow'] for record in records] == pytest.approx([1.0, 1.0])
+
+
+def test_prepare_commits_only_on_request():
+    codec = _codec()
+    codec.encode({'flow': 1.0, 'humidity': 40})
+    message, state = codec.prepare({'flow': 2.0, 'humidity': 40})
+    assert message == codec.prepare({'flow': 2.0, 'humidity': 40})[0]
+    codec.commit(state)
+    assert codec.decode(codec.encode({'flow': 2.0, 'humidity': 40})) == {'seq': 2, 'flow': 0, 'humidity': 40}
+
+
+def test_unsigned_delta_is_rejected():
+    with pytest.raises(ValueError):
+        Field('flow', 12, kind='delta')
+
+
+class FailingTransmitter():
+    def __init__(self):
+        self.fail = True
+        self.messages = []
+
+    def start_advertising(self, hwid, device_message):
+        if self.fail:
+            return False
+        self.messages.append(device_message)
+        return True
+
+    def stop_advertising(self):
+        pass
+
+
+def test_daemon_record_not_advertised_keeps_the_state():
+    codec = _codec()
+    transmitter = FailingTransmitter()
+    server = ControlServer(transmitter, '0123456789', '', codec=codec, advertising=False)
+    assert server.handle_line(b'REC flow=1.0 humidity=40').startswith('ERR ')
+    transmitter.fail = False
+    assert server.handle_line(b'REC flow=1.0 humidity=40').startswith('OK ')
+    assert server.handle_line(b'REC flow=1.25 humidity=40').startswith('OK ')
+    first, second = (codec.decode(message) for message in transmitter.messages)
+    assert (first['seq'], first['flow']) == (0, 0)
+    assert second['seq'] == 1
+    assert second['flow'] == pytest.approx(0.25)
@@ -0,0 +1,96 @@
+import socket
+
+from core.daemon import ControlServer, MAX_PENDING_REPLY_BYTES
+
+
+class FakeTransmitter():
+    def __init__(self):
+        self.calls = []
+
+    def start_advertising(self, hwid, device_message):
+        self.calls.append(('start', hwid, device_message))
+        return True
+
+    def stop_advertising(self):
+        self.calls.append(('stop',))
+
+
+def test_status_reports_advertising_started_before_the_server():
+    server = ControlServer(FakeTransmitter(), '0123456789', '0102', advertising=True)
+    assert ' advertising=1 ' in server.status_line()
+
+
+def test_status_follows_stop_and_start():
+    server = ControlServer(FakeTransmitter(), '0123456789', '0102', advertising=False)
+    assert ' advertising=0 ' in server.status_line()
+    assert server.handle_line(b'START').startswith('OK ')
+    assert ' advertising=1 ' in server.status_line()
+    assert server.handle_line(b'STOP').startswith('OK ')
+    assert ' advertising=0 ' in server.status_line()
+
+
+def _connect(path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(path)
+    return client
+
+
+def test_client_not_reading_its_replies_does_not_block_others(tmp_path):
+    server = ControlServer(FakeTransmitter(), '0123456789', '0102', path=str(tmp_path / 'control.sock'))
+    server.start()
+    try:
+        stalled = _connect(server.path)
+        stalled.setblocking(False)
+        server.poll(0)
+        assert len(server._clients) == 1
+        # Pipelined commands whose replies are never read, until the server gives up on the client
+        commands = b'STATUS\n' * 2000
+        for _ in range(1000):
+            try:
+                stalled.send(commands)
+            except (BlockingIOError, BrokenPipeError, ConnectionResetError):
+                pass
+            server.poll(0)
+            if not server._clients:
+                break
+        assert not server._clients
+
+        other = _connect(server.path)
+        other.sendall(b'MSG 0a0b\nSTATUS\n')
+        replies = b''
+        while replies.count(b'\n') < 2:
+            server.poll(0.1)
+            other.settimeout(0.1)
+            try:
+                replies += other.recv(4096)
+            except socket.timeout:
+                pass
+        assert replies.startswith(b'OK ')
+        assert b'message=0a0b' in replies
+        other.close()
+        stalled.close()
+    finally:
+        server.close()
+
+
+def test_pending_replies_are_flushed_when_writable(tmp_path):
+    server = ControlServer(FakeTransmitter(), '0123456789', '0102', path=str(tmp_path / 'control.sock'))
+    server.start()
+    try:
+        client = _connect(server.path)
+        # More replies than the socket buffers take at once, well under the limit
+        count = 2000
+        client.sendall(b'STATUS\n' * count)
+        client.settimeout(0.05)
+        received = b''
+        while received.count(b'\n') < count:
+            server.poll(0.05)
+            try:
+                received += client.recv(65536)
+            except socket.timeout:
+                pass
+        assert len(received) < MAX_PENDING_REPLY_BYTES
+        assert all(line.startswith(b'STATUS ') for line in received.splitlines())
+        client.close()
+    finally:
+        server.close()
@@ -0,0 +1,172 @@
+import pytest
+
+from core.hci import (
+    HCIError, HCITransport, OGF_LE_CTL,
+    OCF_LE_READ_LOCAL_SUPPORTED_FEATURES, OCF_LE_READ_NUMBER_OF_SUPPORTED_ADVERTISING_SETS,
+    OCF_LE_SET_ADVERTISING_PARAMETERS, OCF_LE_SET_ADVERTISING_DATA, OCF_LE_SET_ADVERTISE_ENABLE,
+    OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS, OCF_LE_SET_EXTENDED_ADVERTISING_PARAMETERS,
+    OCF_LE_SET_EXTENDED_ADVERTISING_DATA, OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE,
+    OCF_LE_CLEAR_ADVERTISING_SETS,
+    build_advertising_parameters, build_advertising_data, build_extended_advertising_parameters,
+    build_extended_advertising_enable,
+)
+from core.ext_advertiser import ExtendedAdvertiser
+from core.hci_sim import SimulatedController, STATUS_COMMAND_DISALLOWED
+from platforms.linux import LinuxTransmitter
+
+PARAMETERS = OCF_LE_SET_EXTENDED_ADVERTISING_PARAMETERS
+ADDRESS = OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS
+DATA = OCF_LE_SET_EXTENDED_ADVERTISING_DATA
+ENABLE = OCF_LE_SET_EXTENDED_ADVERTISING_ENABLE
+
+BEACONS = [('0123456789', '01'), ('0123456788', '02')]
+
+
+@pytest.fixture
+def controller():
+    controller = SimulatedController(extended=True, advertising_sets=4)
+    yield controller
+    controller.close()
+
+
+def ocf_sequence(controller) -> list:
+    """:return: OCFs received since the last call"""
+    sequence = [op & 0x3FF for op in controller.command_log]
+    controller.command_log.clear()
+    return sequence
+
+
+def initialized_transmitter(controller):
+    transmitter = LinuxTransmitter(socket_factory=controller.socket_factory)
+    assert transmitter.initialize()
+    return transmitter
+
+
+def test_initialize_probes_and_clears(controller):
+    transmitter = initialized_transmitter(controller)
+    assert ocf_sequence(controller) == [
+        OCF_LE_READ_LOCAL_SUPPORTED_FEATURES, OCF_LE_READ_NUMBER_OF_SUPPORTED_ADVERTISING_SETS,
+        ENABLE, OCF_LE_CLEAR_ADVERTISING_SETS,
+    ]
+    transmitter.cleanup()
+
+
+def test_set_creation(controller):
+    transmitter = initialized_transmitter(controller)
+    ocf_sequence(controller)
+    assert transmitter.start_advertising_sets(BEACONS)
+    # Set 0 keeps the public address, set 1 gets a random static one; one enable for both
+    assert ocf_sequence(controller) == [PARAMETERS, DATA, PARAMETERS, ADDRESS, DATA, ENABLE]
+    assert sorted(controller.sets) == [0, 1]
+    assert all(state['enabled'] for state in controller.sets.values())
+    transmitter.cleanup()
+
+
+def test_data_update_sends_only_the_changed_set(controller):
+    transmitter = initialized_transmitter(controller)
+    assert transmitter.start_advertising_sets(BEACONS)
+    ocf_sequence(controller)
+    assert transmitter.start_advertising_sets([BEACONS[0], ('0123456788', '03')])
+    assert ocf_sequence(controller) == [DATA]
+    assert transmitter.start_advertising_sets([BEACONS[0], ('0123456788', '03')])
+    assert ocf_sequence(controller) == []
+    transmitter.cleanup()
+
+
+def test_restart_after_stop(controller):
+    transmitter = initialized_transmitter(controller)
+    assert transmitter.start_advertising_sets(BEACONS)
+    transmitter.stop_advertising()
+    ocf_sequence(controller)
+    assert not any(state['enabled'] for state in controller.sets.values())
+    # Parameters and data are kept, only the enable is sent again
+    assert transmitter.start_advertising_sets(BEACONS)
+    assert ocf_sequence(controller) == [ENABLE]
+    transmitter.cleanup()
+
+
+def test_restart_of_the_process(controller):
+    transmitter = initialized_transmitter(controller)
+    assert transmitter.start_advertising_sets(BEACONS)
+    transmitter.cleanup()
+    controller.command_log.clear()
+
+    # A new transmitter does not know the controller state: clear, then create the sets again
+    transmitter = initialized_transmitter(controller)
+    assert transmitter.start_advertising_sets(BEACONS)
+    assert ocf_sequence(controller) == [
+        OCF_LE_READ_LOCAL_SUPPORTED_FEATURES, OCF_LE_READ_NUMBER_OF_SUPPORTED_ADVERTISING_SETS,
+        ENABLE, OCF_LE_CLEAR_ADVERTISING_SETS,
+        PARAMETERS, DATA, PARAMETERS, ADDRESS, DATA, ENABLE,
+    ]
+    transmitter.cleanup()
+
+
+# The simulator rejects commands sent out of order
+
+@pytest.fixture
+def transport(controller):
+    transport = HCITransport(socket_factory=controller.socket_factory)
+    transport.open()
+    yield transport
+    transport.close()
+
+
+def _status(transport, ocf, params=b''):
+    try:
+        transport.send_command(OGF_LE_CTL, ocf, params)
+    except HCIError as e:
+        return e.status
+    return 0
+
+
+def test_extended_data_before_parameters_is_rejected(transport):
+    data = bytes([0, 0x03, 0x01, 3]) + b'\x02\x01\x06'
+    assert _status(transport, DATA, data) != 0
+
+
+def test_extended_enable_before_data_is_rejected(transport):
+    assert _status(transport, PARAMETERS, build_extended_advertising_parameters(0)) == 0
+    assert _status(transport, ENABLE, build_extended_advertising_enable(True, [0])) == STATUS_COMMAND_DISALLOWED
+
+
+def test_legacy_data_before_parameters_is_rejected(transport):
+    data = build_advertising_data(bytes(31))
+    assert _status(transport, OCF_LE_SET_ADVERTISING_DATA, data) == STATUS_COMMAND_DISALLOWED
+    assert _status(transport, OCF_LE_SET_ADVERTISING_PARAMETERS, build_advertising_parameters()) == 0
+    assert _status(transport, OCF_LE_SET_ADVERTISING_DATA, data) == 0
+
+
+def test_legacy_enable_before_data_is_rejected(transport):
+    assert _status(transport, OCF_LE_SET_ADVERTISING_PARAMETERS, build_advertising_parameters()) == 0
+    assert _status(transport, OCF_LE_SET_ADVERTISE_ENABLE, b'\x01') == STATUS_COMMAND_DISALLOWED
+    # Disabling is always fine
+    assert _status(transport, OCF_LE_SET_ADVERTISE_ENABLE, b'\x00') == 0
+
+
+class FirstCommandFails():
+    """Transport whose first command fails with the given status, the others succeed"""
+
+    def __init__(self, status):
+        self.status = status
+        self.sent = []
+
+    def send_command(self, ogf, ocf, params=b''):
+        self.sent.append(ocf)
+        if len(self.sent) == 1:
+            raise HCIError(f"Command failed, status {self.status}", self.status)
+        return b''
+
+
+def test_clear_tolerates_command_disallowed():
+    transport = FirstCommandFails(STATUS_COMMAND_DISALLOWED)
+    ExtendedAdvertiser(transport).clear()
+    assert transport.sent == [ENABLE, OCF_LE_CLEAR_ADVERTISING_SETS]
+
+
+@pytest.mark.parametrize('status', [0x42, 0x12, None])
+def test_clear_raises_other_errors(status):
+    transport = FirstCommandFails(status)
+    with pytest.raises(HCIError):
+        ExtendedAdvertiser(transport).clear()
+    assert transport.sent == [ENABLE]
@@ -0,0 +1,99 @@
+import socket
+
+import pytest
+
+from core.hci import HCIError, HCITransport, OGF_LE_CTL, OCF_LE_SET_ADVERTISE_ENABLE, OCF_LE_SET_SCAN_ENABLE, opcode
+
+# Little-endian opcodes as they appear in the events
+ADVERTISE_ENABLE = opcode(OGF_LE_CTL, OCF_LE_SET_ADVERTISE_ENABLE).to_bytes(2, 'little')
+SCAN_ENABLE = opcode(OGF_LE_CTL, OCF_LE_SET_SCAN_ENABLE).to_bytes(2, 'little')
+
+
+class CannedSocket():
+    """Socket-like object answering every command with the queued packets"""
+
+    def __init__(self, packets):
+        self.packets = list(packets)
+        self.sent = []
+
+    def send(self, data) -> int:
+        self.sent.append(bytes(data))
+        return len(data)
+
+    def recv(self, size: int) -> bytes:
+        if not self.packets:
+            raise socket.timeout()
+        return self.packets.pop(0)[:size]
+
+    def settimeout(self, timeout) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _send(packets):
+    sock = CannedSocket(packets)
+    transport = HCITransport(socket_factory=lambda dev_id: sock, timeout=0.05)
+    transport.open()
+    try:
+        return transport.send_command(OGF_LE_CTL, OCF_LE_SET_ADVERTISE_ENABLE, b'\x01'), sock
+    finally:
+        transport.close()
+
+
+def test_command_packet():
+    _, sock = _send([bytes.fromhex('04 0e 04 01') + ADVERTISE_ENABLE + b'\x00'])
+    assert sock.sent == [bytes.fromhex('01 0a 20 01 01')]
+
+
+def test_command_complete_return_parameters():
+    # Command Complete: [ncmd][opcode][status][return parameters]
+    params, _ = _send([bytes.fromhex('04 0e 06 01') + ADVERTISE_ENABLE + bytes.fromhex('00 aa bb')])
+    assert params == b'\xaa\xbb'
+
+
+def test_command_complete_non_zero_status():
+    with pytest.raises(HCIError) as e:
+        _send([bytes.fromhex('04 0e 04 01') + ADVERTISE_ENABLE + b'\x0c'])
+    assert e.value.status == 0x0C
+
+
+def test_command_status():
+    # Command Status: [status][ncmd][opcode]
+    params, _ = _send([bytes.fromhex('04 0f 04 00 01') + ADVERTISE_ENABLE])
+    assert params == b''
+
+
+def test_command_status_non_zero_status():
+    with pytest.raises(HCIError) as e:
+        _send([bytes.fromhex('04 0f 04 12 01') + ADVERTISE_ENABLE])
+    assert e.value.status == 0x12
+
+
+def test_mismatched_opcode_is_skipped():
+    params, _ = _send([
+        # Failed answer to another command, then the answer to ours
+        bytes.fromhex('04 0e 04 01') + SCAN_ENABLE + b'\x0c',
+        bytes.fromhex('04 0f 04 01 01') + SCAN_ENABLE,
+        bytes.fromhex('04 0e 05 01') + ADVERTISE_ENABLE + bytes.fromhex('00 01'),
+    ])
+    assert params == b'\x01'
+
+
+def test_truncated_and_foreign_packets_are_skipped():
+    params, _ = _send([
+        bytes.fromhex('04 0e'),
+        bytes.fromhex('04 0e 04 01') + ADVERTISE_ENABLE[:1],
+        # ACL data and an LE Meta event
+        bytes.fromhex('02 01 20 00 00'),
+        bytes.fromhex('04 3e 02 01 00'),
+        bytes.fromhex('04 0e 04 01') + ADVERTISE_ENABLE + b'\x00',
+    ])
+    assert params == b''
+
+
+def test_truncated_event_only_times_out():
+    with pytest.raises(HCIError) as e:
+        _send([bytes.fromhex('04 0e 04 01') + ADVERTISE_ENABLE[:1]])
+    assert e.value.status is None
@@ -0,0 +1,99 @@
+import pytest
+
+from core.hci import HCIError, OCF_LE_SET_SCAN_ENABLE, OCF_LE_SET_SCAN_PARAMETERS, STATUS_COMMAND_DISALLOWED
+from scanners.linux import LinuxScanner, format_address, iter_advertising_reports, iter_reports
+
+# LINE Simple Beacon advertising data as captured from a broadcaster
+ADV_DATA = bytes.fromhex('02 01 06 03 03 6f fe 0c 16 6f fe 02 01 23 45 67 89 7f ca fe')
+
+# LE Advertising Report: one ADV_NONCONN_IND from 11:22:33:44:55:66 (random), RSSI -60
+LEGACY_REPORT = bytes.fromhex(
+    '04 3e 20 02 01 03 01 66 55 44 33 22 11 14'
+    '02 01 06 03 03 6f fe 0c 16 6f fe 02 01 23 45 67 89 7f ca fe c4'
+)
+
+# LE Extended Advertising Report: legacy PDU on LE 1M, no TX power, RSSI -75
+EXTENDED_REPORT = bytes.fromhex(
+    '04 3e 2e 0d 01 10 00 01 66 55 44 33 22 11 01 00 ff 7f b5 00 00 00 00 00 00 00 00 00 14'
+    '02 01 06 03 03 6f fe 0c 16 6f fe 02 01 23 45 67 89 7f ca fe'
+)
+
+
+def _reports(packet):
+    return [
+        (event_type, address_type, format_address(address), rssi, bytes(data))
+        for event_type, address_type, address, rssi, data in iter_advertising_reports(memoryview(packet))
+    ]
+
+
+def test_legacy_report():
+    assert _reports(LEGACY_REPORT) == [(0x0010, 1, '11:22:33:44:55:66', -60, ADV_DATA)]
+
+
+def test_extended_report():
+    assert _reports(EXTENDED_REPORT) == [(0x0010, 1, '11:22:33:44:55:66', -75, ADV_DATA)]
+
+
+def test_reports_are_views_of_the_packet():
+    buffer = bytearray(LEGACY_REPORT)
+    (_, _, address, _, data), = iter_advertising_reports(memoryview(buffer))
+    assert isinstance(data, memoryview) and data.obj is buffer
+    assert isinstance(address, memoryview) and address.obj is buffer
+
+
+def test_truncated_reports_are_dropped():
+    for packet in (LEGACY_REPORT, EXTENDED_REPORT):
+        for size in (3, 5, 12, len(packet) - 1):
+            assert _reports(packet[:size]) == []
+
+
+def test_other_events_are_ignored():
+    command_complete = bytes.fromhex('04 0e 04 01 0a 20 00')
+    assert _reports(command_complete) == []
+    assert _reports(b'') == []
+
+
+def test_capture_stream():
+    reports = list(iter_reports([LEGACY_REPORT, bytes.fromhex('04 0e 04 01 0a 20 00'), EXTENDED_REPORT]))
+    assert [rssi for _, _, _, rssi, _ in reports] == [-60, -75]
+
+
+class FirstCommandFails():
+    """Transport whose first command fails with the given status, the others succeed"""
+
+    def __init__(self, status):
+        self.status = status
+        self.sent = []
+        self.is_open = False
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def send_command(self, ogf, ocf, params=b''):
+        self.sent.append(ocf)
+        if len(self.sent) == 1:
+            raise HCIError(f"Command failed, status {self.status}", self.status)
+        return b''
+
+
+def _scanner(status):
+    scanner = LinuxScanner(lambda *report: None)
+    scanner.transport = FirstCommandFails(status)
+    return scanner
+
+
+def test_start_tolerates_scan_already_off():
+    scanner = _scanner(STATUS_COMMAND_DISALLOWED)
+    scanner.start(background=False)
+    assert scanner.transport.sent == [OCF_LE_SET_SCAN_ENABLE, OCF_LE_SET_SCAN_PARAMETERS, OCF_LE_SET_SCAN_ENABLE]
+
+
+@pytest.mark.parametrize('status', [0x12, None])
+def test_start_raises_other_errors(status):
+    scanner = _scanner(status)
+    with pytest.raises(HCIError):
+        scanner.start(background=False)
+    assert scanner.transport.sent == [OCF_LE_SET_SCAN_ENABLE]
@@ -0,0 +1,137 @@
+import json
+import time
+
+import pytest
+
+from core.beacon_core import BeaconCore
+from core.multi_adapter import AdapterWorker, MultiAdapterBroadcaster, load_config
+
+
+class ExtendedAdvertising():
+    def __init__(self, max_sets: int):
+        self.max_sets = max_sets
+
+
+class FakeTransmitter():
+    """Records what reaches the adapter; ext_advertiser only when max_sets is given"""
+
+    def __init__(self, dev_id: int, max_sets: int = None):
+        self.dev_id = dev_id
+        self.ext_advertiser = ExtendedAdvertising(max_sets) if max_sets else None
+        self.advertised = []  # (hwid, message) or list of them, per call
+        self.pdus = []
+
+    def initialize(self) -> bool:
+        return True
+
+    def start_advertising(self, hwid, device_message) -> bool:
+        self.advertised.append((hwid, device_message))
+        return True
+
+    def start_advertising_sets(self, beacons) -> bool:
+        self.advertised.append([beacon[:2] for beacon in beacons])
+        return True
+
+    def advertise_pdu(self, adv_data) -> bool:
+        self.pdus.append(bytes(adv_data))
+        return True
+
+    def stop_advertising(self) -> None:
+        pass
+
+
+def _config(tmp_path, beacons, **options):
+    path = tmp_path / 'beacons.json'
+    path.write_text(json.dumps(dict(options, beacons=beacons)))
+    return str(path)
+
+
+def _wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_assignment(tmp_path):
+    path = _config(tmp_path, [
+        {'hwid': '0000000001', 'message': '01', 'adapter': 'hci1'},
+        {'hwid': '0000000002'},
+        {'hwid': '0000000003', 'interval': 0.2},
+        {'hwid': '0000000004', 'adapter': 2},
+    ], repeat_interval=0.5)
+    assignment, repeat_interval = load_config(path, adapters=[0, 1])
+    assert repeat_interval == 0.5
+    # Explicit adapters first, then the least loaded adapter, lowest index on a tie
+    assert assignment == {
+        0: [('0000000002', '', None), ('0000000003', '', 0.2)],
+        1: [('0000000001', '01', None)],
+        2: [('0000000004', '', None)],
+    }
+
+
+def test_no_adapter_for_unassigned_beacons(tmp_path):
+    with pytest.raises(Exception, match='No Bluetooth adapter'):
+        load_config(_config(tmp_path, [{'hwid': '0000000001'}]), adapters=[])
+
+
+def test_duplicate_hwid_is_rejected(tmp_path):
+    path = _config(tmp_path, [
+        {'hwid': '00000000AA', 'message': '01', 'adapter': 'hci0'},
+        {'hwid': '00000000aa', 'message': '02', 'adapter': 'hci1'},
+    ])
+    with pytest.raises(ValueError, match='Duplicate hwid'):
+        load_config(path, adapters=[0, 1])
+    with pytest.raises(ValueError, match='Duplicate hwid'):
+        AdapterWorker('hci0', FakeTransmitter(0), [('00000000aa', '01', None), ('00000000aa', '02', None)])
+
+
+def test_submit_routes_to_the_adapter_of_the_beacon():
+    transmitters = {}
+
+    def factory(dev_id):
+        transmitters[dev_id] = FakeTransmitter(dev_id, max_sets=4)
+        return transmitters[dev_id]
+
+    broadcaster = MultiAdapterBroadcaster({
+        0: [('0000000001', '01', None)],
+        1: [('0000000002', '02', None), ('0000000003', '03', None)],
+    }, transmitter_factory=factory)
+    broadcaster.start()
+    try:
+        _wait_for(lambda: transmitters[0].advertised and transmitters[1].advertised)
+        broadcaster.update('0000000003', '33')
+        _wait_for(lambda: len(transmitters[1].advertised) == 2)
+        with pytest.raises(KeyError):
+            broadcaster.update('0000000009', '99')
+    finally:
+        broadcaster.stop()
+    assert transmitters[0].advertised == [('0000000001', '01')]
+    # Both beacons fit into the advertising sets of hci1, only that adapter is updated
+    assert transmitters[1].advertised == [
+        [('0000000002', '02'), ('0000000003', '03')],
+        [('0000000002', '02'), ('0000000003', '33')],
+    ]
+    stats = broadcaster.stats()
+    assert stats['hci0']['mode'] == stats['hci1']['mode'] == 'direct'
+    assert (stats['hci0']['submitted'], stats['hci1']['submitted'], stats['hci1']['applied']) == (0, 1, 1)
+
+
+@pytest.mark.parametrize('max_sets', [None, 1])
+def test_time_slicing_when_beacons_outnumber_the_sets(max_sets):
+    transmitter = FakeTransmitter(0, max_sets=max_sets)
+    beacons = [('0000000001', '01', None), ('0000000002', '02', None)]
+    worker = AdapterWorker('hci0', transmitter, beacons, repeat_interval=0.02)
+    worker.start()
+    try:
+        _wait_for(lambda: len(transmitter.pdus) >= 4)
+        worker.submit('0000000002', '22')
+        updated = bytes(BeaconCore.build_advertising_data('0000000002', '22'))
+        _wait_for(lambda: updated in transmitter.pdus)
+    finally:
+        worker.stop()
+    assert worker.error is None
+    assert transmitter.advertised == []
+    assert worker.stats()['mode'] == 'time-sliced'
+    first = bytes(BeaconCore.build_advertising_data('0000000001', '01'))
+    assert first in transmitter.pdus
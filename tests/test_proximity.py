@@ -0,0 +1,44 @@
+import pytest
+
+from proximity import ProximityEngine
+
+
+@pytest.mark.parametrize('method', ['kalman', 'ema'])
+def test_first_update_after_window_overflow_seeds_from_samples(method):
+    engine = ProximityEngine(method, window=16)
+    slot = engine.acquire()
+    for _ in range(20):
+        engine.push(slot, -60)
+    engine.update()
+    assert engine.smoothed(slot) == pytest.approx(-60.0)
+
+
+@pytest.mark.parametrize('method', ['kalman', 'ema'])
+def test_reused_slot_does_not_inherit_previous_device(method):
+    engine = ProximityEngine(method, window=16)
+    slot = engine.acquire()
+    for _ in range(5):
+        engine.push(slot, -30)
+    engine.update()
+    engine.release(slot)
+
+    reused = engine.acquire()
+    assert reused == slot
+    for _ in range(20):
+        engine.push(reused, -90)
+    engine.update()
+    assert engine.smoothed(reused) == pytest.approx(-90.0)
+
+
+def test_reused_slot_within_window():
+    engine = ProximityEngine(window=16)
+    slot = engine.acquire()
+    engine.push(slot, -30)
+    engine.update()
+    engine.release(slot)
+
+    reused = engine.acquire()
+    for _ in range(3):
+        engine.push(reused, -80)
+    engine.update()
+    assert engine.smoothed(reused) == pytest.approx(-80.0)
@@ -0,0 +1,75 @@
+import unicodedata
+
+import pytest
+
+from renderer import TableRenderer
+
+WIDTH = 40
+
+
+class CellScreen():
+    """curses window stand-in keeping one character per cell, wide characters take two"""
+
+    def __init__(self, height: int = 5, width: int = WIDTH):
+        self.height = height
+        self.width = width
+        self.clear()
+        self._cursor = (0, 0)
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def clear(self):
+        self.cells = [[' '] * self.width for _ in range(self.height)]
+
+    def addstr(self, y, x, text):
+        row = self.cells[y]
+        for char in text:
+            if unicodedata.combining(char):
+                row[x - 1] += char
+                continue
+            wide = unicodedata.east_asian_width(char) in ('W', 'F')
+            row[x] = char
+            if wide:
+                row[x + 1] = ''
+            x += 2 if wide else 1
+        self._cursor = (y, x)
+
+    def move(self, y, x):
+        self._cursor = (y, x)
+
+    def clrtoeol(self):
+        y, x = self._cursor
+        self.cells[y][x:] = [' '] * (self.width - x)
+
+    def noutrefresh(self):
+        pass
+
+    def line(self, y: int) -> str:
+        return ''.join(self.cells[y]).rstrip()
+
+
+@pytest.mark.parametrize('first, second', [
+    ('ビーコン abc', 'ビーコン abd'),
+    ('ビーコン abc', 'ビーコン'),
+    ('ビーコン abc', 'ビー abc'),
+    ('ab 🙂 cd', 'ab 🙂 ce'),
+    ('é x', 'ê x'),
+    ('名前' * 30, '名前' * 29 + 'x'),
+])
+def test_partial_rewrite_matches_a_full_redraw(first, second):
+    screen = CellScreen()
+    renderer = TableRenderer(screen, doupdate=lambda: None)
+    renderer.render(first, [])
+    renderer.render(second, [])
+
+    fresh = CellScreen()
+    TableRenderer(fresh, doupdate=lambda: None).render(second, [])
+    assert screen.line(0) == fresh.line(0)
+
+
+def test_lines_are_clipped_to_the_screen_width():
+    screen = CellScreen()
+    TableRenderer(screen, doupdate=lambda: None).render('名' * WIDTH, [])
+    # The last column stays free
+    assert screen.line(0) == '名' * ((WIDTH - 1) // 2)
@@ -0,0 +1,91 @@
+import pytest
+
+from core.beacon_core import BeaconCore
+from core.scheduler import BeaconScheduler
+
+ENTRIES = [('0123456789', '01'), ('0123456788', '02'), ('0123456787', '03')]
+
+
+class FakeClock():
+    """Monotonic clock that only moves when the scheduler sleeps, plus an optional oversleep"""
+
+    def __init__(self, oversleep: float = 0.0):
+        self.now = 100.0
+        self.oversleep = oversleep
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds + self.oversleep
+
+
+class RecordingTransmitter():
+    """Records (timestamp, entry index) of every advertised frame"""
+
+    def __init__(self, clock, entries, cost: float = 0.0):
+        self.clock = clock
+        self.cost = cost
+        self.index_of = {bytes(pdu): i for i, pdu in enumerate(BeaconCore.build_advertising_data_batch(entries))}
+        self.sent = []
+
+    def advertise_pdu(self, adv_data) -> bool:
+        self.sent.append((self.clock(), self.index_of[bytes(adv_data)]))
+        self.clock.now += self.cost
+        return True
+
+
+def _scheduler(clock, transmitter, repeat_interval=0.3):
+    return BeaconScheduler(transmitter, ENTRIES, repeat_interval, clock=clock, sleep=clock.sleep)
+
+
+def test_rotation_order_and_slot_times():
+    clock = FakeClock()
+    transmitter = RecordingTransmitter(clock, ENTRIES)
+    scheduler = _scheduler(clock, transmitter)
+    scheduler.run(max_slots=9)
+
+    assert [index for _, index in transmitter.sent] == [0, 1, 2] * 3
+    # Evenly spread over the repeat interval, on time
+    start = transmitter.sent[0][0]
+    for n, (when, _) in enumerate(transmitter.sent):
+        assert when == pytest.approx(start + n * 0.1)
+    assert scheduler.jitter.count == 9
+    assert scheduler.jitter.max_us == 0
+    assert scheduler.skipped == 0
+
+
+def test_jitter_bounded_by_oversleep():
+    clock = FakeClock(oversleep=0.002)
+    transmitter = RecordingTransmitter(clock, ENTRIES)
+    scheduler = _scheduler(clock, transmitter)
+    scheduler.run(max_slots=30)
+
+    assert [index for _, index in transmitter.sent] == [0, 1, 2] * 10
+    # Lateness does not accumulate: every slot is planned from its own schedule, not from the last send
+    assert scheduler.jitter.max_us <= 2000 + 1
+    start = transmitter.sent[0][0]
+    for n, (when, _) in enumerate(transmitter.sent):
+        assert 0 <= when - (start + n * 0.1) <= 0.002 + 1e-9
+
+
+def test_missed_rotations_are_skipped_not_burst():
+    clock = FakeClock()
+    # One send takes longer than a whole rotation
+    transmitter = RecordingTransmitter(clock, ENTRIES, cost=0.35)
+    scheduler = _scheduler(clock, transmitter)
+    scheduler.run(max_slots=6)
+
+    assert scheduler.skipped > 0
+    # Never more than one frame per entry and rotation
+    times = [when for when, _ in transmitter.sent]
+    assert all(later >= earlier for earlier, later in zip(times, times[1:]))
+    assert sorted(index for _, index in transmitter.sent[:3]) == [0, 1, 2]
+
+
+def test_duration_limits_the_run():
+    clock = FakeClock()
+    transmitter = RecordingTransmitter(clock, ENTRIES)
+    scheduler = _scheduler(clock, transmitter)
+    scheduler.run(duration=0.6)
+    assert len(transmitter.sent) == 6
@@ -0,0 +1,74 @@
+import multiprocessing
+from collections import namedtuple
+
+import pytest
+
+from shared_ring import ObservationRing, OBSERVATION_SIZE
+
+LineBeacon = namedtuple('LineBeacon', 'hwid device_message measured_power')
+
+
+def test_record_layout():
+    assert OBSERVATION_SIZE == 128
+    ring = ObservationRing(capacity=4)
+    try:
+        assert ring.capacity == 4
+    finally:
+        ring.close()
+
+
+def test_publish_and_drain():
+    ring = ObservationRing(capacity=2)
+    try:
+        beacon = LineBeacon(bytes.fromhex('0123456789'), b'\xca\xfe', -59)
+        assert ring.publish('11:22:33:44:55:66', 'beacon', -60, None, beacon, adapter=1)
+        assert ring.publish('11:22:33:44:55:67', None, -70, b'\x4c\x00\x02', None)
+        # Full until the consumer drains
+        assert not ring.publish('11:22:33:44:55:68', None, -80, None, None)
+        drained = []
+        assert ring.drain(lambda *observation: drained.append(observation)) == 2
+        assert drained == [
+            ('11:22:33:44:55:66', 'beacon', -60, None, '0123456789', 'cafe', -59, 1),
+            ('11:22:33:44:55:67', 'Unknown', -70, b'\x4c\x00\x02', None, None, None, 0),
+        ]
+        assert len(ring) == 0
+        assert ring.publish('11:22:33:44:55:68', None, -80, None, None)
+        ring.publish_counters(accepted=3)
+        assert ring.counters() == (4, 1, 3, 0)
+    finally:
+        ring.close()
+
+
+def test_attach_needs_the_lock():
+    ring = ObservationRing(capacity=4)
+    try:
+        with pytest.raises(ValueError):
+            ObservationRing(ring.name, create=False)
+    finally:
+        ring.close()
+
+
+def _produce(name, lock, count):
+    ring = ObservationRing(name, create=False, lock=lock)
+    try:
+        for i in range(count):
+            while not ring.publish(f'{i:012d}', None, -(i % 100), None, None):
+                pass
+    finally:
+        ring.close()
+
+
+def test_worker_process_publishes_in_order():
+    context = multiprocessing.get_context('spawn')
+    ring = ObservationRing(capacity=16, lock=context.Lock())
+    try:
+        process = context.Process(target=_produce, args=(ring.name, ring.lock, 500))
+        process.start()
+        drained = []
+        while len(drained) < 500 and (process.is_alive() or len(ring)):
+            ring.drain(lambda uuid, *rest: drained.append(uuid))
+        process.join()
+        ring.drain(lambda uuid, *rest: drained.append(uuid))
+        assert drained == [f'{i:012d}' for i in range(500)]
+    finally:
+        ring.close()